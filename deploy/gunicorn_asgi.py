@@ -0,0 +1,21 @@
+# ASGI deployment: gunicorn -c deploy/gunicorn_asgi.py
+# Serves the async catalogue pages, whose independent sections load concurrently.
+import multiprocessing
+import os
+import tempfile
+
+wsgi_app = 'titan_nexus.asgi:application'
+worker_class = 'uvicorn.workers.UvicornWorker'
+bind = os.environ.get('PORTAL_BIND', '127.0.0.1:8000')
+workers = int(os.environ.get('PORTAL_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+timeout = 30
+
+# Signal invalidation must reach every worker, so default to a cache they share.
+cache_env = [
+    f"DJANGO_CACHE_BACKEND={os.environ.get('DJANGO_CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache')}",
+    f"DJANGO_CACHE_LOCATION={os.environ.get('DJANGO_CACHE_LOCATION', os.path.join(tempfile.gettempdir(), 'titan-nexus-cache'))}",
+]
+raw_env = cache_env + [
+    'PORTAL_ASYNC_VIEWS=true',
+    f"PORTAL_SECTION_WORKERS={os.environ.get('PORTAL_SECTION_WORKERS', '4')}",
+]
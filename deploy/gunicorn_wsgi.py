@@ -0,0 +1,17 @@
+# Synchronous deployment: gunicorn -c deploy/gunicorn_wsgi.py
+import multiprocessing
+import os
+import tempfile
+
+wsgi_app = 'titan_nexus.wsgi:application'
+bind = os.environ.get('PORTAL_BIND', '127.0.0.1:8000')
+workers = int(os.environ.get('PORTAL_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('PORTAL_THREADS', '4'))
+timeout = 30
+
+# Signal invalidation must reach every worker, so default to a cache they share.
+cache_env = [
+    f"DJANGO_CACHE_BACKEND={os.environ.get('DJANGO_CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache')}",
+    f"DJANGO_CACHE_LOCATION={os.environ.get('DJANGO_CACHE_LOCATION', os.path.join(tempfile.gettempdir(), 'titan-nexus-cache'))}",
+]
+raw_env = cache_env
@@ -1,7 +1,45 @@
 from django.contrib import admin
+from django.utils import timezone
 from django.utils.html import format_html
 
 from . import models
+from .pagination import EstimatedCountPaginator
+from .search import MACHINE_INDEX, REQUEST_INDEX, get_search_backend
+
+
+class IndexedSearchMixin:
+    """Admin search through the full-text index for ``search_index`` instead of LIKE scans."""
+
+    search_index = None
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        backend = get_search_backend(queryset.db, spec=self.search_index)
+        # Matches come back as a pk subquery, so there is nothing to de-duplicate.
+        return backend.search(queryset, search_term), False
+
+
+class LargeChangelistMixin:
+    paginator = EstimatedCountPaginator
+    # Skips the second, unfiltered COUNT behind "N results (M total)".
+    show_full_result_count = False
+
+
+class MachineIndustryFilter(admin.SimpleListFilter):
+    """Filters on the industries through table with a subquery, so the changelist needs no DISTINCT."""
+
+    title = 'industry'
+    parameter_name = 'industry'
+
+    def lookups(self, request, model_admin):
+        return [(industry.pk, industry.name) for industry in models.Industry.objects.only('name')]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            through = models.Machine.industries.through.objects.filter(industry_id=self.value())
+            return queryset.filter(pk__in=through.values('machine_id'))
+        return queryset
 
 
 class HeroMetricInline(admin.TabularInline):
@@ -43,10 +81,13 @@ class MachineDocumentInline(admin.TabularInline):
 
 
 @admin.register(models.Machine)
-class MachineAdmin(admin.ModelAdmin):
+class MachineAdmin(IndexedSearchMixin, LargeChangelistMixin, admin.ModelAdmin):
     list_display = ('name', 'category', 'availability_status', 'is_featured', 'financing_available')
-    list_filter = ('category', 'availability_status', 'is_featured', 'industries')
+    list_filter = ('category', 'availability_status', 'is_featured', MachineIndustryFilter)
+    list_select_related = ('category',)
+    autocomplete_fields = ('category', 'industries')
     search_fields = ('name', 'model_number', 'manufacturer', 'description')
+    search_index = MACHINE_INDEX
     prepopulated_fields = {'slug': ('name',)}
     readonly_fields = ('public_id', 'created_at', 'updated_at')
     inlines = [MachineImageInline, MachineDocumentInline]
@@ -56,6 +97,7 @@ class MachineAdmin(admin.ModelAdmin):
 class CategoryAdmin(admin.ModelAdmin):
     list_display = ('name', 'display_order')
     list_editable = ('display_order',)
+    search_fields = ('name',)
     prepopulated_fields = {'slug': ('name',)}
 
 
@@ -63,6 +105,7 @@ class CategoryAdmin(admin.ModelAdmin):
 class IndustryAdmin(admin.ModelAdmin):
     list_display = ('name', 'display_order')
     list_editable = ('display_order',)
+    search_fields = ('name',)
     prepopulated_fields = {'slug': ('name',)}
 
 
@@ -70,6 +113,8 @@ class IndustryAdmin(admin.ModelAdmin):
 class TestimonialAdmin(admin.ModelAdmin):
     list_display = ('client_name', 'company', 'industry', 'rating', 'highlight')
     list_filter = ('industry', 'rating', 'highlight')
+    list_select_related = ('industry',)
+    autocomplete_fields = ('industry',)
     search_fields = ('client_name', 'company', 'quote')
 
 
@@ -106,22 +151,56 @@ class RequestStatusLogInline(admin.TabularInline):
     readonly_fields = ('status', 'comment', 'created_at')
 
 
+def transition_action(status, label):
+    @admin.action(description=f'Move selected requests to {label}')
+    def action(modeladmin, request, queryset):
+        moved = models.CustomRequest.bulk_transition(queryset, status, comment=f'Moved to {label} in bulk by {request.user}.'[:255])
+        modeladmin.message_user(request, f'{moved} request(s) moved to {label}.')
+
+    action.__name__ = f'mark_{status}'
+    return action
+
+
 @admin.register(models.CustomRequest)
-class CustomRequestAdmin(admin.ModelAdmin):
+class CustomRequestAdmin(IndexedSearchMixin, LargeChangelistMixin, admin.ModelAdmin):
     list_display = ('reference_code', 'company_name', 'machine_type', 'status', 'created_at')
-    list_filter = ('status', 'industry', 'created_at')
-    search_fields = ('reference_code', 'company_name', 'contact_name', 'machine_type', 'description')
+    list_filter = ('status', 'industry')
+    date_hierarchy = 'created_at'
+    autocomplete_fields = ('industry',)
+    search_fields = ('reference_code', 'company_name', 'contact_name', 'email', 'machine_type', 'description')
+    search_index = REQUEST_INDEX
     readonly_fields = ('reference_code', 'created_at', 'updated_at')
     inlines = [RequestStatusLogInline]
+    actions = [transition_action(status, label) for status, label in models.CustomRequest.STATUS_CHOICES]
 
 
 @admin.register(models.RequestStatusLog)
-class RequestStatusLogAdmin(admin.ModelAdmin):
+class RequestStatusLogAdmin(LargeChangelistMixin, admin.ModelAdmin):
     list_display = ('custom_request', 'status', 'created_at')
     list_filter = ('status',)
+    list_select_related = ('custom_request',)
     readonly_fields = ('custom_request', 'status', 'comment', 'created_at')
 
 
+@admin.register(models.OutboxMessage)
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('subject',)
+    readonly_fields = ('custom_request', 'subject', 'body', 'from_email', 'recipients', 'attempts', 'claimed_at', 'last_error', 'created_at', 'sent_at')
+    actions = ['requeue']
+
+    @admin.action(description='Requeue selected messages for delivery')
+    def requeue(self, request, queryset):
+        updated = queryset.exclude(status=models.OutboxMessage.STATUS_SENT).update(
+            status=models.OutboxMessage.STATUS_PENDING,
+            attempts=0,
+            claimed_at=None,
+            next_attempt_at=timezone.now(),
+        )
+        self.message_user(request, f'{updated} message(s) requeued.')
+
+
 admin.site.site_header = 'Titan Nexus Operations Console'
 admin.site.site_title = 'Titan Nexus Admin'
 admin.site.index_title = 'Command Center'
@@ -0,0 +1,267 @@
+import json
+from collections import defaultdict
+
+from django.core.paginator import EmptyPage, PageNotAnInteger
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.http import condition
+
+from .bulk import chunked
+from .conditional import catalogue_state, digest, labels_state
+from .facets import get_facet_counts
+from .forms import MachineFilterForm
+from .models import Category, Industry, Machine
+from .pagination import CachedCountPaginator, KeysetPaginator, count_cache
+
+API_VERSION = 'v1'
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+EXPORT_CHUNK_SIZE = 2000
+SLUG_PLACEHOLDER = '__slug__'
+
+# Public field name -> ORM path; ``industries`` and ``url`` are derived.
+MACHINE_FIELDS = {
+    'id': 'public_id',
+    'slug': 'slug',
+    'name': 'name',
+    'category': 'category__slug',
+    'short_description': 'short_description',
+    'description': 'description',
+    'key_features': 'key_features',
+    'model_number': 'model_number',
+    'manufacturer': 'manufacturer',
+    'power_rating_kw': 'power_rating_kw',
+    'capacity_output': 'capacity_output',
+    'price_from': 'price_from',
+    'currency': 'currency',
+    'lead_time_weeks': 'lead_time_weeks',
+    'warranty_months': 'warranty_months',
+    'availability': 'availability_status',
+    'highlight_text': 'highlight_text',
+    'is_featured': 'is_featured',
+    'financing_available': 'financing_available',
+    'updated_at': 'updated_at',
+}
+DERIVED_FIELDS = ('industries', 'url')
+DEFAULT_MACHINE_FIELDS = (
+    'id', 'slug', 'name', 'category', 'industries', 'short_description', 'power_rating_kw',
+    'price_from', 'currency', 'availability', 'is_featured', 'financing_available', 'url', 'updated_at',
+)
+KEYSET_ORDERING = (('is_featured', True), ('name', False), ('id', False))
+
+
+class APIError(Exception):
+    def __init__(self, message, status=400, **detail):
+        super().__init__(message)
+        self.status = status
+        self.detail = detail
+
+    def response(self):
+        return JsonResponse({'error': str(self), **self.detail}, status=self.status)
+
+
+def dumps(payload):
+    return json.dumps(payload, cls=DjangoJSONEncoder, separators=(',', ':'))
+
+
+def api_response(payload, status=200):
+    return JsonResponse(payload, status=status, safe=False, json_dumps_params={'separators': (',', ':')})
+
+
+def parse_fields(request):
+    raw = request.GET.get('fields')
+    if not raw:
+        return DEFAULT_MACHINE_FIELDS
+    fields = tuple(dict.fromkeys(name.strip() for name in raw.split(',') if name.strip()))
+    unknown = [name for name in fields if name not in MACHINE_FIELDS and name not in DERIVED_FIELDS]
+    if unknown or not fields:
+        raise APIError('Unknown fields.', unknown=unknown, available=sorted(MACHINE_FIELDS) + list(DERIVED_FIELDS))
+    return fields
+
+
+def parse_limit(request):
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise APIError('limit must be an integer.')
+    if not 1 <= limit <= MAX_LIMIT:
+        raise APIError(f'limit must be between 1 and {MAX_LIMIT}.')
+    return limit
+
+
+def filter_form(request):
+    form = MachineFilterForm(request.GET)
+    if not form.is_valid():
+        raise APIError('Invalid filters.', fields=form.errors.get_json_data())
+    return form
+
+
+class MachineSerializer:
+    """Turns ``values()`` rows into payload dicts holding only the requested ``fields``."""
+
+    def __init__(self, fields, using='default'):
+        self.fields = fields
+        self.using = using
+        self.url_pattern = reverse('portal:machine_detail', args=[SLUG_PLACEHOLDER])
+
+    def values(self, queryset):
+        paths = {MACHINE_FIELDS[name] for name in self.fields if name in MACHINE_FIELDS}
+        # Keyset cursors, urls and industry lookups need these whether or not they are shown.
+        paths.update(('id', 'slug', 'is_featured', 'name'))
+        return queryset.values(*sorted(paths))
+
+    def industries_for(self, pks):
+        industries = defaultdict(list)
+        links = (
+            Machine.industries.through.objects.using(self.using)
+            .filter(machine_id__in=pks)
+            .order_by('industry__display_order', 'industry__name')
+            .values_list('machine_id', 'industry__slug')
+        )
+        for machine_id, slug in links:
+            industries[machine_id].append(slug)
+        return industries
+
+    def serialize(self, rows):
+        industries = self.industries_for([row['id'] for row in rows]) if 'industries' in self.fields else {}
+        items = []
+        for row in rows:
+            item = {}
+            for name in self.fields:
+                if name == 'industries':
+                    item[name] = industries.get(row['id'], [])
+                elif name == 'url':
+                    item[name] = self.url_pattern.replace(SLUG_PLACEHOLDER, row['slug'])
+                else:
+                    item[name] = row[MACHINE_FIELDS[name]]
+            items.append(item)
+        return items
+
+
+def catalogue_etag(request, *args, **kwargs):
+    return f"{API_VERSION}-{catalogue_state()['etag']}"
+
+
+def machine_etag(request, slug):
+    updated_at = Machine.objects.filter(slug=slug).values_list('updated_at', flat=True).first()
+    if updated_at is None:
+        return None
+    return f"{API_VERSION}-{digest(updated_at, labels_state())}"
+
+
+class APIView(View):
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        except APIError as exc:
+            return exc.response()
+
+
+@method_decorator(condition(etag_func=catalogue_etag), name='get')
+class MachineListAPIView(APIView):
+    """Filtered machines in catalogue order, with cursor pages (offset pages when searching)."""
+
+    def get(self, request):
+        form = filter_form(request)
+        serializer = MachineSerializer(parse_fields(request))
+        limit = parse_limit(request)
+        queryset = form.filter_queryset(Machine.objects.all())
+        total = count_cache.get_or_build(form.filter_key(), queryset.count)
+        if form.cleaned_data.get('search'):
+            rows, next_params, previous_params = self.search_page(queryset, serializer, limit, form, total)
+        else:
+            rows, next_params, previous_params = self.keyset_page(queryset, serializer, limit, total)
+        return api_response({
+            'count': total,
+            'next': self.page_url(next_params),
+            'previous': self.page_url(previous_params),
+            'results': serializer.serialize(rows),
+        })
+
+    def keyset_page(self, queryset, serializer, limit, total):
+        paginator = KeysetPaginator(serializer.values(queryset), limit, KEYSET_ORDERING, total=total)
+        try:
+            page = paginator.page(self.request.GET.get('cursor'))
+        except Http404:
+            raise APIError('Invalid cursor.', status=400)
+        next_params = {'cursor': page.next_cursor} if page.next_cursor else None
+        previous_params = {'cursor': page.previous_cursor} if page.previous_cursor else None
+        return page.object_list, next_params, previous_params
+
+    def search_page(self, queryset, serializer, limit, form, total):
+        queryset = serializer.values(queryset.order_by('-search_rank', '-is_featured', 'name', 'id'))
+        paginator = CachedCountPaginator(queryset, limit, count_key=form.filter_key())
+        try:
+            page = paginator.page(self.request.GET.get('page', 1))
+        except (EmptyPage, PageNotAnInteger):
+            raise APIError('Invalid page.', status=404)
+        next_params = {'page': page.next_page_number()} if page.has_next() else None
+        previous_params = {'page': page.previous_page_number()} if page.has_previous() else None
+        return list(page.object_list), next_params, previous_params
+
+    def page_url(self, params):
+        if params is None:
+            return None
+        query = self.request.GET.copy()
+        for name in ('cursor', 'page'):
+            query.pop(name, None)
+        query.update(params)
+        return self.request.build_absolute_uri(f'{self.request.path}?{query.urlencode()}')
+
+
+@method_decorator(condition(etag_func=machine_etag), name='get')
+class MachineDetailAPIView(APIView):
+    def get(self, request, slug):
+        serializer = MachineSerializer(parse_fields(request))
+        rows = list(serializer.values(Machine.objects.filter(slug=slug)))
+        if not rows:
+            raise Http404
+        return api_response(serializer.serialize(rows)[0])
+
+
+@method_decorator(condition(etag_func=catalogue_etag), name='get')
+class MachineExportAPIView(APIView):
+    """Every matching machine as NDJSON, streamed in chunks so memory stays flat at any catalogue size."""
+
+    def get(self, request):
+        form = filter_form(request)
+        serializer = MachineSerializer(parse_fields(request))
+        queryset = serializer.values(form.filter_queryset(Machine.objects.all()).order_by('id'))
+        response = StreamingHttpResponse(self.stream(queryset, serializer), content_type='application/x-ndjson')
+        response['Content-Disposition'] = 'attachment; filename="machines.ndjson"'
+        return response
+
+    def stream(self, queryset, serializer):
+        for rows in chunked(queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE), EXPORT_CHUNK_SIZE):
+            yield ''.join(f'{dumps(item)}\n' for item in serializer.serialize(rows))
+
+
+@method_decorator(condition(etag_func=catalogue_etag), name='get')
+class TaxonomyAPIView(APIView):
+    """Categories or industries with their machine counts, in display order."""
+
+    model = None
+    facet = None
+
+    def get(self, request):
+        counts = get_facet_counts(MachineFilterForm())[self.facet]
+        rows = self.model.objects.values('pk', 'slug', 'name', 'description')
+        return api_response({
+            'results': [
+                {'slug': row['slug'], 'name': row['name'], 'description': row['description'], 'machine_count': counts.get(row['pk'], 0)}
+                for row in rows
+            ],
+        })
+
+
+class CategoryListAPIView(TaxonomyAPIView):
+    model = Category
+    facet = 'category'
+
+
+class IndustryListAPIView(TaxonomyAPIView):
+    model = Industry
+    facet = 'industry'
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class PortalConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'portal'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .slow_queries import install
+
+        install()
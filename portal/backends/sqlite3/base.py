@@ -0,0 +1,69 @@
+import random
+import time
+
+from django.db.backends.sqlite3 import base
+from django.db.utils import OperationalError
+
+# busy_timeout comes first so the journal mode switch already waits on a busy file.
+DEFAULT_PRAGMAS = {
+    'busy_timeout': 5000,
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 128 * 1024 * 1024,
+    # Negative sizes are KiB: 32 MiB of page cache per connection.
+    'cache_size': -32000,
+    'temp_store': 'MEMORY',
+}
+
+# OPTIONS understood here rather than by sqlite3.connect().
+BACKEND_OPTIONS = ('pragmas', 'transaction_mode', 'lock_retries', 'lock_retry_delay')
+
+
+def is_lock_error(exc):
+    message = str(exc).lower()
+    return 'database is locked' in message or 'database is busy' in message
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """SQLite set up for several worker processes writing to one file.
+
+    Every connection applies ``DEFAULT_PRAGMAS`` (overridable with the
+    ``pragmas`` option): WAL so readers never block the writer, NORMAL sync,
+    a busy timeout, mmap and a larger page cache. Atomic blocks start with
+    ``BEGIN <transaction_mode>`` (IMMEDIATE by default), which takes the
+    write lock up front; a deferred transaction that reads and then writes can
+    fail at once with "database is locked" because SQLite cannot wait out
+    that upgrade. A BEGIN that still finds the file locked after the busy
+    timeout is retried ``lock_retries`` times with jittered exponential backoff.
+    """
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        for name in BACKEND_OPTIONS:
+            params.pop(name, None)
+        return params
+
+    @property
+    def pragmas(self):
+        return {**DEFAULT_PRAGMAS, **self.settings_dict['OPTIONS'].get('pragmas', {})}
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        options = self.settings_dict['OPTIONS']
+        mode = options.get('transaction_mode', 'IMMEDIATE')
+        statement = f'BEGIN {mode}' if mode else 'BEGIN'
+        retries = options.get('lock_retries', 3)
+        delay = options.get('lock_retry_delay', 0.05)
+        for attempt in range(retries + 1):
+            try:
+                self.cursor().execute(statement)
+                return
+            except OperationalError as exc:
+                if attempt == retries or not is_lock_error(exc):
+                    raise
+                time.sleep(delay * 2 ** attempt * random.uniform(0.5, 1.5))
@@ -0,0 +1,248 @@
+import gc
+import itertools
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Category, Industry, Machine
+
+# Committed per-view budgets. Query budgets are for a cold cache and must not grow
+# with the dataset; latency (p95, ms) and peak allocation (KiB) leave headroom
+# for slower machines. Scenarios without an entry fall back to their group default.
+BUDGETS = {
+    'landing': {'queries': 14, 'p95_ms': 250, 'memory_kb': 2048},
+    'catalogue': {'queries': 14, 'p95_ms': 250, 'memory_kb': 2048},
+    'machine_detail': {'queries': 6, 'p95_ms': 150, 'memory_kb': 2048},
+    'custom_request:get': {'queries': 3, 'p95_ms': 100, 'memory_kb': 2048},
+    'custom_request:post': {'queries': 9, 'p95_ms': 100, 'memory_kb': 2048},
+    'admin': {'queries': 12, 'p95_ms': 400, 'memory_kb': 4096},
+}
+
+# Catalogue filters crossed into every combination; values are resolved against the dataset.
+CATALOGUE_FILTERS = ('search', 'category', 'industry', 'availability', 'financing', 'power')
+
+
+class Scenario:
+    def __init__(self, name, path, method='get', data=None, group=None, staff=False, status=200):
+        self.name = name
+        self.path = path
+        self.method = method
+        self.data = data or {}
+        self.group = group or name
+        self.staff = staff
+        self.status = status
+
+    @property
+    def budget(self):
+        return BUDGETS.get(self.name) or BUDGETS[self.group]
+
+
+def catalogue_filter_values():
+    category = Category.objects.filter(machines__isnull=False).order_by('display_order', 'name').first()
+    industry = Industry.objects.filter(machines__isnull=False).order_by('display_order', 'name').first()
+    machine = Machine.objects.exclude(manufacturer='').order_by('id').first() or Machine.objects.order_by('id').first()
+    return {
+        'search': {'search': machine.manufacturer.split()[0] if machine and machine.manufacturer else 'machine'},
+        'category': {'category': category.pk} if category else {},
+        'industry': {'industry': industry.pk} if industry else {},
+        'availability': {'availability': 'in_stock'},
+        'financing': {'financing': 'on'},
+        'power': {'power_min': '10', 'power_max': '500'},
+    }
+
+
+def default_scenarios():
+    machine = Machine.objects.order_by('-is_featured', 'name', 'id').first()
+    scenarios = [
+        Scenario('landing', reverse('portal:landing')),
+        Scenario('catalogue:cursor', reverse('portal:machine_list'), data={'cursor': ''}, group='catalogue'),
+    ]
+    values = catalogue_filter_values()
+    for size in range(len(CATALOGUE_FILTERS) + 1):
+        for combination in itertools.combinations(CATALOGUE_FILTERS, size):
+            data = {}
+            for name in combination:
+                data.update(values[name])
+            label = '+'.join(combination) or 'all'
+            scenarios.append(Scenario(f'catalogue[{label}]', reverse('portal:machine_list'), data=data, group='catalogue'))
+    if machine is not None:
+        scenarios.append(Scenario('machine_detail', machine.get_absolute_url()))
+    industry = Industry.objects.order_by('id').first()
+    scenarios += [
+        Scenario('custom_request:get', reverse('portal:custom_request')),
+        Scenario(
+            'custom_request:post',
+            reverse('portal:custom_request'),
+            method='post',
+            data={
+                'contact_name': 'Benchmark Runner',
+                'company_name': 'Load Test Ltd',
+                'email': 'bench@example.com',
+                'industry': industry.pk if industry else '',
+                'machine_type': 'Robotic welding cell',
+                'currency': 'USD',
+                'description': 'Benchmark submission.',
+            },
+            status=302,
+        ),
+    ]
+    for model, model_admin in admin.site._registry.items():
+        if model._meta.app_label != 'portal':
+            continue
+        url = reverse(f'admin:{model._meta.app_label}_{model._meta.model_name}_changelist')
+        scenarios.append(Scenario(f'admin:{model._meta.model_name}', url, group='admin', staff=True))
+    return scenarios
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def staff_client():
+    user_model = get_user_model()
+    user = user_model.objects.filter(username='benchmark').first()
+    if user is None:
+        user = user_model.objects.create_superuser('benchmark', 'benchmark@example.com', None)
+    client = Client()
+    client.force_login(user)
+    return client
+
+
+def measure(scenario, client, iterations, trace_memory=True):
+    """Run ``scenario`` ``iterations`` times; the first run starts from empty caches.
+
+    Memory is traced on one extra run so tracemalloc overhead stays out of the timings.
+    """
+    for cache in caches.all():
+        cache.clear()
+    connection = connections['default']
+    request = getattr(client, scenario.method)
+
+    def fetch():
+        response = request(scenario.path, scenario.data)
+        if response.status_code != scenario.status:
+            raise AssertionError(f'{scenario.name}: expected HTTP {scenario.status}, got {response.status_code}')
+        return response
+
+    timings, queries = [], []
+    for _ in range(iterations):
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            fetch()
+            timings.append((time.perf_counter() - started) * 1000)
+        queries.append(len(captured))
+    peak = None
+    if trace_memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            fetch()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return {
+        'name': scenario.name,
+        'group': scenario.group,
+        'path': scenario.path,
+        'params': scenario.data,
+        'iterations': iterations,
+        'queries': queries[0],
+        'warm_queries': queries[-1],
+        'p50_ms': round(statistics.median(timings), 2),
+        'p95_ms': round(percentile(timings, 0.95), 2),
+        'memory_kb': round(peak / 1024, 1) if peak is not None else None,
+        'budget': scenario.budget,
+    }
+
+
+def budget_violations(result, check_timing=True):
+    budget = result['budget']
+    metrics = ('queries', 'p95_ms', 'memory_kb') if check_timing else ('queries',)
+    return [
+        f"{result['name']}: {metric} {result[metric]} exceeds budget {budget[metric]}"
+        for metric in metrics
+        if metric in budget and result[metric] is not None and result[metric] > budget[metric]
+    ]
+
+
+def run_benchmarks(iterations=10, scenarios=None, only=None, check_timing=True):
+    """Drive each scenario through the test client and return a JSON-serializable report."""
+    scenarios = scenarios if scenarios is not None else default_scenarios()
+    if only:
+        scenarios = [scenario for scenario in scenarios if any(pattern in scenario.name for pattern in only)]
+    anonymous, staff = Client(), staff_client()
+    results = []
+    for scenario in scenarios:
+        result = measure(scenario, staff if scenario.staff else anonymous, iterations, trace_memory=check_timing)
+        result['violations'] = budget_violations(result, check_timing=check_timing)
+        results.append(result)
+    return {
+        'created_at': timezone.now().isoformat(),
+        'python': platform.python_version(),
+        'database': connections['default'].vendor,
+        'machines': Machine.objects.count(),
+        'results': results,
+        'violations': [violation for result in results for violation in result['violations']],
+    }
+
+
+def fetch_url(url, timeout):
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            response.read()
+            ok = response.status == 200
+    except (urllib.error.URLError, OSError):
+        ok = False
+    return (time.perf_counter() - started) * 1000, ok
+
+
+def load_test(base_url, paths, concurrency=16, requests=400, timeout=30):
+    """GET ``paths`` round-robin from ``concurrency`` threads against a running server.
+
+    Returns latency percentiles per path and overall throughput.
+    """
+    urls = [f'{base_url}{paths[index % len(paths)]}' for index in range(requests)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(lambda url: fetch_url(url, timeout), urls))
+    elapsed = time.perf_counter() - started
+    results = {}
+    for index, path in enumerate(paths):
+        timings = [ms for ms, ok in outcomes[index::len(paths)] if ok]
+        results[path] = {
+            'requests': len(outcomes[index::len(paths)]),
+            'errors': len(outcomes[index::len(paths)]) - len(timings),
+            'p50_ms': round(statistics.median(timings), 2) if timings else None,
+            'p95_ms': round(percentile(timings, 0.95), 2) if timings else None,
+            'p99_ms': round(percentile(timings, 0.99), 2) if timings else None,
+            'max_ms': round(max(timings), 2) if timings else None,
+        }
+    return {
+        'concurrency': concurrency,
+        'requests': requests,
+        'elapsed_s': round(elapsed, 2),
+        'throughput_rps': round(requests / elapsed, 1),
+        'paths': results,
+    }
+
+
+def write_report(report, path):
+    with open(path, 'w', encoding='utf-8') as handle:
+        json.dump(report, handle, indent=2, default=str)
@@ -0,0 +1,96 @@
+from itertools import islice
+
+from django.utils.text import slugify
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def allocate_unique_values(model, field, count, generate, reserved=None, using='default'):
+    """Generate ``count`` values for a unique ``field`` that clash neither with the table nor ``reserved``.
+
+    Candidates are checked in one ``__in`` query per round; only clashes are regenerated.
+    """
+    reserved = reserved if reserved is not None else set()
+    values = []
+    while len(values) < count:
+        candidates = set()
+        while len(candidates) < count - len(values):
+            candidate = generate()
+            if candidate not in reserved:
+                candidates.add(candidate)
+        taken = set(
+            model._default_manager.using(using)
+            .filter(**{f'{field}__in': candidates})
+            .values_list(field, flat=True)
+        )
+        fresh = candidates - taken
+        reserved.update(fresh)
+        values.extend(fresh)
+    return values
+
+
+def allocate_slugs(model, bases, reserved=None, using='default', max_length=50, per_round=10):
+    """Free slugs for ``bases``, in order, suffixed ``-1``, ``-2``... like ``Machine.save`` when taken.
+
+    Each round checks the next ``per_round`` candidates of every unresolved base in one ``__in`` query.
+    """
+    reserved = set(reserved or ())
+    slugs = [None] * len(bases)
+    pending = list(range(len(bases)))
+    start = 0
+    while pending:
+        candidates = {}
+        for index in pending:
+            base = bases[index] or model._meta.model_name
+            candidates[index] = [
+                f'{base[:max_length - len(suffix)]}{suffix}'
+                for suffix in ('' if counter == 0 else f'-{counter}' for counter in range(start, start + per_round))
+            ]
+        taken = set(
+            model._default_manager.using(using)
+            .filter(slug__in={slug for options in candidates.values() for slug in options})
+            .values_list('slug', flat=True)
+        )
+        unresolved = []
+        for index in pending:
+            free = next((slug for slug in candidates[index] if slug not in taken and slug not in reserved), None)
+            if free is None:
+                unresolved.append(index)
+                continue
+            slugs[index] = free
+            reserved.add(free)
+        pending = unresolved
+        start += per_round
+    return slugs
+
+
+def resolve_by_name(model, names, cache, create=True, using='default'):
+    """Map names to instances of a name/slug model (Category, Industry), bulk-creating missing ones.
+
+    ``cache`` maps lower-cased names and slugs to instances and is filled in place.
+    """
+    missing = {name for name in names if name and name.lower() not in cache and slugify(name) not in cache}
+    if missing:
+        slugs = {slugify(name) for name in missing}
+        lookup = model._default_manager.using(using).filter(slug__in=slugs) | model._default_manager.using(using).filter(name__in=missing)
+        for obj in lookup:
+            cache[obj.name.lower()] = cache[obj.slug] = obj
+        to_create = {}
+        for name in missing:
+            if name.lower() not in cache and slugify(name) not in cache:
+                to_create.setdefault(slugify(name), name)
+        if to_create and create:
+            model._default_manager.using(using).bulk_create(
+                [model(name=name, slug=slug) for slug, name in to_create.items()],
+                ignore_conflicts=True,
+            )
+            for obj in model._default_manager.using(using).filter(slug__in=list(to_create)):
+                cache[obj.name.lower()] = cache[obj.slug] = obj
+    return {name: cache.get(name.lower()) or cache.get(slugify(name)) for name in names if name}
@@ -0,0 +1,200 @@
+import hashlib
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+
+PROCESS_LOCAL_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def cache_is_shared():
+    """Whether every worker process uses the same cache, so invalidations reach all of them."""
+    return settings.CACHES['default']['BACKEND'] not in PROCESS_LOCAL_BACKENDS
+
+
+def entry_timeout(timeout):
+    """Cap ``timeout`` for a process-local cache.
+
+    Signal invalidation only reaches the worker that saved, so entries in the
+    others live at most ``PORTAL_LOCAL_CACHE_TIMEOUT`` seconds.
+    """
+    if cache_is_shared():
+        return timeout
+    local = getattr(settings, 'PORTAL_LOCAL_CACHE_TIMEOUT', 30)
+    return local if timeout is None else min(timeout, local)
+
+
+class CacheStats:
+    """Process-local hit/miss counters for one named portal cache."""
+
+    def __init__(self, name):
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def hit(self, count=1):
+        with self._lock:
+            self.hits += count
+
+    def miss(self, count=1):
+        with self._lock:
+            self.misses += count
+
+    @property
+    def ratio(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def as_dict(self):
+        return {'hits': self.hits, 'misses': self.misses, 'ratio': round(self.ratio, 4)}
+
+    def reset(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def get_stats(name):
+    with _stats_lock:
+        if name not in _stats:
+            _stats[name] = CacheStats(name)
+        return _stats[name]
+
+
+def all_stats():
+    return {name: stats.as_dict() for name, stats in sorted(_stats.items())}
+
+
+class SectionCache:
+    """Caches independently built sections and drops them when their models change.
+
+    Sections are registered with :meth:`section`, naming the models whose
+    save/delete (or M2M change) should invalidate them. ``get_many`` serves
+    every section in a single cache round trip and rebuilds only the misses.
+    """
+
+    def __init__(self, name, timeout=60 * 60 * 6):
+        self.name = name
+        self.timeout = timeout
+        self.sections = {}
+        self.stats = get_stats(name)
+
+    def section(self, name, *models):
+        def decorator(builder):
+            self.sections[name] = (builder, models)
+            return builder
+        return decorator
+
+    def key(self, section):
+        return f'portal:{self.name}:{section}'
+
+    def get_many(self, names=None, run=None):
+        """Return ``{name: value}``; ``run`` may build the missing sections concurrently."""
+        names = list(names or self.sections)
+        keys = {self.key(name): name for name in names}
+        cached = cache.get_many(list(keys))
+        result = {keys[key]: value for key, value in cached.items()}
+        builders = {key: self.sections[name][0] for key, name in keys.items() if key not in cached}
+        missing = run(builders) if run else {key: builder() for key, builder in builders.items()}
+        for key, value in missing.items():
+            result[keys[key]] = value
+        self.stats.hit(len(cached))
+        if missing:
+            self.stats.miss(len(missing))
+            cache.set_many(missing, entry_timeout(self.timeout))
+        return result
+
+    def invalidate(self, *names):
+        names = names or tuple(self.sections)
+        cache.delete_many([self.key(name) for name in names])
+
+    def sections_for(self, model):
+        return [name for name, (_, models) in self.sections.items() if model in models]
+
+    def connect(self):
+        models = {model for _, section_models in self.sections.values() for model in section_models}
+        connect_invalidation(f'portal_{self.name}_cache', models, self._model_changed)
+
+    def _model_changed(self, model):
+        names = self.sections_for(model)
+        if names:
+            self.invalidate(*names)
+
+
+class VersionedCache:
+    """Cache of derived values keyed by arbitrary parts, invalidated wholesale.
+
+    Every key embeds a shared version stamp; a change to any of ``models``
+    replaces the stamp, orphaning all earlier entries at once.
+    """
+
+    def __init__(self, name, models=(), timeout=60 * 15):
+        self.name = name
+        self.models = tuple(models)
+        self.timeout = timeout
+        self.stats = get_stats(name)
+
+    @property
+    def version_key(self):
+        return f'portal:{self.name}:version'
+
+    def version(self):
+        version = cache.get(self.version_key)
+        if version is None:
+            cache.add(self.version_key, uuid.uuid4().hex, None)
+            version = cache.get(self.version_key)
+        return version
+
+    def key(self, parts):
+        digest = hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+        return f'portal:{self.name}:{self.version()}:{digest}'
+
+    def get_or_build(self, parts, builder):
+        key = self.key(parts)
+        value = cache.get(key)
+        if value is not None:
+            self.stats.hit()
+            return value
+        self.stats.miss()
+        value = builder()
+        cache.set(key, value, entry_timeout(self.timeout))
+        return value
+
+    def invalidate(self):
+        cache.set(self.version_key, uuid.uuid4().hex, None)
+
+    def connect(self):
+        connect_invalidation(f'portal_{self.name}_cache', self.models, lambda model: self.invalidate())
+
+
+def connect_invalidation(uid_prefix, models, callback):
+    """Call ``callback(model)`` whenever an instance of ``models`` is saved, deleted or has its M2M changed."""
+
+    def model_changed(sender, **kwargs):
+        callback(sender)
+
+    def m2m_changed_handler(model):
+        # Fires for both sides of the relation; always report the model declaring the field.
+        def handler(sender, action, **kwargs):
+            if action.startswith('post_'):
+                callback(model)
+        return handler
+
+    for model in models:
+        uid = f'{uid_prefix}_{model._meta.label_lower}'
+        post_save.connect(model_changed, sender=model, weak=False, dispatch_uid=f'{uid}_save')
+        post_delete.connect(model_changed, sender=model, weak=False, dispatch_uid=f'{uid}_delete')
+        for field in model._meta.local_many_to_many:
+            through = field.remote_field.through
+            m2m_changed.connect(m2m_changed_handler(model), sender=through, weak=False, dispatch_uid=f'{uid}_{field.name}_m2m')
@@ -0,0 +1,306 @@
+import csv
+import json
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from .bulk import allocate_slugs, allocate_unique_values, chunked, resolve_by_name
+from .models import Category, Industry, Machine, generate_machine_code
+from .recommendations import rebuild_recommendations
+from .search import get_search_backend
+from .signals import invalidate_catalogue_caches
+
+AVAILABILITY_VALUES = {value for value, _ in Machine.AVAILABILITY_CHOICES}
+AVAILABILITY_LABELS = {label.lower(): value for value, label in Machine.AVAILABILITY_CHOICES}
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 't'}
+
+
+class RowError(ValueError):
+    pass
+
+
+def read_rows(handle, fmt):
+    """Yield ``(line_number, dict)`` from a CSV or JSON Lines stream without loading it whole."""
+    if fmt == 'csv':
+        reader = csv.DictReader(handle)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(handle, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError as exc:
+            yield line_number, RowError(f'invalid JSON: {exc}')
+
+
+def _text(row, key, default=''):
+    value = row.get(key)
+    if value is None:
+        return default
+    return str(value).strip()
+
+
+def _decimal(row, key):
+    value = _text(row, key)
+    if not value:
+        return None
+    try:
+        return Decimal(value.replace(',', ''))
+    except InvalidOperation:
+        raise RowError(f'{key} is not a number: {value!r}')
+
+
+def _int(row, key, default):
+    value = _text(row, key)
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise RowError(f'{key} is not an integer: {value!r}')
+
+
+def _bool(row, key):
+    value = row.get(key)
+    if isinstance(value, bool):
+        return value
+    return _text(row, key).lower() in TRUE_VALUES
+
+
+def _present(row, key):
+    return isinstance(row.get(key), bool) or _text(row, key) != ''
+
+
+def _list(row, key):
+    value = row.get(key)
+    if value is None:
+        return []
+    if isinstance(value, list):
+        return [str(item).strip() for item in value if str(item).strip()]
+    return [item.strip() for item in str(value).replace(';', '|').split('|') if item.strip()]
+
+
+def parse_row(row):
+    """Validate one input row into Machine field values plus category/industry names.
+
+    Only the columns the row fills in are returned, so an update leaves the
+    others as they are and a new machine gets the model defaults.
+    """
+    if isinstance(row, RowError):
+        raise row
+    slug = slugify(_text(row, 'slug'))[:50]
+    name = _text(row, 'name')
+    if not name and not slug:
+        raise RowError('name is required')
+    availability = _text(row, 'availability_status')
+    availability = AVAILABILITY_LABELS.get(availability.lower(), availability)
+    if availability and availability not in AVAILABILITY_VALUES:
+        raise RowError(f'unknown availability_status: {availability!r}')
+    key_features = row.get('key_features')
+    if isinstance(key_features, list):
+        key_features = '\n'.join(str(item) for item in key_features)
+    values = {
+        'name': name[:150],
+        'short_description': _text(row, 'short_description')[:255],
+        'description': _text(row, 'description'),
+        'key_features': key_features or '',
+        'model_number': _text(row, 'model_number')[:80],
+        'manufacturer': _text(row, 'manufacturer')[:120],
+        'power_rating_kw': _decimal(row, 'power_rating_kw'),
+        'capacity_output': _text(row, 'capacity_output')[:120],
+        'price_from': _decimal(row, 'price_from'),
+        'currency': _text(row, 'currency')[:5],
+        'lead_time_weeks': _int(row, 'lead_time_weeks', None),
+        'warranty_months': _int(row, 'warranty_months', None),
+        'availability_status': availability,
+        'highlight_text': _text(row, 'highlight_text')[:120],
+        'video_url': _text(row, 'video_url'),
+        'is_featured': _bool(row, 'is_featured'),
+        'financing_available': _bool(row, 'financing_available'),
+    }
+    return {
+        # Rows without a slug are new machines; a slug names the machine to update.
+        'slug': slug,
+        'category': _text(row, 'category') or None,
+        # None leaves an existing machine's industries untouched; [] clears them.
+        'industries': _list(row, 'industries') if 'industries' in row else None,
+        'fields': {field: value for field, value in values.items() if _present(row, field)},
+    }
+
+
+class CatalogueImporter:
+    """Upserts machines from parsed rows in chunked transactions.
+
+    Each chunk resolves its categories and industries in bulk and looks up
+    the machines its slugged rows update in one query. New machines get
+    public ids and slugs allocated in batches and one ``bulk_create``;
+    updates write only the columns their rows fill in with ``bulk_update``.
+    Industry links are replaced with one bulk insert. Model signals do not
+    fire, so the search index is updated directly and recommendations are
+    rebuilt at the end.
+    """
+
+    def __init__(self, chunk_size=1000, create_missing=True, using='default', progress=None):
+        self.chunk_size = chunk_size
+        self.create_missing = create_missing
+        self.using = using
+        self.progress = progress
+        self.categories = {}
+        self.industries = {}
+        self.public_ids = set()
+        # (slug or name, value) -> line number of the row that wrote the machine.
+        self.first_lines = {}
+        self.imported = 0
+        self.errors = []
+
+    def run(self, rows):
+        started = time.monotonic()
+        for chunk in chunked(rows, self.chunk_size):
+            parsed = []
+            for line_number, row in chunk:
+                try:
+                    parsed.append((line_number, parse_row(row)))
+                except RowError as exc:
+                    self.errors.append((line_number, str(exc)))
+            if parsed:
+                self.import_chunk(parsed)
+            if self.progress:
+                elapsed = time.monotonic() - started
+                self.progress(self.imported, len(self.errors), elapsed)
+        self.finish()
+        return self.imported
+
+    def drop_duplicates(self, parsed):
+        # A file names each machine once; a repeat is reported rather than merged into the first.
+        unique = []
+        for line_number, item in parsed:
+            key = ('slug', item['slug']) if item['slug'] else ('name', item['fields']['name'])
+            if key in self.first_lines:
+                self.errors.append((line_number, f'duplicate of line {self.first_lines[key]} ({key[0]} {key[1]!r})'))
+                continue
+            self.first_lines[key] = line_number
+            unique.append((line_number, item))
+        return unique
+
+    def import_chunk(self, parsed):
+        parsed = self.drop_duplicates(parsed)
+        manager = Machine.objects.using(self.using)
+        with transaction.atomic(using=self.using):
+            categories = resolve_by_name(
+                Category, {item['category'] for _, item in parsed if item['category']}, self.categories,
+                create=self.create_missing, using=self.using,
+            )
+            industry_names = {name for _, item in parsed for name in item['industries'] or ()}
+            industries = resolve_by_name(Industry, industry_names, self.industries, create=self.create_missing, using=self.using)
+            existing = manager.in_bulk([item['slug'] for _, item in parsed if item['slug']], field_name='slug')
+            # Unslugged rows create machines, so one named like an existing machine is a collision, not an update.
+            names = {item['fields']['name'] for _, item in parsed if not item['slug']}
+            taken_names = set(manager.filter(name__in=names).values_list('name', flat=True))
+
+            created, updated = [], []
+            for line_number, item in parsed:
+                category = None
+                if item['category']:
+                    category = categories.get(item['category'])
+                    if category is None:
+                        self.errors.append((line_number, f'unknown category {item["category"]!r}'))
+                        continue
+                machine = existing.get(item['slug'])
+                if machine is not None:
+                    updated.append((machine, category, item))
+                elif not item['slug'] and item['fields']['name'] in taken_names:
+                    self.errors.append((
+                        line_number,
+                        f'a machine named {item["fields"]["name"]!r} already exists; give its slug to update it',
+                    ))
+                elif category is None:
+                    self.errors.append((line_number, 'category is required'))
+                elif 'name' not in item['fields']:
+                    self.errors.append((line_number, 'name is required'))
+                else:
+                    created.append((line_number, Machine(slug=item['slug'], category=category, **item['fields']), item))
+
+            machines = self.create(created) + self.update(updated)
+            if not machines:
+                return
+            self.replace_industries(machines, industries)
+            get_search_backend(self.using).index([machine for machine, _ in machines])
+        self.imported += len(machines)
+
+    def create(self, created):
+        """Insert new machines; returns ``(machine, item)`` pairs for those written."""
+        if not created:
+            return []
+        unslugged = [machine for _, machine, _ in created if not machine.slug]
+        slugs = allocate_slugs(
+            Machine, [slugify(machine.name)[:50] for machine in unslugged],
+            reserved={machine.slug for _, machine, _ in created if machine.slug}, using=self.using,
+        )
+        for machine, slug in zip(unslugged, slugs):
+            machine.slug = slug
+        codes = allocate_unique_values(
+            Machine, 'public_id', len(created), lambda: generate_machine_code(6),
+            reserved=self.public_ids, using=self.using,
+        )
+        for (_, machine, _), code in zip(created, codes):
+            machine.public_id = code
+        manager = Machine.objects.using(self.using)
+        # A concurrent writer may have taken a slug since it was allocated; that row is skipped, not overwritten.
+        manager.bulk_create([machine for _, machine, _ in created], batch_size=self.chunk_size, ignore_conflicts=True)
+        written = {
+            slug: (pk, public_id)
+            for slug, pk, public_id in manager.filter(slug__in=[machine.slug for _, machine, _ in created])
+            .values_list('slug', 'pk', 'public_id')
+        }
+        machines = []
+        for line_number, machine, item in created:
+            pk, public_id = written.get(machine.slug, (None, None))
+            if public_id != machine.public_id:
+                self.errors.append((line_number, f'slug {machine.slug!r} was taken during the import'))
+                continue
+            machine.pk = pk
+            machines.append((machine, item))
+        return machines
+
+    def update(self, updated):
+        """Write the columns each row fills in to its machine, one ``bulk_update`` per set of columns."""
+        now = timezone.now()
+        groups = {}
+        for machine, category, item in updated:
+            fields = list(item['fields'])
+            if category is not None:
+                machine.category = category
+                fields.append('category')
+            for field, value in item['fields'].items():
+                setattr(machine, field, value)
+            machine.updated_at = now
+            groups.setdefault(tuple(fields), []).append(machine)
+        manager = Machine.objects.using(self.using)
+        for fields, machines in groups.items():
+            manager.bulk_update(machines, [*fields, 'updated_at'], batch_size=self.chunk_size)
+        return [(machine, item) for machine, _, item in updated]
+
+    def replace_industries(self, machines, industries):
+        through = Machine.industries.through
+        replaced = [(machine, item) for machine, item in machines if item['industries'] is not None]
+        through.objects.using(self.using).filter(machine_id__in=[machine.pk for machine, _ in replaced]).delete()
+        links = []
+        for machine, item in replaced:
+            seen = set()
+            for name in item['industries']:
+                industry = industries.get(name)
+                if industry is not None and industry.pk not in seen:
+                    seen.add(industry.pk)
+                    links.append(through(machine_id=machine.pk, industry_id=industry.pk))
+        through.objects.using(self.using).bulk_create(links, batch_size=self.chunk_size)
+
+    def finish(self):
+        invalidate_catalogue_caches()
+        if self.imported:
+            rebuild_recommendations(self.using)
@@ -0,0 +1,102 @@
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+from .instrumentation import inherit_request_wrappers
+
+DEFAULTS = {
+    'ENABLED': False,
+    # Threads shared by every request for loading independent page sections.
+    'MAX_WORKERS': 4,
+}
+
+_pool = None
+_pool_lock = threading.Lock()
+_worker = threading.local()
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'PORTAL_ASYNC_VIEWS', {}))
+    return config
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=get_config()['MAX_WORKERS'], thread_name_prefix='portal-sections')
+        return _pool
+
+
+def in_transaction():
+    return any(connection.in_atomic_block for connection in connections.all(initialized_only=True))
+
+
+def run_serially(loaders):
+    return {name: loader() for name, loader in loaders.items()}
+
+
+def _run_in_worker(loader):
+    _worker.active = True
+    # Pool threads live outside the request cycle, so they honour CONN_MAX_AGE themselves.
+    close_old_connections()
+    try:
+        with inherit_request_wrappers():
+            return loader()
+    finally:
+        close_old_connections()
+        _worker.active = False
+
+
+def run_concurrently(loaders):
+    """Run independent ``loaders`` (name -> callable) on the section pool and return their results by name.
+
+    Each pool thread has its own database connection, which cannot see work
+    the calling thread has not committed, so callers inside a transaction,
+    loaders nested in another loader and single loaders run serially.
+    """
+    if len(loaders) < 2 or in_transaction() or getattr(_worker, 'active', False) or get_config()['MAX_WORKERS'] < 2:
+        return run_serially(loaders)
+    # Loaders run in the caller's context, so a request pinned to the primary stays pinned.
+    futures = {
+        name: get_pool().submit(contextvars.copy_context().run, _run_in_worker, loader)
+        for name, loader in loaders.items()
+    }
+    return {name: future.result() for name, future in futures.items()}
+
+
+class SectionLoaderMixin:
+    """Views load independent page sections through ``gather``, which runs them one after another."""
+
+    gather = staticmethod(run_serially)
+
+
+class AsyncPageMixin:
+    """Async variant of a ``SectionLoaderMixin`` page view for ASGI deployments.
+
+    The page renders on a thread of its own, so concurrent requests do not
+    queue behind one another, and its independent sections load
+    concurrently on the section pool.
+    """
+
+    gather = staticmethod(run_concurrently)
+
+    async def get(self, request, *args, **kwargs):
+        if await sync_to_async(in_transaction)():
+            # Only the request thread's connection sees its open transaction (tests, for one).
+            return await sync_to_async(super().get)(request, *args, **kwargs)
+        return await sync_to_async(self.get_page, thread_sensitive=False)(request, *args, **kwargs)
+
+    def get_page(self, request, *args, **kwargs):
+        # Like the section pool, this thread is outside the request cycle that closes connections.
+        close_old_connections()
+        try:
+            with inherit_request_wrappers():
+                return super().get(request, *args, **kwargs)
+        finally:
+            close_old_connections()
@@ -0,0 +1,115 @@
+import hashlib
+
+from django.conf import settings
+from django.contrib import messages
+from django.db import models
+from django.db.models import Count, Max, Value
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from .caching import VersionedCache
+from .models import Category, Industry, Machine
+
+DEFAULTS = {
+    'ENABLED': True,
+    # Part of every page ETag; change it on deploy so template changes are not answered with a 304.
+    'RELEASE': '',
+}
+
+validator_cache = VersionedCache(
+    'validators',
+    models=(Machine, Category, Industry),
+    timeout=getattr(settings, 'PORTAL_VALIDATOR_CACHE_TIMEOUT', 60 * 15),
+)
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'PORTAL_CONDITIONAL_GET', {}))
+    return config
+
+
+def digest(*parts):
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()[:32]
+
+
+def build_labels():
+    columns = ('kind', 'pk', 'slug', 'name', 'description', 'display_order')
+    categories = Category.objects.order_by().annotate(kind=Value('category')).values_list(*columns)
+    industries = Industry.objects.order_by().annotate(kind=Value('industry')).values_list(*columns)
+    return digest(sorted(categories.union(industries, all=True)))
+
+
+def labels_state():
+    """Fingerprint of the category and industry tables, which have no timestamps of their own."""
+    return validator_cache.get_or_build(('labels',), build_labels)
+
+
+def build_catalogue_state():
+    totals = Machine.objects.order_by().aggregate(last_modified=Max('updated_at'), count=Count('pk'))
+    return {
+        'last_modified': totals['last_modified'],
+        'etag': digest(totals['last_modified'], totals['count'], labels_state()),
+    }
+
+
+def catalogue_state():
+    """Validators for the catalogue as a whole.
+
+    ``etag`` moves with any machine, category or industry change and
+    ``last_modified`` is the newest machine ``updated_at`` (industry, image
+    and document changes bump it too).
+    """
+    return validator_cache.get_or_build(('catalogue',), build_catalogue_state)
+
+
+def fingerprint(value):
+    """A repr-stable summary of cached page data, model instances reduced to their column values."""
+    if isinstance(value, models.Model):
+        return (value._meta.label, tuple(field.value_from_object(value) for field in value._meta.concrete_fields))
+    if isinstance(value, dict):
+        return tuple(sorted((key, fingerprint(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(fingerprint(item) for item in value)
+    return value
+
+
+def conditional_response(request, parts, last_modified, render):
+    """A 304 when the request's validators match ``parts``/``last_modified``, else ``render()`` tagged with them.
+
+    The ETag also covers the visitor's CSRF secret, so a page kept by the
+    browser never holds a token for a secret it no longer has, and ``RELEASE``.
+    """
+    etag = quote_etag(digest(parts, digest(request.META.get('CSRF_COOKIE', '')), get_config()['RELEASE']))
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is None:
+        response = render()
+        if response.status_code != 200:
+            return response
+    response['ETag'] = etag
+    if timestamp is not None:
+        response['Last-Modified'] = http_date(timestamp)
+    # Browsers may keep the page but must ask before reusing it; shared caches must not keep it at all.
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ('Cookie',))
+    return response
+
+
+class ConditionalPageMixin:
+    """Answers revalidation of an unchanged page with a 304 before any template work.
+
+    Views return ``(etag parts, last_modified or None)`` from ``get_validators``.
+    Pages with pending flash messages are always rendered and never tagged.
+    """
+
+    page_validators = None
+
+    def get_validators(self):
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        if not get_config()['ENABLED'] or len(messages.get_messages(request)):
+            return super().get(request, *args, **kwargs)
+        self.page_validators = self.get_validators()
+        return conditional_response(request, *self.page_validators, lambda: super(ConditionalPageMixin, self).get(request, *args, **kwargs))
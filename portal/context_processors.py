@@ -0,0 +1,7 @@
+from django.utils.functional import SimpleLazyObject
+
+from .site_settings import get_site_settings
+
+
+def site_settings(request):
+    return {'settings': SimpleLazyObject(get_site_settings)}
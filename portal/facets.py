@@ -0,0 +1,70 @@
+from django.conf import settings
+from django.db.models import Count, Q
+
+from .caching import VersionedCache
+from .models import Category, Industry, Machine
+
+facet_cache = VersionedCache(
+    'facets',
+    models=(Machine, Category, Industry),
+    timeout=getattr(settings, 'PORTAL_FACET_CACHE_TIMEOUT', 60 * 15),
+)
+
+
+def compute_facet_counts(form, queryset=None):
+    """Count machines per sidebar choice under the current filters.
+
+    Each facet is counted against every active filter except its own, so a
+    choice's count is what selecting it would return. That takes one grouped
+    query per facet regardless of how many categories or industries exist.
+    """
+    base = Machine.objects.all() if queryset is None else queryset
+
+    def scoped(facet):
+        return form.filter_queryset(base, exclude=(facet,)).order_by()
+
+    category = dict(
+        scoped('category').values_list('category').annotate(count=Count('pk', distinct=True))
+    )
+    industry = dict(
+        scoped('industry').values_list('industries').annotate(count=Count('pk', distinct=True))
+    )
+    # Machines without industries group under NULL through the outer join.
+    industry.pop(None, None)
+    availability = dict(
+        scoped('availability').values_list('availability_status').annotate(count=Count('pk', distinct=True))
+    )
+    financing = scoped('financing').aggregate(
+        count=Count('pk', filter=Q(financing_available=True), distinct=True)
+    )['count']
+
+    selected_category = form.cleaned_data.get('category') if form.is_valid() else None
+    if selected_category:
+        total = category.get(selected_category.pk, 0)
+    else:
+        total = sum(category.values())
+    return {
+        'total': total,
+        'category': category,
+        'industry': industry,
+        'availability': availability,
+        'financing': financing,
+    }
+
+
+def get_facet_counts(form):
+    return facet_cache.get_or_build(form.filter_key(), lambda: compute_facet_counts(form))
+
+
+def apply_facet_counts(form, counts):
+    """Append counts to the sidebar choice labels of ``form``."""
+    for facet in ('category', 'industry'):
+        field = form.fields[facet]
+        facet_counts = counts[facet]
+        field.label_from_instance = lambda obj, facet_counts=facet_counts: f'{obj} ({facet_counts.get(obj.pk, 0)})'
+    availability = form.fields['availability']
+    availability.choices = [
+        (value, f"{label} ({counts['availability'].get(value, 0)})" if value else label)
+        for value, label in availability.choices
+    ]
+    form.fields['financing'].label = f"{form.fields['financing'].label} ({counts['financing']})"
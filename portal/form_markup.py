@@ -0,0 +1,55 @@
+import copy
+
+from django.conf import settings
+from django.forms.widgets import ChoiceWidget
+from django.utils.html import conditional_escape
+from django.utils.safestring import mark_safe
+
+from .caching import VersionedCache
+from .models import Industry
+
+form_cache = VersionedCache(
+    'forms',
+    models=(Industry,),
+    timeout=getattr(settings, 'PORTAL_FORM_CACHE_TIMEOUT', 60 * 60 * 6),
+)
+
+
+def placeholder(name):
+    return f'__portal_initial_{name}__'
+
+
+def split_initial(form):
+    """``(substituted, keyed)`` initial values of an unbound form.
+
+    Strings shown as plain widget values are rendered as placeholders and
+    filled in afterwards, so one stored copy serves every value. Anything
+    else, such as a selected option, changes the markup and is part of the key.
+    """
+    substituted, keyed = {}, {}
+    for name, value in form.initial.items():
+        field = form.fields.get(name)
+        if field is not None and isinstance(value, str) and not isinstance(field.widget, ChoiceWidget):
+            substituted[name] = value
+        else:
+            keyed[name] = value
+    return substituted, keyed
+
+
+def render_form_markup(form, fragment, render):
+    """Markup for ``form`` from ``render(form)``, cached per fragment while the form is unbound."""
+    if form.is_bound:
+        return render(form)
+    substituted, keyed = split_initial(form)
+    parts = (type(form).__module__, type(form).__qualname__, fragment, form.prefix, sorted(keyed.items(), key=repr))
+
+    def build():
+        template_form = copy.copy(form)
+        template_form.initial = {**keyed, **{name: placeholder(name) for name in substituted}}
+        template_form._bound_fields_cache = {}
+        return str(render(template_form))
+
+    markup = form_cache.get_or_build(parts, build)
+    for name, value in substituted.items():
+        markup = markup.replace(placeholder(name), conditional_escape(value))
+    return mark_safe(markup)
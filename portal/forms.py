@@ -1,6 +1,59 @@
+from decimal import Decimal
+
 from django import forms
+from django.conf import settings
+from django.forms.models import ModelChoiceIterator
 
+from .caching import VersionedCache
 from .models import Category, CustomRequest, Industry, Machine
+from .search import get_search_backend
+
+choice_cache = VersionedCache(
+    'choices',
+    models=(Category, Industry),
+    timeout=getattr(settings, 'PORTAL_CHOICE_CACHE_TIMEOUT', 60 * 60 * 6),
+)
+
+
+class CachedModelChoiceIterator(ModelChoiceIterator):
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        for obj in self.field.snapshot():
+            yield self.choice(obj)
+
+    def __len__(self):
+        return len(self.field.snapshot()) + (self.field.empty_label is not None)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(self.field.snapshot())
+
+
+class CachedModelChoiceField(forms.ModelChoiceField):
+    """A ModelChoiceField whose options come from a cached snapshot of its queryset.
+
+    Meant for small lookup tables; the snapshot is rebuilt when any of
+    ``choice_cache.models`` changes. Submitted values are validated against
+    the snapshot too; one missing from it falls back to the database, since
+    the row may have been added after the snapshot was built. A row deleted
+    since then still validates, so forms that save the choice re-check it.
+    """
+
+    iterator = CachedModelChoiceIterator
+
+    def snapshot(self):
+        return choice_cache.get_or_build((self.queryset.model._meta.label, str(self.queryset.query)), lambda: list(self.queryset))
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        key = self.to_field_name or 'pk'
+        if isinstance(value, self.queryset.model):
+            value = getattr(value, key)
+        for obj in self.snapshot():
+            if str(obj.serializable_value(key)) == str(value):
+                return obj
+        return super().to_python(value)
 
 
 class CustomRequestForm(forms.ModelForm):
@@ -26,6 +79,7 @@ class CustomRequestForm(forms.ModelForm):
             'attachment',
             'preferred_contact_method',
         ]
+        field_classes = {'industry': CachedModelChoiceField}
         widgets = {
             'description': forms.Textarea(attrs={'rows': 5, 'placeholder': 'Share duty cycle, utilities, compliance standards, or critical specs.'}),
             'capacity_requirement': forms.TextInput(attrs={'placeholder': 'e.g. 5,000 units/hr or 30 tons per shift'}),
@@ -53,13 +107,19 @@ class CustomRequestForm(forms.ModelForm):
         max_budget = cleaned_data.get('budget_max')
         if min_budget and max_budget and min_budget > max_budget:
             self.add_error('budget_max', 'Maximum budget must be greater than or equal to minimum budget.')
+        industry = cleaned_data.get('industry')
+        # The choice may come from a stale snapshot; saving a deleted industry would fail on its foreign key.
+        if industry is not None and not Industry.objects.filter(pk=industry.pk).exists():
+            self.add_error('industry', forms.ValidationError(
+                self.fields['industry'].error_messages['invalid_choice'], code='invalid_choice',
+            ))
         return cleaned_data
 
 
 class MachineFilterForm(forms.Form):
     search = forms.CharField(required=False, label='Search keyword')
-    category = forms.ModelChoiceField(queryset=Category.objects.none(), required=False, empty_label='All categories')
-    industry = forms.ModelChoiceField(queryset=Industry.objects.none(), required=False, empty_label='All industries')
+    category = CachedModelChoiceField(queryset=Category.objects.none(), required=False, empty_label='All categories')
+    industry = CachedModelChoiceField(queryset=Industry.objects.none(), required=False, empty_label='All industries')
     availability = forms.ChoiceField(choices=[('', 'Availability')] + list(Machine.AVAILABILITY_CHOICES), required=False)
     financing = forms.BooleanField(required=False, label='Financing available')
     power_min = forms.DecimalField(required=False, min_value=0, label='Min kW')
@@ -77,3 +137,43 @@ class MachineFilterForm(forms.Form):
         if p_min and p_max and p_min > p_max:
             self.add_error('power_max', 'Max kW must be greater than min kW.')
         return cleaned_data
+
+    def filter_queryset(self, queryset, exclude=()):
+        """Apply the valid filters to a Machine queryset, skipping fields named in ``exclude``."""
+        if not self.is_valid():
+            return queryset
+        data = {name: value for name, value in self.cleaned_data.items() if name not in exclude}
+        if data.get('search'):
+            queryset = get_search_backend(queryset.db).search(queryset, data['search'])
+        if data.get('category'):
+            queryset = queryset.filter(category=data['category'])
+        if data.get('industry'):
+            queryset = queryset.filter(industries=data['industry'])
+        if data.get('availability'):
+            queryset = queryset.filter(availability_status=data['availability'])
+        if data.get('financing'):
+            queryset = queryset.filter(financing_available=True)
+        p_min = data.get('power_min')
+        p_max = data.get('power_max')
+        if p_min is not None:
+            queryset = queryset.filter(power_rating_kw__gte=p_min)
+        if p_max is not None:
+            queryset = queryset.filter(power_rating_kw__lte=p_max)
+        return queryset
+
+    def filter_key(self):
+        """Normalized, order-independent description of the active filters."""
+        if not self.is_valid():
+            return ()
+        key = []
+        for name, value in sorted(self.cleaned_data.items()):
+            if value in (None, '', False):
+                continue
+            if hasattr(value, 'pk'):
+                value = value.pk
+            elif isinstance(value, Decimal):
+                value = value.normalize()
+            elif name == 'search':
+                value = ' '.join(value.lower().split())
+            key.append((name, str(value)))
+        return tuple(key)
@@ -0,0 +1,228 @@
+import hashlib
+import io
+import json
+import logging
+import posixpath
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'WIDTHS': (320, 640, 960, 1440),
+    'QUALITY': 80,
+    'WORKERS': 2,
+    'LAZY': True,
+}
+
+CONTENT_TYPES = {'webp': 'image/webp', 'jpeg': 'image/jpeg', 'png': 'image/png'}
+EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg', 'png': 'png'}
+
+# (model label, field name) pairs whose uploads get derivatives.
+IMAGE_FIELDS = (
+    ('portal.Machine', 'hero_image'),
+    ('portal.MachineImage', 'image'),
+    ('portal.Partner', 'logo'),
+    ('portal.Testimonial', 'avatar'),
+    ('portal.SiteSettings', 'hero_background'),
+)
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'PORTAL_IMAGE_DERIVATIVES', {}))
+    return config
+
+
+def target_widths(source_width, widths):
+    targets = {width for width in widths if width < source_width}
+    targets.add(min(source_width, max(widths)))
+    return sorted(targets)
+
+
+def render_variants(source, widths, quality):
+    """Resize ``source`` bytes to each width as WebP plus a JPEG (or PNG, if transparent) fallback.
+
+    Runs inside the process pool, so it only deals in plain bytes and tuples.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(source)) as image:
+        image = ImageOps.exif_transpose(image)
+        has_alpha = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+        fallback = 'png' if has_alpha else 'jpeg'
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if has_alpha else 'RGB')
+        variants = []
+        for width in target_widths(image.width, widths):
+            height = max(1, round(image.height * width / image.width))
+            resized = image.resize((width, height), Image.LANCZOS) if width != image.width else image
+            for fmt in ('webp', fallback):
+                buffer = io.BytesIO()
+                if fmt == 'png':
+                    resized.save(buffer, 'PNG', optimize=True)
+                else:
+                    resized.save(buffer, fmt.upper(), quality=quality, optimize=True)
+                variants.append((width, fmt, buffer.getvalue()))
+        return image.width, image.height, variants
+
+
+class DerivativeStore:
+    """Generates and locates sized variants stored beside each original upload.
+
+    Variants are named ``<stem>.<hash>.<width>w.<ext>`` and listed in a
+    ``<name>.derivatives.json`` manifest next to the original, so they are
+    regenerated only when the source content hash changes.
+    """
+
+    def __init__(self):
+        self._executor = None
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=get_config()['WORKERS'])
+            return self._executor
+
+    def manifest_name(self, name):
+        return f'{name}.derivatives.json'
+
+    def cache_key(self, name):
+        return 'portal:derivatives:' + hashlib.sha1(name.encode('utf-8')).hexdigest()
+
+    def variant_name(self, name, digest, width, fmt):
+        stem = posixpath.splitext(name)[0]
+        return f'{stem}.{digest}.{width}w.{EXTENSIONS[fmt]}'
+
+    def read_manifest(self, storage, name):
+        manifest_name = self.manifest_name(name)
+        if not storage.exists(manifest_name):
+            return None
+        with storage.open(manifest_name) as handle:
+            return json.loads(handle.read())
+
+    def get_manifest(self, field_file, schedule=True):
+        """Return the manifest for ``field_file``, scheduling generation on a miss when lazy."""
+        if not field_file:
+            return None
+        key = self.cache_key(field_file.name)
+        manifest = cache.get(key)
+        if manifest is None:
+            manifest = self.read_manifest(field_file.storage, field_file.name)
+            if manifest is not None:
+                cache.set(key, manifest, None)
+        if manifest is None and schedule and get_config()['LAZY']:
+            self.schedule(field_file)
+        return manifest
+
+    def schedule(self, field_file):
+        """Generate derivatives on a background thread so the request never waits on Pillow."""
+        storage, name = field_file.storage, field_file.name
+        with self._lock:
+            if name in self._pending:
+                return
+            self._pending.add(name)
+        threading.Thread(target=self._generate_pending, args=(storage, name), daemon=True).start()
+
+    def _generate_pending(self, storage, name):
+        try:
+            self.generate(storage, name)
+        except Exception:
+            logger.exception('Could not generate image derivatives for %s', name)
+            # Back off instead of re-reading a missing or unreadable source on every render.
+            cache.set(self.cache_key(name), {'hash': None, 'variants': {}}, 300)
+        finally:
+            with self._lock:
+                self._pending.discard(name)
+
+    def prepare(self, storage, name, force=False):
+        """Read the source; return ``None`` when its manifest already matches the content hash."""
+        with storage.open(name) as handle:
+            source = handle.read()
+        digest = hashlib.sha256(source).hexdigest()[:12]
+        previous = self.read_manifest(storage, name)
+        if previous and previous.get('hash') == digest and not force:
+            cache.set(self.cache_key(name), previous, None)
+            return None
+        return source, digest, previous
+
+    def submit(self, source):
+        config = get_config()
+        return self.executor.submit(render_variants, source, tuple(config['WIDTHS']), config['QUALITY'])
+
+    def generate(self, storage, name, force=False):
+        prepared = self.prepare(storage, name, force=force)
+        if prepared is None:
+            return None
+        source, digest, previous = prepared
+        return self._store(storage, name, digest, previous, self.submit(source))
+
+    def generate_many(self, items, force=False):
+        """Render ``(storage, name)`` pairs in parallel; yields ``(name, manifest or None)``."""
+        pending = []
+        for storage, name in items:
+            prepared = self.prepare(storage, name, force=force)
+            if prepared is None:
+                yield name, None
+                continue
+            source, digest, previous = prepared
+            pending.append((storage, name, digest, previous, self.submit(source)))
+            if len(pending) >= get_config()['WORKERS'] * 4:
+                storage, name, digest, previous, future = pending.pop(0)
+                yield name, self._store(storage, name, digest, previous, future)
+        for storage, name, digest, previous, future in pending:
+            yield name, self._store(storage, name, digest, previous, future)
+
+    def _store(self, storage, name, digest, previous, future):
+        try:
+            width, height, variants = future.result()
+        except Exception:
+            logger.exception('Could not render image derivatives for %s', name)
+            # Record the failure against this hash so requests stop retrying it.
+            width, height, variants = None, None, []
+        manifest = {'hash': digest, 'width': width, 'height': height, 'variants': {}}
+        for variant_width, fmt, data in variants:
+            variant_name = self.variant_name(name, digest, variant_width, fmt)
+            if storage.exists(variant_name):
+                storage.delete(variant_name)
+            stored_name = storage.save(variant_name, ContentFile(data))
+            manifest['variants'].setdefault(fmt, []).append([variant_width, stored_name])
+        manifest_name = self.manifest_name(name)
+        if storage.exists(manifest_name):
+            storage.delete(manifest_name)
+        storage.save(manifest_name, ContentFile(json.dumps(manifest).encode('utf-8')))
+        if previous:
+            current = {stored for entries in manifest['variants'].values() for _, stored in entries}
+            for entries in previous.get('variants', {}).values():
+                for _, stale in entries:
+                    if stale not in current and storage.exists(stale):
+                        storage.delete(stale)
+        cache.set(self.cache_key(name), manifest, None)
+        return manifest
+
+
+derivatives = DerivativeStore()
+
+
+def srcset_for(field_file, fmt=None):
+    """Return ``(format, content_type, srcset, variants)`` tuples, WebP first, or ``[]`` if not built yet."""
+    manifest = derivatives.get_manifest(field_file)
+    if not manifest or not manifest.get('variants'):
+        return []
+    storage = field_file.storage
+    formats = [fmt] if fmt else list(manifest['variants'])
+    entries = []
+    for name in formats:
+        variants = manifest['variants'].get(name)
+        if not variants:
+            continue
+        srcset = ', '.join(f'{storage.url(stored)} {width}w' for width, stored in variants)
+        entries.append((name, CONTENT_TYPES[name], srcset, variants))
+    return entries
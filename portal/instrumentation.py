@@ -0,0 +1,155 @@
+import json
+import logging
+import random
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger('portal.timing')
+
+_request_wrappers = ContextVar('portal_request_wrappers', default=())
+
+DEFAULTS = {
+    'ENABLED': False,
+    # Fraction of requests instrumented; the rest pass through untouched.
+    'SAMPLE_RATE': 1.0,
+    'HEADER': True,
+    'LOG': True,
+    # Only log sampled requests at least this slow (ms); 0 logs every sampled request.
+    'LOG_THRESHOLD_MS': 0,
+}
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'PORTAL_REQUEST_TIMING', {}))
+    return config
+
+
+@contextmanager
+def wrap_request_queries(wrapper):
+    """Install ``wrapper`` on this thread's connections for the block.
+
+    Threads the request hands work to pick it up with ``inherit_request_wrappers``.
+    """
+    token = _request_wrappers.set(_request_wrappers.get() + (wrapper,))
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(wrapper))
+            yield
+    finally:
+        _request_wrappers.reset(token)
+
+
+@contextmanager
+def inherit_request_wrappers():
+    """Install the calling request's wrappers on the current thread's connections."""
+    with ExitStack() as stack:
+        for wrapper in _request_wrappers.get():
+            for connection in connections.all():
+                if wrapper not in connection.execute_wrappers:
+                    stack.enter_context(connection.execute_wrapper(wrapper))
+        yield
+
+
+class RequestTimings:
+    def __init__(self):
+        # Queries may run on section pool threads as well as the request thread.
+        self.lock = threading.Lock()
+        self.queries = 0
+        self.sql = 0.0
+        self.render = 0.0
+        self.render_started = None
+        self.total = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            with self.lock:
+                self.sql += time.perf_counter() - started
+                self.queries += 1
+
+    def start_render(self):
+        self.render_started = time.perf_counter()
+
+    def finish_render(self, response):
+        if self.render_started is not None:
+            self.render += time.perf_counter() - self.render_started
+            self.render_started = None
+        return response
+
+    @property
+    def view(self):
+        return max(self.total - self.render, 0.0)
+
+    def server_timing(self):
+        return ', '.join([
+            f'db;dur={self.sql * 1000:.1f};desc="{self.queries} queries"',
+            f'view;dur={self.view * 1000:.1f}',
+            f'render;dur={self.render * 1000:.1f}',
+            f'total;dur={self.total * 1000:.1f}',
+        ])
+
+    def as_dict(self):
+        return {
+            'queries': self.queries,
+            'sql_ms': round(self.sql * 1000, 2),
+            'view_ms': round(self.view * 1000, 2),
+            'render_ms': round(self.render * 1000, 2),
+            'total_ms': round(self.total * 1000, 2),
+        }
+
+
+class RequestTimingMiddleware:
+    """Reports query count, SQL, view and template render time per request.
+
+    Emits a ``Server-Timing`` header and a JSON log line on ``portal.timing``.
+    Disabled unless ``PORTAL_REQUEST_TIMING['ENABLED']`` is set, and only a
+    ``SAMPLE_RATE`` fraction of requests pay for the instrumentation. SQL
+    issued while a lazy queryset is evaluated in a template counts towards
+    both db and render.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.config = get_config()
+        if not self.config['ENABLED']:
+            raise MiddlewareNotUsed
+
+    def __call__(self, request):
+        if self.config['SAMPLE_RATE'] < 1 and random.random() >= self.config['SAMPLE_RATE']:
+            return self.get_response(request)
+        timings = RequestTimings()
+        request.timings = timings
+        started = time.perf_counter()
+        with wrap_request_queries(timings):
+            response = self.get_response(request)
+        timings.total = time.perf_counter() - started
+        if self.config['HEADER']:
+            response['Server-Timing'] = timings.server_timing()
+        if self.config['LOG'] and timings.total * 1000 >= self.config['LOG_THRESHOLD_MS']:
+            view = getattr(request, 'resolver_match', None)
+            logger.info('request_timing %s', json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'view': view.view_name if view else None,
+                'status': response.status_code,
+                **timings.as_dict(),
+            }))
+        return response
+
+    def process_template_response(self, request, response):
+        # TemplateResponses render right after this hook returns.
+        timings = getattr(request, 'timings', None)
+        if timings is not None:
+            timings.start_render()
+            response.add_post_render_callback(timings.finish_render)
+        return response
@@ -0,0 +1,63 @@
+from django.conf import settings
+
+from .caching import SectionCache
+from .models import (
+    Category,
+    FAQ,
+    HeroMetric,
+    Industry,
+    Machine,
+    MachineImage,
+    Partner,
+    ServiceOffering,
+    SiteSettings,
+    Testimonial,
+    ValueProposition,
+)
+from .site_settings import get_site_settings
+
+landing_cache = SectionCache('landing', timeout=getattr(settings, 'PORTAL_LANDING_CACHE_TIMEOUT', 60 * 60 * 6))
+
+
+@landing_cache.section('metrics', SiteSettings, HeroMetric)
+def build_metrics():
+    return list(get_site_settings().metrics.all())
+
+
+@landing_cache.section('value_props', SiteSettings, ValueProposition)
+def build_value_props():
+    return list(get_site_settings().value_props.all())
+
+
+@landing_cache.section('industries', Industry)
+def build_industries():
+    return list(Industry.objects.all())
+
+
+@landing_cache.section('services', ServiceOffering)
+def build_services():
+    return list(ServiceOffering.objects.all())
+
+
+@landing_cache.section('featured_machines', Machine, Category, Industry, MachineImage)
+def build_featured_machines():
+    return list(
+        Machine.objects.filter(is_featured=True)
+        .select_related('category')
+        .prefetch_related('industries', 'images')[:6]
+    )
+
+
+@landing_cache.section('testimonials', Testimonial, Industry)
+def build_testimonials():
+    return list(Testimonial.objects.select_related('industry')[:6])
+
+
+@landing_cache.section('partners', Partner)
+def build_partners():
+    return list(Partner.objects.all())
+
+
+@landing_cache.section('faqs', FAQ)
+def build_faqs():
+    return list(FAQ.objects.all())
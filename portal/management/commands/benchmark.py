@@ -0,0 +1,68 @@
+import io
+import shutil
+import tempfile
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from portal.benchmarks import run_benchmarks, write_report
+from portal.synthetic import SyntheticCatalogue
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the portal views against a generated dataset and check them against their budgets.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, default=2000, help='Synthetic machines in the benchmark database.')
+        parser.add_argument('--requests', type=int, help='Synthetic custom requests (defaults to --scale).')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--iterations', type=int, default=10, help='Timed requests per scenario.')
+        parser.add_argument('--only', action='append', help='Only run scenarios whose name contains this text (repeatable).')
+        parser.add_argument('--output', help='Write the JSON report to this path.')
+        parser.add_argument('--keepdb', action='store_true', help='Keep the benchmark database between runs.')
+        parser.add_argument('--no-timing-budgets', action='store_true', help='Only enforce query budgets.')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        # Benchmarks run against a throwaway test database, never the configured one.
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        media_root = tempfile.mkdtemp(prefix='portal-benchmark-')
+        try:
+            with override_settings(
+                MEDIA_ROOT=media_root,
+                STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage',
+            ):
+                report = self.run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+            shutil.rmtree(media_root, ignore_errors=True)
+
+        for result in report['results']:
+            flag = ' !' if result['violations'] else ''
+            self.stdout.write(
+                f"{result['name']:<60} {result['queries']:>3} q  p50 {result['p50_ms']:>8.1f} ms  "
+                f"p95 {result['p95_ms']:>8.1f} ms  {result['memory_kb'] or 0:>8.0f} KiB{flag}"
+            )
+        if options['output']:
+            write_report(report, options['output'])
+            self.stdout.write(f"Report written to {options['output']}")
+        if report['violations']:
+            for violation in report['violations']:
+                self.stderr.write(f'  {violation}')
+            raise CommandError(f"{len(report['violations'])} budget violation(s).")
+        self.stdout.write(self.style.SUCCESS(f"{len(report['results'])} scenarios within budget."))
+
+    def run(self, options):
+        scale = options['scale']
+        requests = scale if options['requests'] is None else options['requests']
+        self.stdout.write(f'Preparing dataset: {scale} machines, {requests} requests...')
+        call_command('seed_data', stdout=io.StringIO())
+        SyntheticCatalogue(seed=options['seed']).generate(machines=scale, requests=requests)
+        return run_benchmarks(
+            iterations=options['iterations'],
+            only=options['only'],
+            check_timing=not options['no_timing_budgets'],
+        )
@@ -0,0 +1,97 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from portal.benchmarks import load_test
+from portal.models import Category, Machine
+
+PROFILES = ('wsgi', 'asgi')
+
+
+class Command(BaseCommand):
+    help = 'Compare tail latency of the WSGI and ASGI deployment profiles under concurrent load on a local server.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profile', action='append', choices=PROFILES, help='Profiles to run (default: both).')
+        parser.add_argument('--concurrency', type=int, default=16, help='Simultaneous client connections.')
+        parser.add_argument('--requests', type=int, default=400, help='Requests per profile, spread over the paths.')
+        parser.add_argument('--workers', type=int, default=2, help='Server worker processes.')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--path', action='append', dest='paths', help='Path to request (repeatable; defaults to landing, catalogue and a machine).')
+        parser.add_argument('--page-cache', action='store_true', help='Leave the anonymous page cache on (it hides the view work being compared).')
+        parser.add_argument('--output', help='Write the JSON report to this path.')
+
+    def handle(self, *args, **options):
+        paths = options['paths'] or self.default_paths()
+        base_url = f"http://127.0.0.1:{options['port']}"
+        report = {'paths': paths, 'profiles': {}}
+        for profile in options['profile'] or PROFILES:
+            self.stdout.write(f'Starting the {profile} profile with {options["workers"]} workers...')
+            server = self.start_server(profile, options)
+            try:
+                self.wait_until_ready(base_url, server)
+                self.warm_up(base_url, paths)
+                result = load_test(base_url, paths, options['concurrency'], options['requests'])
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+            report['profiles'][profile] = result
+            self.stdout.write(f"{profile}: {result['throughput_rps']} requests/s at concurrency {options['concurrency']}")
+            for path, stats in result['paths'].items():
+                self.stdout.write(
+                    f"  {path:<50} p50 {stats['p50_ms'] or 0:>8.1f} ms  p95 {stats['p95_ms'] or 0:>8.1f} ms  "
+                    f"p99 {stats['p99_ms'] or 0:>8.1f} ms  errors {stats['errors']}"
+                )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as handle:
+                json.dump(report, handle, indent=2)
+            self.stdout.write(f"Report written to {options['output']}")
+
+    def default_paths(self):
+        machine = Machine.objects.order_by('-is_featured', 'name', 'id').first()
+        if machine is None:
+            raise CommandError('The database has no machines; run seed_data --scale N first.')
+        paths = [reverse('portal:landing'), reverse('portal:machine_list'), machine.get_absolute_url()]
+        category = Category.objects.filter(machines__isnull=False).order_by('display_order', 'name').first()
+        if category is not None:
+            paths.append(f"{reverse('portal:machine_list')}?category={category.pk}")
+        return paths
+
+    def start_server(self, profile, options):
+        env = dict(os.environ, PORTAL_WORKERS=str(options['workers']))
+        if not options['page_cache']:
+            env['PORTAL_PAGE_CACHE'] = 'false'
+        config = os.path.join(settings.BASE_DIR, 'deploy', f'gunicorn_{profile}.py')
+        command = [sys.executable, '-m', 'gunicorn', '-c', config, '--bind', f"127.0.0.1:{options['port']}", '--log-level', 'warning']
+        return subprocess.Popen(command, cwd=settings.BASE_DIR, env=env)
+
+    def warm_up(self, base_url, paths):
+        for path in paths:
+            try:
+                urllib.request.urlopen(f'{base_url}{path}', timeout=30).read()
+            except urllib.error.HTTPError as exc:
+                # Usually a missing static manifest: the profiles serve collected static files.
+                raise CommandError(f'{path} answered HTTP {exc.code}; has collectstatic been run?')
+
+    def wait_until_ready(self, base_url, server, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f'The server exited with status {server.returncode}.')
+            try:
+                urllib.request.urlopen(base_url, timeout=5).read()
+                return
+            except urllib.error.HTTPError:
+                return
+            except (urllib.error.URLError, socket.error):
+                time.sleep(0.2)
+        raise CommandError(f'The server did not answer within {timeout} seconds.')
@@ -0,0 +1,38 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from portal.images import IMAGE_FIELDS, derivatives
+
+
+class Command(BaseCommand):
+    help = 'Generate responsive WebP/JPEG derivatives for uploaded catalogue, hero, partner and testimonial images.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Regenerate even when the source hash is unchanged.')
+
+    def handle(self, *args, **options):
+        items = []
+        for label, field_name in IMAGE_FIELDS:
+            model = apps.get_model(label)
+            storage = model._meta.get_field(field_name).storage
+            names = (
+                model.objects.exclude(**{f'{field_name}__isnull': True})
+                .exclude(**{field_name: ''})
+                .values_list(field_name, flat=True)
+                .distinct()
+            )
+            items.extend((storage, name) for name in names)
+
+        generated = skipped = failed = 0
+        for name, manifest in derivatives.generate_many(items, force=options['force']):
+            if manifest is None:
+                skipped += 1
+            elif manifest['variants']:
+                generated += 1
+                self.stdout.write(f'  {name}: {sum(len(v) for v in manifest["variants"].values())} variants')
+            else:
+                failed += 1
+                self.stderr.write(f'  {name}: could not be rendered')
+        self.stdout.write(self.style.SUCCESS(
+            f'Derivatives generated for {generated} images, {skipped} up to date, {failed} failed.'
+        ))
@@ -0,0 +1,48 @@
+import io
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from portal.catalogue_import import CatalogueImporter, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Stream a supplier catalogue (CSV or JSON Lines) into Machine rows using bulk writes; rows with a slug update that machine.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV or .jsonl file to import, or '-' for stdin.")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Input format; inferred from the file extension by default.')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Rows written per transaction.')
+        parser.add_argument('--no-create', action='store_true', help='Reject rows whose category does not exist instead of creating it.')
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+
+        def progress(imported, errors, elapsed):
+            rate = imported / elapsed if elapsed else 0
+            self.stdout.write(f'{imported} machines imported, {errors} rejected, {rate:,.0f} rows/sec')
+
+        importer = CatalogueImporter(
+            chunk_size=options['chunk_size'],
+            create_missing=not options['no_create'],
+            using=options['database'],
+            progress=progress,
+        )
+        try:
+            if path == '-':
+                stream = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8-sig', newline='')
+                importer.run(read_rows(stream, fmt))
+            else:
+                with open(path, encoding='utf-8-sig', newline='') as handle:
+                    importer.run(read_rows(handle, fmt))
+        except OSError as exc:
+            raise CommandError(f'Could not read {path}: {exc}')
+
+        for line_number, message in importer.errors[:20]:
+            location = f'line {line_number}' if line_number else 'row'
+            self.stderr.write(f'  {location}: {message}')
+        if len(importer.errors) > 20:
+            self.stderr.write(f'  ... and {len(importer.errors) - 20} more')
+        self.stdout.write(self.style.SUCCESS(f'Imported {importer.imported} machines ({len(importer.errors)} rejected).'))
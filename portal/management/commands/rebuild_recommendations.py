@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from portal.recommendations import rebuild_recommendations
+
+
+class Command(BaseCommand):
+    help = 'Recompute the related-machine recommendations for the whole catalogue.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help='Database alias to rebuild.')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        count = rebuild_recommendations(options['database'], chunk_size=options['chunk_size'])
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f'Recomputed recommendations for {count} machines in {elapsed:.1f}s.'))
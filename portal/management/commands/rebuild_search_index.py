@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from portal.search import MACHINE_INDEX, REQUEST_INDEX, get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the machine catalogue and custom request search indexes from their tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help='Database alias to rebuild.')
+
+    def handle(self, *args, **options):
+        for spec in (MACHINE_INDEX, REQUEST_INDEX):
+            backend = get_search_backend(options['database'], spec)
+            count = backend.rebuild()
+            self.stdout.write(self.style.SUCCESS(f'Indexed {count} {spec.name} with {backend.__class__.__name__}.'))
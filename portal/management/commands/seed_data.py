@@ -1,3 +1,4 @@
+import time
 from decimal import Decimal
 
 from django.core.management.base import BaseCommand
@@ -14,12 +15,41 @@ from portal.models import (
     Testimonial,
     ValueProposition,
 )
+from portal.synthetic import SyntheticCatalogue
 
 
 class Command(BaseCommand):
     help = 'Seed the database with showcase content for Titan Nexus Industrial Supply.'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, default=0, help='Also generate this many synthetic machines for load testing.')
+        parser.add_argument('--requests', type=int, help='Synthetic custom requests to generate (defaults to --scale).')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed; the same seed always produces the same rows.')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows written per transaction.')
+
     def handle(self, *args, **options):
+        self.seed_showcase()
+        self.stdout.write(self.style.SUCCESS('Seed data successfully applied.'))
+        scale = options['scale']
+        requests = scale if options['requests'] is None else options['requests']
+        if scale or requests:
+            self.seed_synthetic(scale, requests, options['seed'], options['chunk_size'])
+
+    def seed_synthetic(self, machines, requests, seed, chunk_size):
+        started = time.monotonic()
+
+        def progress(kind, done, total, elapsed):
+            rate = done / elapsed if elapsed else 0
+            self.stdout.write(f'{done}/{total} synthetic {kind}, {rate:,.0f} rows/sec')
+
+        generator = SyntheticCatalogue(seed=seed, chunk_size=chunk_size, progress=progress)
+        created_machines, created_requests = generator.generate(machines=machines, requests=requests)
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {created_machines} synthetic machines and {created_requests} requests '
+            f'in {time.monotonic() - started:.1f}s.'
+        ))
+
+    def seed_showcase(self):
         settings = SiteSettings.load()
         settings.tagline = 'Powering production with precision partnerships'
         settings.hero_title = 'Heavy machinery, delivered with intelligence'
@@ -262,5 +292,3 @@ class Command(BaseCommand):
                 question=question,
                 defaults={'answer': answer, 'display_order': order},
             )
-
-        self.stdout.write(self.style.SUCCESS('Seed data successfully applied.'))
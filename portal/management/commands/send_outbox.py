@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from portal.notifications import deliver_batch, get_config
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued notification emails from the outbox, retrying failures with backoff.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help='Messages sent per SMTP connection.')
+        parser.add_argument('--loop', action='store_true', help='Keep polling instead of exiting once the outbox is drained.')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds to sleep between polls in --loop mode.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size'] or get_config()['BATCH_SIZE']
+        totals = [0, 0, 0]
+        while True:
+            sent, retried, dead = deliver_batch(batch_size)
+            totals = [totals[0] + sent, totals[1] + retried, totals[2] + dead]
+            if sent or retried or dead:
+                self.stdout.write(f'Batch: {sent} sent, {retried} scheduled for retry, {dead} dead-lettered.')
+            if sent + retried + dead < batch_size:
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Outbox drained: {totals[0]} sent, {totals[1]} retrying, {totals[2]} dead-lettered.'
+        ))
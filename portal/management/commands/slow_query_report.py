@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from portal.slow_queries import full_scans, get_config, read_log, summarize
+
+
+class Command(BaseCommand):
+    help = 'Summarize the slow query log by fingerprint, worst total time first, with EXPLAIN plans.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log', help='Slow query log to read (defaults to PORTAL_SLOW_QUERIES LOG_FILE).')
+        parser.add_argument('--limit', type=int, default=10, help='Number of fingerprints to show.')
+        parser.add_argument('--since', help='Only count entries at or after this ISO timestamp.')
+        parser.add_argument('--no-plans', action='store_true', help='Omit EXPLAIN output.')
+
+    def handle(self, *args, **options):
+        path = options['log'] or get_config()['LOG_FILE']
+        if not path:
+            raise CommandError('No slow query log configured; pass --log.')
+        try:
+            entries = list(read_log(path))
+        except FileNotFoundError:
+            self.stdout.write(f'No slow queries recorded yet ({path} does not exist).')
+            return
+        if options['since']:
+            entries = [entry for entry in entries if entry['at'] >= options['since']]
+        groups = summarize(entries)
+        self.stdout.write(f'{len(entries)} slow queries in {len(groups)} fingerprints from {path}\n')
+        for rank, group in enumerate(groups[:options['limit']], start=1):
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"#{rank} {group['fingerprint']}  {group['count']}x  total {group['total_ms']:.0f} ms  "
+                f"mean {group['mean_ms']:.1f} ms  max {group['max_ms']:.1f} ms  last {group['last_seen']}"
+            ))
+            self.stdout.write(f"  {group['sql']}")
+            views = ', '.join(f'{view} ({count})' for view, count in group['views'].most_common(3))
+            self.stdout.write(f'  views:   {views}')
+            for caller, count in group['callers'].most_common(3):
+                self.stdout.write(f'  caller:  {caller} ({count})')
+            scans = full_scans(group['plan'])
+            if scans:
+                self.stdout.write(self.style.WARNING(f"  full scans: {'; '.join(scans)}"))
+            if group['plan'] and not options['no_plans']:
+                self.stdout.write('  plan:')
+                for line in group['plan']:
+                    self.stdout.write(f'    {line}')
+            self.stdout.write('')
@@ -0,0 +1,83 @@
+import multiprocessing
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+
+from portal.benchmarks import percentile
+from portal.models import CustomRequest, OutboxMessage, RequestStatusLog
+
+
+def submit_batch(run_id, worker, submissions):
+    """Post ``submissions`` custom requests through the real view; returns ``(accepted, timings_ms, errors)``."""
+    client = Client()
+    accepted, timings, errors = 0, [], []
+    for number in range(submissions):
+        data = {
+            'contact_name': 'Stress Tester',
+            'company_name': f'stress-{run_id}-{worker}-{number}',
+            'email': 'stress@example.com',
+            'machine_type': 'Concurrent writer',
+            'currency': 'USD',
+            'description': 'Concurrent submission stress test.',
+        }
+        started = time.perf_counter()
+        try:
+            response = client.post(reverse('portal:custom_request'), data)
+        except Exception as exc:
+            errors.append(f'{type(exc).__name__}: {exc}')
+            continue
+        timings.append((time.perf_counter() - started) * 1000)
+        if response.status_code == 302:
+            accepted += 1
+        else:
+            errors.append(f'HTTP {response.status_code}')
+    connections.close_all()
+    return accepted, timings, errors
+
+
+class Command(BaseCommand):
+    help = 'Submit custom requests from concurrent worker processes and check that none are lost.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=8, help='Concurrent writer processes, like gunicorn workers.')
+        parser.add_argument('--submissions', type=int, default=25, help='Custom requests submitted by each process.')
+        parser.add_argument('--keep', action='store_true', help='Keep the submitted requests instead of deleting them.')
+
+    def handle(self, *args, **options):
+        run_id = uuid.uuid4().hex[:8]
+        processes, submissions = options['processes'], options['submissions']
+        self.stdout.write(f'{processes} processes x {submissions} submissions against {connections["default"].settings_dict["NAME"]}...')
+        # Children must open their own connections rather than share the parent's.
+        connections.close_all()
+        started = time.perf_counter()
+        with multiprocessing.get_context('fork').Pool(processes) as pool:
+            results = pool.starmap(submit_batch, [(run_id, worker, submissions) for worker in range(processes)])
+        elapsed = time.perf_counter() - started
+
+        accepted = sum(result[0] for result in results)
+        timings = [ms for result in results for ms in result[1]]
+        errors = [error for result in results for error in result[2]]
+        stored = CustomRequest.objects.filter(company_name__startswith=f'stress-{run_id}-')
+        saved = stored.count()
+        logs = RequestStatusLog.objects.filter(custom_request__in=stored).count()
+        notifications = OutboxMessage.objects.filter(custom_request__in=stored).count()
+        self.stdout.write(
+            f'{accepted}/{processes * submissions} accepted in {elapsed:.1f} s; {saved} requests, {logs} status logs and '
+            f'{notifications} notifications stored; {len(errors)} errors'
+        )
+        if timings:
+            self.stdout.write(f'latency p50 {percentile(timings, 0.5):.1f} ms  p95 {percentile(timings, 0.95):.1f} ms  max {max(timings):.1f} ms')
+        for error in sorted(set(errors))[:5]:
+            self.stderr.write(f'  {error}')
+        if not options['keep']:
+            OutboxMessage.objects.filter(custom_request__in=stored).delete()
+            stored.delete()
+
+        lost = accepted - saved
+        if errors or lost or logs != saved:
+            raise CommandError(f'{len(errors)} failed submissions, {lost} accepted but not stored, {saved - logs} without a status log.')
+        self.stdout.write(self.style.SUCCESS('No lost submissions.'))
@@ -0,0 +1,45 @@
+import sqlite3
+import time
+from contextlib import closing
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from portal.caching import cache_is_shared
+from portal.replication import copy_database, replica_alias
+from portal.signals import invalidate_catalogue_caches
+
+
+class Command(BaseCommand):
+    help = 'Copy the primary SQLite database over the read replica file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep copying whenever the primary changes instead of exiting.')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds between change checks in --loop mode.')
+
+    def handle(self, *args, **options):
+        alias = replica_alias()
+        if alias is None:
+            raise CommandError('No replica is configured; set DJANGO_DB_REPLICA_NAME.')
+        primary, replica = connections[DEFAULT_DB_ALIAS], connections[alias]
+        if not cache_is_shared():
+            raise CommandError('Caches refreshed here would not reach the web workers; set DJANGO_CACHE_BACKEND to a shared cache.')
+        if primary.vendor != 'sqlite' or replica.vendor != 'sqlite':
+            raise CommandError('sync_replica copies SQLite files; use the database server\'s own replication otherwise.')
+
+        target = replica.settings_dict['NAME']
+        with closing(sqlite3.connect(primary.settings_dict['NAME'], timeout=30)) as source:
+            copied = None
+            while True:
+                # data_version changes whenever another connection commits to the primary.
+                version = source.execute('PRAGMA data_version').fetchone()[0]
+                if version != copied:
+                    started = time.perf_counter()
+                    copy_database(source, target)
+                    copied = version
+                    # Pages rebuilt from the replica before the copy may hold stale data.
+                    invalidate_catalogue_caches()
+                    self.stdout.write(f'Copied the primary to {target} in {(time.perf_counter() - started) * 1000:.0f} ms.')
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
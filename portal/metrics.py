@@ -0,0 +1,248 @@
+import atexit
+import glob
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+import uuid
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .caching import all_stats
+from .instrumentation import wrap_request_queries
+from .models import OutboxMessage
+from .notifications import outbox_backlog
+
+DEFAULTS = {
+    'ENABLED': False,
+    # Each worker writes its own snapshot here; /metrics sums them. Clear it on deploy.
+    'DIRECTORY': os.path.join(tempfile.gettempdir(), 'portal-metrics'),
+    # Seconds between snapshot writes per worker; 0 writes after every request.
+    'FLUSH_INTERVAL': 5,
+    # Bearer token for scrapers; staff sessions may always read /metrics.
+    'TOKEN': '',
+    'LATENCY_BUCKETS': (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    'QUERY_BUCKETS': (1, 2, 5, 10, 20, 50, 100),
+}
+
+HELP = {
+    'portal_http_requests_total': ('counter', 'HTTP requests by URL name, method and status.'),
+    'portal_http_request_duration_seconds': ('histogram', 'Request latency by URL name.'),
+    'portal_db_queries_per_request': ('histogram', 'Database queries per request by URL name.'),
+    'portal_custom_requests_total': ('counter', 'Custom machinery requests submitted.'),
+    'portal_cache_hits_total': ('counter', 'Portal cache hits.'),
+    'portal_cache_misses_total': ('counter', 'Portal cache misses.'),
+    'portal_cache_hit_ratio': ('gauge', 'Portal cache hit ratio across all workers.'),
+    'portal_outbox_backlog': ('gauge', 'Notifications waiting to be sent.'),
+    'portal_outbox_dead_letters': ('gauge', 'Notifications that exhausted their retries.'),
+}
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'PORTAL_METRICS', {}))
+    return config
+
+
+def label_key(labels):
+    return tuple(sorted((labels or {}).items()))
+
+
+class Registry:
+    """Process-local counters and histograms, periodically written to a per-process snapshot file."""
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self.lock = threading.Lock()
+        self.last_flush = 0.0
+        # pid plus a random suffix, so a recycled pid never overwrites a dead worker's totals.
+        self.process_id = f'{os.getpid()}-{uuid.uuid4().hex[:8]}'
+        self.owner_pid = os.getpid()
+
+    def inc(self, name, labels=None, value=1):
+        key = (name, label_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, buckets, labels=None):
+        key = (name, label_key(labels))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {'buckets': list(buckets), 'counts': [0] * len(buckets), 'sum': 0.0, 'count': 0}
+            index = bisect_left(histogram['buckets'], value)
+            if index < len(histogram['counts']):
+                histogram['counts'][index] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    def snapshot(self):
+        with self.lock:
+            counters = [[name, dict(labels), value] for (name, labels), value in self.counters.items()]
+            histograms = [[name, dict(labels), {**histogram, 'counts': list(histogram['counts'])}] for (name, labels), histogram in self.histograms.items()]
+        # Cache statistics are already cumulative per process; publish their current totals.
+        for cache_name, stats in all_stats().items():
+            counters.append(['portal_cache_hits_total', {'cache': cache_name}, stats['hits']])
+            counters.append(['portal_cache_misses_total', {'cache': cache_name}, stats['misses']])
+        return {'counters': counters, 'histograms': histograms}
+
+    def flush(self, directory=None, force=False):
+        config = get_config()
+        now = time.monotonic()
+        if not force and now - self.last_flush < config['FLUSH_INTERVAL']:
+            return
+        if os.getpid() != self.owner_pid:
+            # Forked after import (gunicorn --preload): start a fresh identity and counts.
+            self.__init__()
+        self.last_flush = now
+        directory = directory or config['DIRECTORY']
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{self.process_id}.json')
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as handle:
+            json.dump(self.snapshot(), handle)
+        os.replace(temporary, path)
+
+
+registry = Registry()
+
+
+def _flush_at_exit():
+    if get_config()['ENABLED']:
+        try:
+            registry.flush(force=True)
+        except OSError:
+            pass
+
+
+atexit.register(_flush_at_exit)
+
+
+def collect(directory=None):
+    """Sum every worker's snapshot into ``(counters, histograms)`` keyed by ``(name, labels)``."""
+    directory = directory or get_config()['DIRECTORY']
+    counters, histograms = {}, {}
+    for path in glob.glob(os.path.join(directory, '*.json')):
+        try:
+            with open(path, encoding='utf-8') as handle:
+                snapshot = json.load(handle)
+        except (OSError, ValueError):
+            continue
+        for name, labels, value in snapshot['counters']:
+            key = (name, label_key(labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, histogram in snapshot['histograms']:
+            key = (name, label_key(labels))
+            total = histograms.get(key)
+            if total is None or total['buckets'] != histogram['buckets']:
+                histograms[key] = {**histogram, 'counts': list(histogram['counts'])}
+                continue
+            total['counts'] = [a + b for a, b in zip(total['counts'], histogram['counts'])]
+            total['sum'] += histogram['sum']
+            total['count'] += histogram['count']
+    return counters, histograms
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{escape_label(value)}"' for key, value in pairs) + '}'
+
+
+def format_value(value):
+    if isinstance(value, float) and math.isinf(value):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(counters, histograms, gauges):
+    """Render metrics in the Prometheus text exposition format (0.0.4)."""
+    series = {}
+    for (name, labels), value in sorted(counters.items()):
+        series.setdefault(name, []).append(f'{name}{format_labels(labels)} {format_value(value)}')
+    for (name, labels), histogram in sorted(histograms.items(), key=lambda item: item[0]):
+        lines = series.setdefault(name, [])
+        cumulative = 0
+        for bound, count in zip(histogram['buckets'], histogram['counts']):
+            cumulative += count
+            lines.append(f"{name}_bucket{format_labels(labels, [('le', format_value(float(bound)))])} {cumulative}")
+        lines.append(f"{name}_bucket{format_labels(labels, [('le', '+Inf')])} {histogram['count']}")
+        lines.append(f"{name}_sum{format_labels(labels)} {format_value(float(histogram['sum']))}")
+        lines.append(f"{name}_count{format_labels(labels)} {histogram['count']}")
+    for (name, labels), value in sorted(gauges.items()):
+        series.setdefault(name, []).append(f'{name}{format_labels(labels)} {format_value(value)}')
+    output = []
+    for name in sorted(series):
+        kind, description = HELP.get(name, ('untyped', ''))
+        output.append(f'# HELP {name} {description}')
+        output.append(f'# TYPE {name} {kind}')
+        output.extend(series[name])
+    return '\n'.join(output) + '\n'
+
+
+def scrape_gauges(counters):
+    gauges = {
+        ('portal_outbox_backlog', ()): outbox_backlog(),
+        ('portal_outbox_dead_letters', ()): OutboxMessage.objects.filter(status=OutboxMessage.STATUS_DEAD).count(),
+    }
+    caches = {labels for name, labels in counters if name in ('portal_cache_hits_total', 'portal_cache_misses_total')}
+    for labels in caches:
+        hits = counters.get(('portal_cache_hits_total', labels), 0)
+        misses = counters.get(('portal_cache_misses_total', labels), 0)
+        gauges[('portal_cache_hit_ratio', labels)] = round(hits / (hits + misses), 4) if hits + misses else 0.0
+    return gauges
+
+
+def exposition(directory=None):
+    registry.flush(directory=directory, force=True)
+    counters, histograms = collect(directory)
+    return render(counters, histograms, scrape_gauges(counters))
+
+
+class QueryCounter:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        with self.lock:
+            self.count += 1
+        return execute(sql, params, many, context)
+
+
+class MetricsMiddleware:
+    """Records request counts, latency and query counts per URL name into ``registry``."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.config = get_config()
+        if not self.config['ENABLED']:
+            raise MiddlewareNotUsed
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        started = time.perf_counter()
+        with wrap_request_queries(counter):
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unresolved'
+        if view != 'portal:metrics':
+            registry.inc('portal_http_requests_total', {'view': view, 'method': request.method, 'status': response.status_code})
+            registry.observe('portal_http_request_duration_seconds', elapsed, self.config['LATENCY_BUCKETS'], {'view': view})
+            registry.observe('portal_db_queries_per_request', counter.count, self.config['QUERY_BUCKETS'], {'view': view})
+            try:
+                registry.flush()
+            except OSError:
+                pass
+        return response
@@ -0,0 +1,33 @@
+from django.db import migrations
+
+SEARCH_COLUMNS = ('model_number', 'name', 'manufacturer', 'short_description', 'description')
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    columns = ', '.join(SEARCH_COLUMNS)
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS portal_machine_search USING fts5({columns}, tokenize='unicode61 remove_diacritics 2')"
+    )
+    values = ', '.join("COALESCE(%s, '')" % column for column in SEARCH_COLUMNS)
+    schema_editor.execute(
+        f'INSERT INTO portal_machine_search (rowid, {columns}) SELECT id, {values} FROM portal_machine'
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('DROP TABLE IF EXISTS portal_machine_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
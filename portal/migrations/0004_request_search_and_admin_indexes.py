@@ -0,0 +1,43 @@
+# Generated by Django 4.2.10 on 2026-10-17 22:36
+
+from django.db import migrations, models
+
+SEARCH_COLUMNS = ('reference_code', 'company_name', 'contact_name', 'email', 'machine_type', 'description')
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    columns = ', '.join(SEARCH_COLUMNS)
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS portal_customrequest_search USING fts5({columns}, tokenize='unicode61 remove_diacritics 2')"
+    )
+    values = ', '.join("COALESCE(%s, '')" % column for column in SEARCH_COLUMNS)
+    schema_editor.execute(
+        f'INSERT INTO portal_customrequest_search (rowid, {columns}) SELECT id, {values} FROM portal_customrequest'
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('DROP TABLE IF EXISTS portal_customrequest_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0003_outboxmessage'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customrequest',
+            index=models.Index(fields=['created_at'], name='portal_request_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='requeststatuslog',
+            index=models.Index(fields=['created_at'], name='portal_statuslog_created_idx'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.10 on 2026-10-17 22:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0004_request_search_and_admin_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customrequest',
+            index=models.Index(fields=['status', '-created_at'], name='portal_request_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='machine',
+            index=models.Index(fields=['-is_featured', 'name', 'id'], name='portal_machine_catalogue_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='machine',
+            index=models.Index(fields=['category', '-is_featured', 'name', 'id'], name='portal_machine_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='machine',
+            index=models.Index(fields=['availability_status', '-is_featured', 'name', 'id'], name='portal_machine_avail_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='machine',
+            index=models.Index(condition=models.Q(('financing_available', True)), fields=['-is_featured', 'name', 'id'], name='portal_machine_financing_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='machine',
+            index=models.Index(condition=models.Q(('is_featured', True)), fields=['name'], name='portal_machine_featured_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='machine',
+            index=models.Index(condition=models.Q(('power_rating_kw__isnull', False)), fields=['power_rating_kw'], name='portal_machine_power_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='requeststatuslog',
+            index=models.Index(fields=['custom_request', '-created_at'], name='portal_statuslog_request_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='requeststatuslog',
+            index=models.Index(fields=['status', '-created_at'], name='portal_statuslog_status_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.10 on 2026-10-17 22:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0005_catalogue_and_pipeline_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MachineRecommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+                ('machine', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommendations', to='portal.machine')),
+                ('recommended', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommended_by', to='portal.machine')),
+            ],
+            options={
+                'ordering': ['machine', 'rank'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='machinerecommendation',
+            constraint=models.UniqueConstraint(fields=('machine', 'rank'), name='portal_recommendation_rank_unique'),
+        ),
+    ]
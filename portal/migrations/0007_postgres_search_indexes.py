@@ -0,0 +1,57 @@
+from django.db import migrations
+
+# (index name, model, (column, weight)) in PostgresSearchBackend.document() order. The indexed
+# expression must match the query's exactly for Postgres to use it.
+SEARCH_INDEXES = (
+    ('portal_machine_search_gin', 'machine', (
+        ('model_number', 'A'),
+        ('name', 'A'),
+        ('manufacturer', 'B'),
+        ('short_description', 'C'),
+        ('description', 'D'),
+    )),
+    ('portal_request_search_gin', 'customrequest', (
+        ('reference_code', 'A'),
+        ('company_name', 'A'),
+        ('contact_name', 'B'),
+        ('email', 'B'),
+        ('machine_type', 'C'),
+        ('description', 'D'),
+    )),
+)
+
+
+def search_index(name, columns):
+    from django.contrib.postgres.indexes import GinIndex
+    from django.contrib.postgres.search import SearchVector
+
+    vector = None
+    for column, weight in columns:
+        part = SearchVector(column, weight=weight, config='english')
+        vector = part if vector is None else vector + part
+    return GinIndex(vector, name=name)
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, model_name, columns in SEARCH_INDEXES:
+        schema_editor.add_index(apps.get_model('portal', model_name), search_index(name, columns))
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, model_name, columns in SEARCH_INDEXES:
+        schema_editor.remove_index(apps.get_model('portal', model_name), search_index(name, columns))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0006_machine_recommendations'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
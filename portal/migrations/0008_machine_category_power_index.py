@@ -0,0 +1,17 @@
+# Generated by Django 4.2.10 on 2026-10-17 23:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0007_postgres_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='machine',
+            index=models.Index(fields=['category', 'power_rating_kw'], name='portal_machine_cat_power_idx'),
+        ),
+    ]
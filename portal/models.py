@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.crypto import get_random_string
@@ -126,8 +126,8 @@ class Category(models.Model):
         super().save(*args, **kwargs)
 
 
-def generate_machine_code():
-    return f"TNX-{timezone.now().strftime('%Y%m%d')}-{get_random_string(4).upper()}"
+def generate_machine_code(length=4):
+    return f"TNX-{timezone.now().strftime('%Y%m%d')}-{get_random_string(length).upper()}"
 
 
 class Machine(models.Model):
@@ -165,6 +165,26 @@ class Machine(models.Model):
 
     class Meta:
         ordering = ['name']
+        indexes = [
+            # Catalogue ordering (and its keyset seeks), unfiltered and per filter.
+            models.Index(fields=['-is_featured', 'name', 'id'], name='portal_machine_catalogue_idx'),
+            models.Index(fields=['category', '-is_featured', 'name', 'id'], name='portal_machine_category_idx'),
+            models.Index(fields=['availability_status', '-is_featured', 'name', 'id'], name='portal_machine_avail_idx'),
+            models.Index(
+                fields=['-is_featured', 'name', 'id'],
+                name='portal_machine_financing_idx',
+                condition=models.Q(financing_available=True),
+            ),
+            # Landing page featured machines.
+            models.Index(fields=['name'], name='portal_machine_featured_idx', condition=models.Q(is_featured=True)),
+            models.Index(
+                fields=['power_rating_kw'],
+                name='portal_machine_power_idx',
+                condition=models.Q(power_rating_kw__isnull=False),
+            ),
+            # Recommendation refreshes seek each category by power rating.
+            models.Index(fields=['category', 'power_rating_kw'], name='portal_machine_cat_power_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -193,6 +213,24 @@ class Machine(models.Model):
         return f"{self.currency} {amount}"
 
 
+class MachineRecommendation(models.Model):
+    """Precomputed "related machines" for a machine, ranked from 1; see ``portal.recommendations``."""
+
+    machine = models.ForeignKey(Machine, related_name='recommendations', on_delete=models.CASCADE)
+    recommended = models.ForeignKey(Machine, related_name='recommended_by', on_delete=models.CASCADE)
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        ordering = ['machine', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['machine', 'rank'], name='portal_recommendation_rank_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.machine_id} -> {self.recommended_id} (#{self.rank})"
+
+
 class MachineImage(models.Model):
     machine = models.ForeignKey(Machine, related_name='images', on_delete=models.CASCADE)
     image = models.ImageField(upload_to='machines/gallery/')
@@ -279,8 +317,8 @@ class ServiceOffering(models.Model):
         return self.title
 
 
-def custom_request_reference():
-    return f"RQ{timezone.now().strftime('%y%m%d')}" + get_random_string(4).upper()
+def custom_request_reference(length=4):
+    return f"RQ{timezone.now().strftime('%y%m%d')}" + get_random_string(length).upper()
 
 
 class CustomRequest(models.Model):
@@ -319,19 +357,75 @@ class CustomRequest(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Default ordering and the admin date_hierarchy.
+            models.Index(fields=['created_at'], name='portal_request_created_idx'),
+            # Admin changelist filtered by status, newest first.
+            models.Index(fields=['status', '-created_at'], name='portal_request_status_idx'),
+        ]
 
     def __str__(self):
         return f"{self.reference_code} - {self.company_name}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored values so save() can spot a status transition, and signal
+        # handlers unchanged fields, without re-reading the row.
+        instance._loaded_values = instance._current_values()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using=using, fields=fields)
+        current = self._current_values()
+        if fields is not None:
+            refreshed = {self._meta.get_field(name).attname for name in fields}
+            current = {**getattr(self, '_loaded_values', {}), **{k: v for k, v in current.items() if k in refreshed}}
+        self._loaded_values = current
+
+    def _current_values(self):
+        return {field.attname: self.__dict__[field.attname] for field in self._meta.concrete_fields if field.attname in self.__dict__}
+
+    def changed_fields(self, names):
+        """Names in ``names`` whose value differs from (or was not) loaded from the database."""
+        loaded = getattr(self, '_loaded_values', {})
+        missing = object()
+        return {name for name in names if loaded.get(name, missing) != self.__dict__.get(name, missing)}
+
     def save(self, *args, **kwargs):
         is_new = self._state.adding
-        previous_status = None
-        if not is_new:
+        update_fields = kwargs.get('update_fields')
+        tracks_status = update_fields is None or 'status' in update_fields
+        previous_status = getattr(self, '_loaded_values', {}).get('status')
+        if not is_new and tracks_status and previous_status is None and 'status' in self.__dict__:
+            # Built by hand or loaded with status deferred; fall back to the stored value.
             previous_status = CustomRequest.objects.filter(pk=self.pk).values_list('status', flat=True).first()
         super().save(*args, **kwargs)
-        status_changed = previous_status and previous_status != self.status
+        status_changed = tracks_status and previous_status and previous_status != self.status
         if is_new or status_changed:
             RequestStatusLog.objects.create(custom_request=self, status=self.status, comment='Status updated automatically.')
+        current = self._current_values()
+        if update_fields is None:
+            self._loaded_values = current
+        else:
+            saved = {self._meta.get_field(name).attname for name in update_fields}
+            self._loaded_values = {**getattr(self, '_loaded_values', {}), **{k: v for k, v in current.items() if k in saved}}
+
+    @classmethod
+    def bulk_transition(cls, queryset, status, comment='Status updated in bulk.'):
+        """Move every request in ``queryset`` to ``status`` with one UPDATE and one log INSERT.
+
+        Requests already in ``status`` are left alone. Returns the number moved.
+        """
+        with transaction.atomic(using=queryset.db):
+            pks = list(queryset.exclude(status=status).order_by().select_for_update().values_list('pk', flat=True))
+            if not pks:
+                return 0
+            cls.objects.using(queryset.db).filter(pk__in=pks).update(status=status, updated_at=timezone.now())
+            RequestStatusLog.objects.using(queryset.db).bulk_create([
+                RequestStatusLog(custom_request_id=pk, status=status, comment=comment) for pk in pks
+            ])
+        return len(pks)
 
 
 class RequestStatusLog(models.Model):
@@ -342,6 +436,48 @@ class RequestStatusLog(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at'], name='portal_statuslog_created_idx'),
+            # A request's history, newest first (the admin inline).
+            models.Index(fields=['custom_request', '-created_at'], name='portal_statuslog_request_idx'),
+            models.Index(fields=['status', '-created_at'], name='portal_statuslog_status_idx'),
+        ]
 
     def __str__(self):
         return f"{self.custom_request.reference_code} -> {self.get_status_display()}"
+
+
+class OutboxMessage(models.Model):
+    STATUS_PENDING = 'pending'
+    STATUS_SENDING = 'sending'
+    STATUS_SENT = 'sent'
+    STATUS_DEAD = 'dead'
+
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_SENDING, 'Sending'),
+        (STATUS_SENT, 'Sent'),
+        (STATUS_DEAD, 'Dead letter'),
+    ]
+
+    custom_request = models.ForeignKey(CustomRequest, related_name='notifications', on_delete=models.SET_NULL, null=True, blank=True)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254)
+    recipients = models.JSONField(default=list)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claimed_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['next_attempt_at', 'id']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='portal_outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} ({self.get_status_display()})"
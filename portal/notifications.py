@@ -0,0 +1,147 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import CustomRequest, OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'BATCH_SIZE': 50,
+    'MAX_ATTEMPTS': 8,
+    'BACKOFF_SECONDS': 60,
+    'MAX_BACKOFF_SECONDS': 60 * 60 * 6,
+    # A message left in 'sending' this long is assumed orphaned by a crashed worker.
+    'CLAIM_TIMEOUT_SECONDS': 60 * 10,
+}
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'PORTAL_OUTBOX', {}))
+    return config
+
+
+def request_notification_body(custom_request: CustomRequest):
+    lines = [
+        f"Request Reference: {custom_request.reference_code}",
+        f"Company: {custom_request.company_name}",
+        f"Contact: {custom_request.contact_name} ({custom_request.email})",
+        f"Machine Type: {custom_request.machine_type}",
+        f"Budget: {custom_request.currency} {custom_request.budget_min or '—'} - {custom_request.budget_max or '—'}",
+        '',
+        f"Project Location: {custom_request.project_location or 'Provided on follow-up'}",
+        f"Timeline: {custom_request.deployment_timeline or 'Provided on follow-up'}",
+        '',
+        'Description:',
+        custom_request.description,
+    ]
+    return "\n".join(lines)
+
+
+def enqueue_request_notification(custom_request: CustomRequest):
+    """Queue the sales notification; call inside the transaction that saves the request."""
+    recipient = settings.CONTACT_EMAIL
+    if not recipient:
+        return None
+    return OutboxMessage.objects.create(
+        custom_request=custom_request,
+        subject=f"New custom machinery request: {custom_request.reference_code}",
+        body=request_notification_body(custom_request),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        recipients=[recipient],
+    )
+
+
+def backoff_delay(attempts, config=None):
+    config = config or get_config()
+    return min(config['BACKOFF_SECONDS'] * 2 ** max(attempts - 1, 0), config['MAX_BACKOFF_SECONDS'])
+
+
+def due_messages(now=None):
+    now = now or timezone.now()
+    stale = now - timedelta(seconds=get_config()['CLAIM_TIMEOUT_SECONDS'])
+    return OutboxMessage.objects.filter(
+        Q(status=OutboxMessage.STATUS_PENDING, next_attempt_at__lte=now)
+        | Q(status=OutboxMessage.STATUS_SENDING, claimed_at__lt=stale)
+    )
+
+
+def claim_batch(batch_size, now=None):
+    """Claim up to ``batch_size`` due messages; the conditional UPDATE keeps concurrent workers apart."""
+    now = now or timezone.now()
+    candidates = due_messages(now).order_by('next_attempt_at', 'id').values_list('pk', 'status', 'claimed_at')
+    claimed = []
+    for pk, status, claimed_at in candidates[:batch_size]:
+        updated = OutboxMessage.objects.filter(pk=pk, status=status, claimed_at=claimed_at).update(
+            status=OutboxMessage.STATUS_SENDING,
+            claimed_at=now,
+        )
+        if updated:
+            claimed.append(pk)
+    return list(OutboxMessage.objects.filter(pk__in=claimed).order_by('next_attempt_at', 'id'))
+
+
+def deliver_batch(batch_size=None, connection=None):
+    """Send one batch over a single SMTP connection. Returns ``(sent, retried, dead)`` counts."""
+    config = get_config()
+    messages = claim_batch(batch_size or config['BATCH_SIZE'])
+    if not messages:
+        return 0, 0, 0
+    sent = retried = dead = 0
+    connection = connection or get_connection()
+    try:
+        connection.open()
+    except Exception as exc:
+        # The relay is unreachable; every claimed message takes the failure.
+        logger.warning('Could not open mail connection: %s', exc)
+        for message in messages:
+            if _record_failure(message, exc, config):
+                dead += 1
+            else:
+                retried += 1
+        return sent, retried, dead
+    try:
+        for message in messages:
+            email = EmailMessage(message.subject, message.body, message.from_email, message.recipients, connection=connection)
+            try:
+                email.send(fail_silently=False)
+            except Exception as exc:
+                logger.warning('Outbox message %s failed: %s', message.pk, exc)
+                if _record_failure(message, exc, config):
+                    dead += 1
+                else:
+                    retried += 1
+                continue
+            message.status = OutboxMessage.STATUS_SENT
+            message.sent_at = timezone.now()
+            message.attempts += 1
+            message.last_error = ''
+            message.save(update_fields=['status', 'sent_at', 'attempts', 'last_error'])
+            sent += 1
+    finally:
+        connection.close()
+    return sent, retried, dead
+
+
+def _record_failure(message, exc, config):
+    message.attempts += 1
+    message.last_error = f'{exc.__class__.__name__}: {exc}'[:2000]
+    message.claimed_at = None
+    is_dead = message.attempts >= config['MAX_ATTEMPTS']
+    if is_dead:
+        message.status = OutboxMessage.STATUS_DEAD
+        logger.error('Outbox message %s moved to dead letter after %s attempts', message.pk, message.attempts)
+    else:
+        message.status = OutboxMessage.STATUS_PENDING
+        message.next_attempt_at = timezone.now() + timedelta(seconds=backoff_delay(message.attempts, config))
+    message.save(update_fields=['attempts', 'last_error', 'claimed_at', 'status', 'next_attempt_at'])
+    return is_dead
+
+
+def outbox_backlog():
+    return OutboxMessage.objects.filter(status__in=[OutboxMessage.STATUS_PENDING, OutboxMessage.STATUS_SENDING]).count()
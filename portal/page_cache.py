@@ -0,0 +1,168 @@
+import hashlib
+import re
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+
+from .caching import connect_invalidation, entry_timeout, get_stats
+from .conditional import conditional_response
+from .landing import landing_cache
+from .models import Category, Industry, Machine, MachineDocument, MachineImage, SiteSettings
+
+DEFAULTS = {
+    'ENABLED': True,
+    # Seconds a stored page is served as fresh.
+    'TIMEOUT': 60 * 5,
+    # Seconds past TIMEOUT (or past an invalidation) a page may still be served while one worker re-renders it.
+    'STALE_TIMEOUT': 60 * 60,
+    # How long a worker holds the right to re-render a page; a crashed render frees it after this.
+    'REFRESH_TIMEOUT': 30,
+}
+
+CSRF_PLACEHOLDER = '__portal_csrf_token__'
+CSRF_INPUT = re.compile(r'(name="csrfmiddlewaretoken" value=")[^"]*(")')
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'PORTAL_PAGE_CACHE', {}))
+    return config
+
+
+def normalize_query(querydict, allowed):
+    """``(name, values)`` pairs for the ``allowed`` parameters only, sorted by name."""
+    return tuple((name, tuple(querydict.getlist(name))) for name in sorted(allowed) if name in querydict)
+
+
+class PageCache:
+    """Rendered anonymous pages, served stale while a single worker re-renders them.
+
+    Entries are stored under stable keys for ``TIMEOUT + STALE_TIMEOUT`` and
+    carry the version stamp they were rendered under. A change to any of
+    ``models`` replaces the stamp, which turns every entry stale rather than
+    dropping it: the first request to see a stale entry claims the refresh
+    and renders, and everyone else keeps getting the old page meanwhile.
+    """
+
+    def __init__(self, name, models=()):
+        self.name = name
+        self.models = tuple(models)
+        self.stats = get_stats(name)
+
+    @property
+    def version_key(self):
+        return f'portal:{self.name}:version'
+
+    def key(self, parts):
+        digest = hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+        return f'portal:{self.name}:{digest}'
+
+    def lookup(self, parts):
+        """Return ``(entry, fresh, version)``; ``entry`` is None on a miss."""
+        key = self.key(parts)
+        found = cache.get_many([key, self.version_key])
+        version = found.get(self.version_key)
+        if version is None:
+            cache.add(self.version_key, uuid.uuid4().hex, None)
+            version = cache.get(self.version_key)
+        entry = found.get(key)
+        if entry is None:
+            self.stats.miss()
+            return None, False, version
+        self.stats.hit()
+        return entry, entry['version'] == version and entry['expires'] > time.time(), version
+
+    def claim_refresh(self, parts, timeout):
+        return cache.add(f'{self.key(parts)}:refresh', True, timeout)
+
+    def release_refresh(self, parts):
+        cache.delete(f'{self.key(parts)}:refresh')
+
+    def store(self, parts, entry, config):
+        entry['expires'] = time.time() + config['TIMEOUT']
+        cache.set(self.key(parts), entry, entry_timeout(config['TIMEOUT'] + config['STALE_TIMEOUT']))
+
+    def invalidate(self):
+        cache.set(self.version_key, uuid.uuid4().hex, None)
+
+    def connect(self):
+        connect_invalidation(f'portal_{self.name}_cache', self.models, lambda model: self.invalidate())
+
+
+def page_models():
+    landing_models = {model for _, models in landing_cache.sections.values() for model in models}
+    # Recommendation rows are rewritten in bulk; the recommendations module invalidates for them.
+    catalogue_models = {Machine, Category, Industry, MachineImage, MachineDocument, SiteSettings}
+    return sorted(landing_models | catalogue_models, key=lambda model: model._meta.label)
+
+
+page_cache = PageCache('pages', models=page_models())
+
+
+class CachedPageMixin:
+    """Serves anonymous GETs of the page from ``page_cache``.
+
+    The cache key is the view, its URL arguments and the query parameters
+    named by ``get_page_cache_params``; anything else in the querystring must
+    not change the page. CSRF tokens are stored as a placeholder and filled in
+    with the visitor's own token when served. Combine with
+    ``ConditionalPageMixin`` (listed after this one) to keep 304 answers.
+    """
+
+    page_cache_params = ()
+
+    def get_page_cache_params(self):
+        return self.page_cache_params
+
+    def page_cache_parts(self):
+        match = self.request.resolver_match
+        view_name = match.view_name if match else type(self).__name__
+        return (view_name, tuple(sorted(self.kwargs.items())), normalize_query(self.request.GET, self.get_page_cache_params()))
+
+    def is_page_cacheable(self, request):
+        return not request.user.is_authenticated and not len(messages.get_messages(request))
+
+    def get(self, request, *args, **kwargs):
+        config = get_config()
+        if not config['ENABLED'] or not self.is_page_cacheable(request):
+            return super().get(request, *args, **kwargs)
+        parts = self.page_cache_parts()
+        entry, fresh, version = page_cache.lookup(parts)
+        if entry is not None and (fresh or not page_cache.claim_refresh(parts, config['REFRESH_TIMEOUT'])):
+            return self.cached_response(request, entry)
+        try:
+            response = super().get(request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming:
+                page_cache.store(parts, self.page_entry(response, version), config)
+        finally:
+            if entry is not None:
+                page_cache.release_refresh(parts)
+        return response
+
+    def page_entry(self, response, version):
+        if hasattr(response, 'render'):
+            response.render()
+        content = response.content.decode(response.charset)
+        return {
+            'content': CSRF_INPUT.sub(rf'\g<1>{CSRF_PLACEHOLDER}\g<2>', content),
+            'content_type': response['Content-Type'],
+            'validators': getattr(self, 'page_validators', None),
+            'version': version,
+        }
+
+    def cached_response(self, request, entry):
+        def render():
+            content = entry['content']
+            if CSRF_PLACEHOLDER in content:
+                # Also issues the CSRF cookie to first-time visitors, as rendering the form would.
+                content = content.replace(CSRF_PLACEHOLDER, get_token(request))
+            return HttpResponse(content, content_type=entry['content_type'])
+
+        if entry['validators'] is None:
+            return render()
+        return conditional_response(request, *entry['validators'], render)
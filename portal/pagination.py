@@ -0,0 +1,207 @@
+import base64
+import binascii
+import json
+from functools import cached_property
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.http import Http404
+
+from .caching import VersionedCache
+from .models import Category, Industry, Machine
+
+count_cache = VersionedCache(
+    'catalogue_counts',
+    models=(Machine, Category, Industry),
+    timeout=getattr(settings, 'PORTAL_COUNT_CACHE_TIMEOUT', 60 * 15),
+)
+
+
+class CachedCountPaginator(Paginator):
+    """Offset paginator whose total comes from ``count_cache`` instead of a COUNT per request."""
+
+    def __init__(self, object_list, per_page, count_key=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_key = count_key
+
+    @cached_property
+    def count(self):
+        if self.count_key is None:
+            return super().count
+        return count_cache.get_or_build(self.count_key, lambda: Paginator.count.func(self))
+
+
+class EstimatedCountPaginator(Paginator):
+    """Admin paginator that never counts a large, unfiltered table exactly.
+
+    Unfiltered changelists take the row count from the database's own
+    statistics (``reltuples`` on PostgreSQL, the highest primary key on
+    SQLite); filtered ones and tables smaller than ``estimate_threshold`` are
+    counted exactly. An estimate that overshoots the real end is replaced by
+    the exact count as soon as a page past the last row is requested.
+    """
+
+    estimate_threshold = 10000
+    estimated = False
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not hasattr(queryset, 'query') or queryset.query.where:
+            return super().count
+        estimate = estimate_table_rows(queryset)
+        if estimate is not None and estimate >= self.estimate_threshold:
+            self.estimated = True
+            return estimate
+        return super().count
+
+    def page(self, number):
+        page = super().page(number)
+        if self.estimated and page.number > 1 and not len(page.object_list):
+            # Deleted rows inflated the estimate; settle on the exact count and the real last page.
+            self.estimated = False
+            self.__dict__['count'] = Paginator.count.func(self)
+            self.__dict__.pop('num_pages', None)
+            self.__dict__.pop('page_range', None)
+            return super().page(min(page.number, self.num_pages))
+        return page
+
+
+def estimate_table_rows(queryset):
+    model = queryset.model
+    connection = connections[queryset.db]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [model._meta.db_table])
+        elif connection.vendor == 'sqlite':
+            # An index seek; overestimates only by the rows deleted since.
+            pk = connection.ops.quote_name(model._meta.pk.column)
+            cursor.execute(f'SELECT MAX({pk}) FROM {connection.ops.quote_name(model._meta.db_table)}')
+        else:
+            return None
+        row = cursor.fetchone()
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+def encode_cursor(values, direction):
+    payload = json.dumps([direction] + list(values), separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, binascii.Error, UnicodeError):
+        raise Http404('Invalid cursor.')
+    if not isinstance(payload, list) or len(payload) < 2 or payload[0] not in ('next', 'prev'):
+        raise Http404('Invalid cursor.')
+    return payload[0], payload[1:]
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None, total=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.total = total
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """Cursor pagination over a fixed ordering, ending in a unique tiebreaker.
+
+    ``ordering`` is a sequence of ``(field, descending)`` pairs. A page is
+    fetched with ``WHERE (ordering) > (cursor values) LIMIT per_page + 1``
+    so deep pages cost the same as the first one and no COUNT is needed.
+    """
+
+    def __init__(self, queryset, per_page, ordering, total=None):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+        self.total = total
+
+    def order_by(self, reverse=False):
+        return [f"{'-' if descending != reverse else ''}{field}" for field, descending in self.ordering]
+
+    def seek_filter(self, values, reverse=False):
+        condition = Q()
+        for index in range(len(self.ordering) - 1, -1, -1):
+            field, descending = self.ordering[index]
+            lookup = 'lt' if descending != reverse else 'gt'
+            step = Q(**{f'{field}__{lookup}': values[index]})
+            if index < len(self.ordering) - 1:
+                step |= Q(**{field: values[index]}) & condition
+            condition = step
+        return condition
+
+    def cursor_values(self, obj):
+        if isinstance(obj, dict):
+            return [obj[field] for field, _ in self.ordering]
+        return [getattr(obj, field) for field, _ in self.ordering]
+
+    def model_field(self, name):
+        model = self.queryset.model
+        *relations, name = name.split('__')
+        for relation in relations:
+            model = model._meta.get_field(relation).related_model
+        return model._meta.get_field(name)
+
+    def coerce_values(self, values):
+        """Cursor values converted by their ordering fields; a crafted cursor is a 404, not a failed query."""
+        if len(values) != len(self.ordering):
+            raise Http404('Invalid cursor.')
+        coerced = []
+        for (name, _), value in zip(self.ordering, values):
+            if value is None or isinstance(value, (list, dict)):
+                raise Http404('Invalid cursor.')
+            try:
+                coerced.append(self.model_field(name).to_python(value))
+            except (ValidationError, TypeError, ValueError):
+                raise Http404('Invalid cursor.')
+        return coerced
+
+    def page(self, cursor=None):
+        direction, values = decode_cursor(cursor) if cursor else ('next', None)
+        if values is not None:
+            values = self.coerce_values(values)
+        reverse = direction == 'prev'
+        queryset = self.queryset
+        if values is not None:
+            queryset = queryset.filter(self.seek_filter(values, reverse=reverse))
+        rows = list(queryset.order_by(*self.order_by(reverse=reverse))[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+        if not rows:
+            return KeysetPage(rows, total=self.total)
+        # Walking forward, a cursor implies earlier rows exist; walking back, it implies later ones.
+        has_next = has_more if not reverse else True
+        has_previous = values is not None if not reverse else has_more
+        return KeysetPage(
+            rows,
+            next_cursor=encode_cursor(self.cursor_values(rows[-1]), 'next') if has_next else None,
+            previous_cursor=encode_cursor(self.cursor_values(rows[0]), 'prev') if has_previous else None,
+            total=self.total,
+        )
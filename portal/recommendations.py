@@ -0,0 +1,321 @@
+import heapq
+import math
+import threading
+import weakref
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from .bulk import chunked
+from .models import Machine, MachineRecommendation
+from .page_cache import page_cache
+
+DEFAULTS = {
+    'TOP_N': 4,
+    # Neighbours taken on each side of a machine, by power rating, in each pool it belongs to.
+    'WINDOW': 10,
+    'WEIGHTS': {'category': 1.0, 'industries': 2.0, 'power': 1.0, 'price': 0.5},
+}
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'PORTAL_RECOMMENDATIONS', {}))
+    return config
+
+
+def price_band(price):
+    # Half-decade bands: 10k-31k, 31k-100k, 100k-316k, ...
+    if price is None or price <= 0:
+        return None
+    return math.floor(math.log10(float(price)) * 2)
+
+
+class Features:
+    """What scoring needs about one machine, loaded without model instances."""
+
+    __slots__ = ('pk', 'category', 'industries', 'rating', 'power', 'price_band')
+
+    def __init__(self, pk, category, power, price):
+        self.pk = pk
+        self.category = category
+        self.industries = set()
+        self.rating = power
+        self.power = math.log1p(float(power)) if power is not None else None
+        self.price_band = price_band(price)
+
+    def pools(self):
+        return [('all', None), ('category', self.category)] + [('industry', industry) for industry in self.industries]
+
+
+FEATURE_FIELDS = ('pk', 'category_id', 'power_rating_kw', 'price_from')
+
+
+def load_features(using='default'):
+    features = {
+        pk: Features(pk, category, power, price)
+        for pk, category, power, price in Machine.objects.using(using).order_by()
+        .values_list(*FEATURE_FIELDS).iterator(chunk_size=5000)
+    }
+    through = Machine.industries.through.objects.using(using).values_list('machine_id', 'industry_id')
+    for machine_id, industry_id in through.iterator(chunk_size=5000):
+        features[machine_id].industries.add(industry_id)
+    return features
+
+
+def score(a, b, weights):
+    total = 0.0
+    if a.category == b.category:
+        total += weights['category']
+    if a.industries and b.industries:
+        shared = len(a.industries & b.industries)
+        if shared:
+            total += weights['industries'] * shared / len(a.industries | b.industries)
+    if a.power is not None and b.power is not None:
+        total += weights['power'] / (1.0 + abs(a.power - b.power))
+    if a.price_band is not None and b.price_band is not None:
+        gap = abs(a.price_band - b.price_band)
+        if gap < 2:
+            total += weights['price'] * (1.0 - gap / 2)
+    return total
+
+
+class Recommender:
+    """Scores machines against nearby candidates instead of the whole catalogue.
+
+    The whole catalogue, every category and every industry are pools of
+    machines sorted by power rating. A machine's candidates are its ``WINDOW`` neighbours on each side
+    in each of its pools, so the work per machine stays constant as the
+    catalogue grows. Ties break on pk to keep results stable between runs.
+    """
+
+    def __init__(self, features, config=None):
+        self.config = config or get_config()
+        self.features = features
+        pools = defaultdict(list)
+        for item in features.values():
+            for pool in item.pools():
+                pools[pool].append(item)
+        self.pools = {}
+        self.positions = {}
+        for pool, members in pools.items():
+            members.sort(key=self.sort_key)
+            self.pools[pool] = members
+            self.positions[pool] = [self.sort_key(item) for item in members]
+
+    @staticmethod
+    def sort_key(item):
+        return (item.power is None, item.power or 0.0, item.pk)
+
+    def neighbours(self, item):
+        window = self.config['WINDOW']
+        found = {}
+        for pool in item.pools():
+            members = self.pools[pool]
+            index = bisect_left(self.positions[pool], self.sort_key(item))
+            for other in members[max(index - window, 0):index + window + 1]:
+                if other.pk != item.pk:
+                    found[other.pk] = other
+        return found.values()
+
+    def recommend(self, pk):
+        item = self.features[pk]
+        weights = self.config['WEIGHTS']
+        scored = ((score(item, other, weights), -other.pk) for other in self.neighbours(item))
+        return [(-negative_pk, value) for value, negative_pk in heapq.nlargest(self.config['TOP_N'], scored)]
+
+    def rows(self, pks):
+        for pk in pks:
+            for rank, (recommended, value) in enumerate(self.recommend(pk), start=1):
+                yield MachineRecommendation(machine_id=pk, recommended_id=recommended, rank=rank, score=round(value, 4))
+
+
+def _replace(recommender, pks, using, chunk_size):
+    manager = MachineRecommendation.objects.using(using)
+    for chunk in chunked(pks, chunk_size):
+        manager.filter(machine_id__in=chunk).delete()
+        manager.bulk_create(recommender.rows(chunk), batch_size=chunk_size)
+
+
+def rebuild_recommendations(using='default', chunk_size=2000):
+    """Recompute every machine's recommendations; returns the number of machines."""
+    recommender = Recommender(load_features(using))
+    pks = sorted(recommender.features)
+    with transaction.atomic(using=using):
+        MachineRecommendation.objects.using(using).all().delete()
+        for chunk in chunked(pks, chunk_size):
+            MachineRecommendation.objects.using(using).bulk_create(recommender.rows(chunk), batch_size=chunk_size)
+    page_cache.invalidate()
+    return len(pks)
+
+
+class PoolWindows:
+    """Loads the features of machines near given anchors instead of the whole catalogue.
+
+    Each pool is read with seeks on power rating, ``WINDOW`` members either
+    side of an anchor. Anchors are visited in pool order, so neighbouring
+    anchors share one contiguous stretch and a refresh reads a few hundred
+    rows however large the catalogue is.
+    """
+
+    def __init__(self, using='default', config=None):
+        self.using = using
+        self.window = (config or get_config())['WINDOW']
+        self.features = {}
+        self.incomplete = set()
+
+    @staticmethod
+    def key(item):
+        # Recommender.sort_key on the stored rating, which the database can compare.
+        return (item.rating is None, item.rating or 0, item.pk)
+
+    def pool_queryset(self, pool):
+        kind, value = pool
+        machines = Machine.objects.using(self.using).order_by()
+        if kind == 'category':
+            return machines.filter(category_id=value)
+        if kind == 'industry':
+            # Walking the power index and probing membership beats sorting the industry's machines.
+            through = Machine.industries.through.objects.using(self.using)
+            return machines.filter(Exists(through.filter(machine_id=OuterRef('pk'), industry_id=value)))
+        return machines
+
+    def add(self, rows):
+        found = []
+        for row in rows:
+            item = self.features.get(row[0])
+            if item is None:
+                item = self.features[row[0]] = Features(*row)
+                self.incomplete.add(item.pk)
+            found.append(item)
+        return found
+
+    def load(self, pks):
+        """Load the given machines; pks that no longer exist are skipped."""
+        for chunk in chunked(set(pks) - self.features.keys(), 500):
+            self.add(Machine.objects.using(self.using).filter(pk__in=chunk).values_list(*FEATURE_FIELDS))
+        self.load_industries()
+
+    def load_industries(self):
+        through = Machine.industries.through.objects.using(self.using)
+        for chunk in chunked(sorted(self.incomplete), 500):
+            for machine_id, industry_id in through.filter(machine_id__in=chunk).values_list('machine_id', 'industry_id'):
+                self.features[machine_id].industries.add(industry_id)
+        self.incomplete.clear()
+
+    def seek(self, pool, key, forward, limit):
+        """Up to ``limit`` members of ``pool`` after (or before) ``key``, nearest first.
+
+        Rated machines come before unrated ones, so the seek continues into the
+        other group when its own runs out.
+        """
+        unrated, rating, pk = key
+        groups = (False, True) if forward else (True, False)
+        order = ('power_rating_kw', 'pk') if forward else ('-power_rating_kw', '-pk')
+        found = []
+        for group in groups[groups.index(unrated):]:
+            members = self.pool_queryset(pool).filter(power_rating_kw__isnull=group)
+            if group == unrated and unrated:
+                members = members.filter(pk__gt=pk) if forward else members.filter(pk__lt=pk)
+            elif group == unrated:
+                # A range on the rating alone lets the seek use an index; ties are excluded after.
+                lookup, tied = ('gte', 'lte') if forward else ('lte', 'gte')
+                members = members.filter(**{f'power_rating_kw__{lookup}': rating}).exclude(
+                    **{'power_rating_kw': rating, f'pk__{tied}': pk}
+                )
+            found += self.add(members.order_by(*order).values_list(*FEATURE_FIELDS)[:limit - len(found)])
+            if len(found) == limit:
+                break
+        return found
+
+    def load_windows(self, anchors):
+        """Load every pool member within ``WINDOW`` of each anchor."""
+        by_pool = defaultdict(list)
+        for item in anchors:
+            for pool in item.pools():
+                by_pool[pool].append(item)
+        for pool, items in by_pool.items():
+            # Keys of a contiguous stretch of the pool, and whether it reaches the pool's end.
+            stretch, at_end = [], False
+            for item in sorted(items, key=self.key):
+                key = self.key(item)
+                if not stretch or key > stretch[-1]:
+                    before = self.seek(pool, key, forward=False, limit=self.window)
+                    stretch, at_end = [self.key(other) for other in reversed(before)] + [key], False
+                missing = self.window - (len(stretch) - bisect_left(stretch, key) - 1)
+                if missing > 0 and not at_end:
+                    limit = max(missing, self.window)
+                    after = self.seek(pool, stretch[-1], forward=True, limit=limit)
+                    stretch += [self.key(other) for other in after]
+                    at_end = len(after) < limit
+        self.load_industries()
+
+
+def refresh_recommendations(pks, using='default', chunk_size=2000):
+    """Recompute the machines whose recommendations may change when ``pks`` change.
+
+    That is the machines themselves, whoever currently recommends them, and
+    their new neighbours, which may now rank them. Pks that no longer exist
+    are skipped. Only the pools around those machines are loaded; the
+    windows of a machine are all it needs to score the same as a rebuild.
+    """
+    config = get_config()
+    pks = set(pks)
+    affected = set(
+        MachineRecommendation.objects.using(using).filter(recommended_id__in=pks).values_list('machine_id', flat=True)
+    )
+    windows = PoolWindows(using, config)
+    windows.load(pks | affected)
+    changed = [windows.features[pk] for pk in pks if pk in windows.features]
+    windows.load_windows(changed)
+    recommender = Recommender(windows.features, config)
+    for item in changed:
+        affected.add(item.pk)
+        affected.update(other.pk for other in recommender.neighbours(item))
+    affected &= windows.features.keys()
+    windows.load_windows(windows.features[pk] for pk in affected)
+    recommender = Recommender(windows.features, config)
+    with transaction.atomic(using=using):
+        _replace(recommender, sorted(affected), using, chunk_size)
+    page_cache.invalidate()
+    return len(affected)
+
+
+class PendingRefresh:
+    def __init__(self, using):
+        self.using = using
+        self.pks = set()
+
+    def __call__(self):
+        if _pending.refreshes.get(self.using) is self:
+            del _pending.refreshes[self.using]
+        refresh_recommendations(self.pks, using=self.using)
+
+
+class _PendingRefreshes(threading.local):
+    def __init__(self):
+        # Django drops the callbacks of a rolled-back block, and with them the only strong reference.
+        self.refreshes = weakref.WeakValueDictionary()
+
+
+_pending = _PendingRefreshes()
+
+
+def schedule_refresh(pks, using='default'):
+    """Refresh ``pks`` once the current transaction commits, folding repeated calls into one refresh.
+
+    A refresh still queued was registered in this transaction, in a block that
+    is either still open around this call or already released into it, so a
+    rollback that drops it drops this call's changes too.
+    """
+    pending = _pending.refreshes.get(using)
+    if pending is not None:
+        pending.pks.update(pks)
+        return
+    pending = _pending.refreshes[using] = PendingRefresh(using)
+    pending.pks.update(pks)
+    # Outside a transaction this runs, and unregisters, straight away.
+    transaction.on_commit(pending, using=using)
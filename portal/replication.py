@@ -0,0 +1,155 @@
+import sqlite3
+from contextlib import closing, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .caching import cache_is_shared
+
+DEFAULTS = {
+    # Database alias serving catalogue reads; None keeps every query on the primary.
+    'ALIAS': None,
+    # After a write, the visitor's requests stay on the primary this long (seconds).
+    'STICKY_SECONDS': 10,
+    'COOKIE_NAME': 'portal_primary',
+    'PRIMARY_PATHS': ('/admin/',),
+    # Catalogue models read from the replica; requests, status logs and the outbox never are.
+    'MODELS': (
+        'portal.SiteSettings',
+        'portal.HeroMetric',
+        'portal.ValueProposition',
+        'portal.Industry',
+        'portal.Category',
+        'portal.Machine',
+        'portal.MachineRecommendation',
+        'portal.MachineImage',
+        'portal.MachineDocument',
+        'portal.Partner',
+        'portal.Testimonial',
+        'portal.FAQ',
+        'portal.ServiceOffering',
+    ),
+}
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+# Only requests admitted by PrimaryPinningMiddleware read from the replica; management
+# commands, background jobs and everything else stay on the primary.
+_replica_reads = ContextVar('portal_replica_reads', default=False)
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'PORTAL_DB_REPLICA', {}))
+    return config
+
+
+def replica_alias():
+    alias = get_config()['ALIAS']
+    if not alias or alias not in connections.settings:
+        return None
+    # A replica pointing at the primary's own database, such as a test mirror, is the primary.
+    if connections.settings[alias]['NAME'] == connections.settings[DEFAULT_DB_ALIAS]['NAME']:
+        return None
+    return alias
+
+
+@contextmanager
+def _reads_from_replica(allowed):
+    token = _replica_reads.set(allowed)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def read_from_replica():
+    """Allow catalogue reads inside the block to use the replica."""
+    return _reads_from_replica(True)
+
+
+def pin_to_primary():
+    """Route reads inside the block to the primary."""
+    return _reads_from_replica(False)
+
+
+def is_pinned():
+    return not _replica_reads.get()
+
+
+class PrimaryReplicaRouter:
+    """Send portal reads to the replica and every write to the primary.
+
+    Only the catalogue models in ``MODELS`` are routed, and only inside
+    requests that ``PrimaryPinningMiddleware`` lets read from the replica;
+    every other read uses the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        alias = replica_alias()
+        if alias is None or model._meta.label not in get_config()['MODELS']:
+            return None
+        return DEFAULT_DB_ALIAS if is_pinned() else alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema along with its data from the primary.
+        if db == get_config()['ALIAS']:
+            return False
+        return None
+
+
+class PrimaryPinningMiddleware:
+    """Pin unsafe requests, admin pages and recent writers to the primary.
+
+    A request that writes sets a short-lived cookie so the visitor's next
+    pages, such as the thank-you redirect, read their own writes before
+    the replica has caught up.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.config = get_config()
+        if replica_alias() is None:
+            raise MiddlewareNotUsed
+        if not cache_is_shared():
+            # sync_replica refreshes the catalogue caches; a per-process cache would keep stale pages.
+            raise ImproperlyConfigured('A read replica needs a cache shared by every process; set DJANGO_CACHE_BACKEND.')
+
+    def should_pin(self, request):
+        return (
+            request.method not in SAFE_METHODS
+            or request.path.startswith(tuple(self.config['PRIMARY_PATHS']))
+            or self.config['COOKIE_NAME'] in request.COOKIES
+        )
+
+    def __call__(self, request):
+        if not self.should_pin(request):
+            with read_from_replica():
+                return self.get_response(request)
+        response = self.get_response(request)
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            response.set_cookie(
+                self.config['COOKIE_NAME'],
+                '1',
+                max_age=self.config['STICKY_SECONDS'],
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+
+def copy_database(source, target):
+    """Copy the SQLite database open on ``source`` into the file at ``target`` with the online backup API.
+
+    Readers of ``target`` keep their snapshot until the copy commits.
+    """
+    with closing(sqlite3.connect(target, timeout=30)) as destination:
+        source.backup(destination)
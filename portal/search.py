@@ -0,0 +1,238 @@
+import re
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+from .models import CustomRequest, Machine
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# Relative importance of each indexed column when ranking matches.
+FIELD_WEIGHTS = (
+    ('model_number', 10.0),
+    ('name', 8.0),
+    ('manufacturer', 4.0),
+    ('short_description', 3.0),
+    ('description', 1.0),
+)
+
+
+class SearchIndex:
+    """What one full-text index covers: a model, its weighted columns and the SQLite FTS table."""
+
+    def __init__(self, name, model, table, fields, weight_letters):
+        self.name = name
+        self.model = model
+        self.table = table
+        self.fields = fields
+        # Postgres tsvector weight class (A-D) per column.
+        self.weight_letters = weight_letters
+
+    @property
+    def field_names(self):
+        return [field for field, _ in self.fields]
+
+
+MACHINE_INDEX = SearchIndex(
+    'machines',
+    Machine,
+    'portal_machine_search',
+    FIELD_WEIGHTS,
+    {'model_number': 'A', 'name': 'A', 'manufacturer': 'B', 'short_description': 'C', 'description': 'D'},
+)
+
+# Admin search over custom requests; kept in sync by signals like the machine index.
+REQUEST_INDEX = SearchIndex(
+    'requests',
+    CustomRequest,
+    'portal_customrequest_search',
+    (
+        ('reference_code', 10.0),
+        ('company_name', 6.0),
+        ('contact_name', 5.0),
+        ('email', 5.0),
+        ('machine_type', 3.0),
+        ('description', 1.0),
+    ),
+    {'reference_code': 'A', 'company_name': 'A', 'contact_name': 'B', 'email': 'B', 'machine_type': 'C', 'description': 'D'},
+)
+
+
+def search_tokens(query):
+    return TOKEN_RE.findall(query or '')
+
+
+class SearchBackend:
+    """Keeps a search index in sync and applies ranked search to querysets.
+
+    ``search`` returns the queryset filtered to matches with a ``search_rank``
+    alias (higher is better) that callers can order by. It is an alias rather
+    than an annotation so the queryset still aggregates cleanly.
+    """
+
+    def __init__(self, using='default', spec=MACHINE_INDEX):
+        self.using = using
+        self.spec = spec
+
+    @property
+    def connection(self):
+        return connections[self.using]
+
+    def search(self, queryset, query):
+        raise NotImplementedError
+
+    def index(self, objects, replace=True):
+        """Add ``objects`` to the index; ``replace=False`` skips clearing old entries for new rows."""
+
+    def remove(self, pks):
+        pass
+
+    def rebuild(self):
+        self.clear()
+        queryset = self.spec.model._default_manager.using(self.using).only(*self.spec.field_names).order_by('pk')
+        batch = []
+        count = 0
+        for obj in queryset.iterator(chunk_size=2000):
+            batch.append(obj)
+            if len(batch) >= 2000:
+                self.index(batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            self.index(batch)
+            count += len(batch)
+        return count
+
+    def clear(self):
+        pass
+
+
+class LikeSearchBackend(SearchBackend):
+    """Unindexed fallback: ORs ``icontains`` over the searchable columns."""
+
+    def search(self, queryset, query):
+        condition = Q()
+        for field in self.spec.field_names:
+            condition |= Q(**{f'{field}__icontains': query})
+        return queryset.filter(condition).alias(search_rank=Value(0.0, output_field=FloatField()))
+
+
+class SQLiteFTSBackend(SearchBackend):
+    """SQLite FTS5 index stored in ``spec.table`` (rowid = object pk), e.g. ``portal_machine_search``."""
+
+    @property
+    def table(self):
+        return self.spec.table
+
+    def match_expression(self, query):
+        tokens = search_tokens(query)
+        return ' '.join('"{}"*'.format(token.replace('"', '""')) for token in tokens)
+
+    def search(self, queryset, query):
+        expression = self.match_expression(query)
+        if not expression:
+            return LikeSearchBackend(self.using, self.spec).search(queryset, query)
+        qn = self.connection.ops.quote_name
+        weights = ', '.join(str(weight) for _, weight in self.spec.fields)
+        table = qn(self.table)
+        pk = f'{qn(self.spec.model._meta.db_table)}.{qn(self.spec.model._meta.pk.column)}'
+        # The index is joined once: MATCH filters and bm25() ranks in the same pass.
+        return (
+            queryset.extra(tables=[self.table], where=[f'{table} MATCH %s', f'{table}.rowid = {pk}'], params=[expression])
+            .alias(search_rank=RawSQL(f'-bm25({table}, {weights})', ()))
+        )
+
+    def index(self, objects, replace=True):
+        fields = self.spec.field_names
+        rows = []
+        pks = []
+        for obj in objects:
+            pks.append(obj.pk)
+            rows.append([obj.pk] + [getattr(obj, field) or '' for field in fields])
+        if not rows:
+            return
+        columns = ', '.join(fields)
+        placeholders = ', '.join(['%s'] * (len(fields) + 1))
+        with self.connection.cursor() as cursor:
+            if replace:
+                self._delete(cursor, pks)
+            cursor.executemany(
+                f'INSERT INTO {self.table} (rowid, {columns}) VALUES ({placeholders})',
+                rows,
+            )
+
+    def remove(self, pks):
+        pks = list(pks)
+        if pks:
+            with self.connection.cursor() as cursor:
+                self._delete(cursor, pks)
+
+    def clear(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+
+    def _delete(self, cursor, pks):
+        for start in range(0, len(pks), 500):
+            chunk = pks[start:start + 500]
+            placeholders = ', '.join(['%s'] * len(chunk))
+            cursor.execute(f'DELETE FROM {self.table} WHERE rowid IN ({placeholders})', chunk)
+
+
+class PostgresSearchBackend(SearchBackend):
+    """Weighted ``tsvector`` ranking, served by the GIN expression indexes from migration 0007."""
+
+    def document(self):
+        """The weighted document; migration 0007 indexes this exact expression."""
+        from django.contrib.postgres.search import SearchVector
+
+        vector = None
+        for field in self.spec.field_names:
+            part = SearchVector(field, weight=self.spec.weight_letters[field], config='english')
+            vector = part if vector is None else vector + part
+        return vector
+
+    def search(self, queryset, query):
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+
+        vector = self.document()
+        search_query = SearchQuery(query, search_type='websearch', config='english')
+        return (
+            queryset.alias(search_document=vector)
+            .filter(search_document=search_query)
+            .alias(search_rank=SearchRank(vector, search_query))
+        )
+
+
+def _sqlite_fts_ready(connection, table):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+            [table],
+        )
+        return cursor.fetchone() is not None
+
+
+_backends = {}
+
+
+def get_search_backend(using='default', spec=MACHINE_INDEX):
+    key = (using, spec.name)
+    backend = _backends.get(key)
+    if backend is not None:
+        return backend
+    backend_path = getattr(settings, 'PORTAL_SEARCH_BACKEND', None)
+    connection = connections[using]
+    if backend_path:
+        backend = import_string(backend_path)(using, spec)
+    elif connection.vendor == 'sqlite' and _sqlite_fts_ready(connection, spec.table):
+        backend = SQLiteFTSBackend(using, spec)
+    elif connection.vendor == 'postgresql':
+        backend = PostgresSearchBackend(using, spec)
+    else:
+        # Do not cache the fallback: the FTS table may appear after migrate.
+        return LikeSearchBackend(using, spec)
+    _backends[key] = backend
+    return backend
@@ -0,0 +1,124 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .conditional import validator_cache
+from .facets import facet_cache
+from .form_markup import form_cache
+from .forms import choice_cache
+from .landing import landing_cache
+from .metrics import registry
+from .models import CustomRequest, Machine, MachineDocument, MachineImage, SiteSettings
+from .page_cache import page_cache
+from .pagination import count_cache
+from .recommendations import schedule_refresh
+from .search import REQUEST_INDEX, get_search_backend
+from .site_settings import site_settings
+
+
+@receiver(post_save, sender=Machine, dispatch_uid='portal_machine_search_index')
+def index_machine(sender, instance, created=False, raw=False, using='default', **kwargs):
+    if raw:
+        return
+    get_search_backend(using).index([instance], replace=not created)
+
+
+@receiver(post_delete, sender=Machine, dispatch_uid='portal_machine_search_remove')
+def unindex_machine(sender, instance, using='default', **kwargs):
+    get_search_backend(using).remove([instance.pk])
+
+
+@receiver(post_save, sender=Machine, dispatch_uid='portal_machine_recommendations')
+def refresh_machine_recommendations(sender, instance, raw=False, using='default', **kwargs):
+    if not raw:
+        schedule_refresh([instance.pk], using)
+
+
+def changed_machine_pks(instance, action, reverse, pk_set):
+    """Machines affected by an industries change, or None for the pre_* actions."""
+    if action == 'pre_clear' and reverse:
+        # Clearing from the industry side does not say which machines lost it.
+        instance._cleared_machine_ids = list(instance.machines.values_list('pk', flat=True))
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return None
+    if not reverse:
+        return [instance.pk]
+    if action == 'post_clear':
+        return getattr(instance, '_cleared_machine_ids', [])
+    return list(pk_set)
+
+
+@receiver(m2m_changed, sender=Machine.industries.through, dispatch_uid='portal_machine_industries_changed')
+def machine_industries_changed(sender, instance, action, reverse, pk_set, using='default', **kwargs):
+    pks = changed_machine_pks(instance, action, reverse, pk_set)
+    if not pks:
+        return
+    # Industries are part of a machine's page and API payload, so they count as a modification.
+    Machine.objects.using(using).filter(pk__in=pks).update(updated_at=timezone.now())
+    schedule_refresh(pks, using)
+
+
+@receiver(post_save, sender=MachineImage, dispatch_uid='portal_machine_image_touch')
+@receiver(post_delete, sender=MachineImage, dispatch_uid='portal_machine_image_touch_delete')
+@receiver(post_save, sender=MachineDocument, dispatch_uid='portal_machine_document_touch')
+@receiver(post_delete, sender=MachineDocument, dispatch_uid='portal_machine_document_touch_delete')
+def touch_machine(sender, instance, raw=False, using='default', **kwargs):
+    # The gallery and documents have no timestamps of their own; the machine page's Last-Modified covers them.
+    if not raw:
+        Machine.objects.using(using).filter(pk=instance.machine_id).update(updated_at=timezone.now())
+
+
+@receiver(pre_delete, sender=Machine, dispatch_uid='portal_machine_recommenders')
+def remember_recommenders(sender, instance, using='default', **kwargs):
+    # The cascade removes their rows pointing at this machine before post_delete.
+    instance._recommended_by = list(instance.recommended_by.values_list('machine_id', flat=True))
+
+
+@receiver(post_delete, sender=Machine, dispatch_uid='portal_machine_recommendations_remove')
+def refresh_recommenders(sender, instance, using='default', **kwargs):
+    schedule_refresh(getattr(instance, '_recommended_by', []), using)
+
+
+@receiver(post_save, sender=SiteSettings, dispatch_uid='portal_site_settings_save')
+@receiver(post_delete, sender=SiteSettings, dispatch_uid='portal_site_settings_delete')
+def invalidate_site_settings(sender, **kwargs):
+    site_settings.invalidate()
+
+
+@receiver(post_save, sender=CustomRequest, dispatch_uid='portal_custom_request_search_index')
+def index_custom_request(sender, instance, created=False, raw=False, using='default', **kwargs):
+    # Status and note edits leave the indexed text alone.
+    if raw or not (created or instance.changed_fields(REQUEST_INDEX.field_names)):
+        return
+    get_search_backend(using, REQUEST_INDEX).index([instance], replace=not created)
+
+
+@receiver(post_delete, sender=CustomRequest, dispatch_uid='portal_custom_request_search_remove')
+def unindex_custom_request(sender, instance, using='default', **kwargs):
+    get_search_backend(using, REQUEST_INDEX).remove([instance.pk])
+
+
+@receiver(post_save, sender=CustomRequest, dispatch_uid='portal_custom_request_metrics')
+def count_custom_request(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        registry.inc('portal_custom_requests_total')
+
+
+landing_cache.connect()
+facet_cache.connect()
+count_cache.connect()
+validator_cache.connect()
+page_cache.connect()
+form_cache.connect()
+choice_cache.connect()
+
+
+def invalidate_catalogue_caches():
+    """Drop catalogue-derived caches after bulk writes that bypass model signals."""
+    landing_cache.invalidate()
+    facet_cache.invalidate()
+    count_cache.invalidate()
+    validator_cache.invalidate()
+    page_cache.invalidate()
+    form_cache.invalidate()
+    choice_cache.invalidate()
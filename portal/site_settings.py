@@ -0,0 +1,92 @@
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .caching import get_stats
+from .models import SiteSettings
+
+
+def default_version_source():
+    backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+    # A process-local cache cannot carry a stamp between workers; probe updated_at instead.
+    if backend.endswith(('locmem.LocMemCache', 'dummy.DummyCache')):
+        return 'database'
+    return 'cache'
+
+
+class SiteSettingsProvider:
+    """Serves the SiteSettings singleton from process memory.
+
+    At most once every ``check_interval`` seconds the cached copy is checked
+    against a shared version stamp: a cache key bumped on save (``cache``
+    source) or the row's ``updated_at`` (``database`` source). Admin edits
+    therefore reach every worker within ``check_interval`` seconds.
+    """
+
+    version_key = 'portal:site-settings:version'
+
+    def __init__(self, check_interval=None, source=None):
+        self.check_interval = check_interval
+        self.source = source
+        self.stats = get_stats('site_settings')
+        # Re-entrant: creating the row on first load fires post_save, which calls invalidate().
+        self._lock = threading.RLock()
+        self._instance = None
+        self._version = None
+        self._checked_at = 0.0
+
+    def get_check_interval(self):
+        if self.check_interval is not None:
+            return self.check_interval
+        return getattr(settings, 'PORTAL_SETTINGS_CHECK_INTERVAL', 5)
+
+    def get_source(self):
+        return self.source or getattr(settings, 'PORTAL_SETTINGS_VERSION_SOURCE', None) or default_version_source()
+
+    def get(self):
+        instance = self._instance
+        if instance is not None and time.monotonic() - self._checked_at < self.get_check_interval():
+            self.stats.hit()
+            return instance
+        with self._lock:
+            version = self.current_version()
+            if self._instance is not None and version is not None and version == self._version:
+                self.stats.hit()
+            else:
+                self.stats.miss()
+                self._instance = SiteSettings.load()
+                self._version = version if version is not None else self.version_of(self._instance)
+            self._checked_at = time.monotonic()
+            return self._instance
+
+    def current_version(self):
+        if self.get_source() == 'cache':
+            return cache.get(self.version_key)
+        return SiteSettings.objects.filter(pk=1).values_list('updated_at', flat=True).first()
+
+    def version_of(self, instance):
+        if self.get_source() == 'cache':
+            version = uuid.uuid4().hex
+            # add() keeps a stamp another worker may have published first.
+            if not cache.add(self.version_key, version, None):
+                version = cache.get(self.version_key, version)
+            return version
+        return instance.updated_at
+
+    def invalidate(self):
+        with self._lock:
+            self._instance = None
+            self._version = None
+            self._checked_at = 0.0
+        if self.get_source() == 'cache':
+            cache.set(self.version_key, uuid.uuid4().hex, None)
+
+
+site_settings = SiteSettingsProvider()
+
+
+def get_site_settings():
+    return site_settings.get()
@@ -0,0 +1,207 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+from django.db.backends.signals import connection_created
+from django.utils import timezone
+
+logger = logging.getLogger('portal.slow_queries')
+
+DEFAULTS = {
+    'ENABLED': False,
+    'THRESHOLD_MS': 100,
+    'EXPLAIN': True,
+    # JSON Lines file read by `manage.py slow_query_report`; None only logs.
+    'LOG_FILE': None,
+}
+
+_local = threading.local()
+_write_lock = threading.Lock()
+
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+IN_LIST_RE = re.compile(r'\bIN\s*\((?:\s*(?:%s|\?|:\w+)\s*,?)+\)', re.IGNORECASE)
+SPACE_RE = re.compile(r'\s+')
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'PORTAL_SLOW_QUERIES', {}))
+    return config
+
+
+def normalize_sql(sql):
+    """Replace literals and variable-length IN lists so equivalent queries share a fingerprint."""
+    sql = STRING_RE.sub('?', sql)
+    sql = IN_LIST_RE.sub('IN (...)', sql)
+    sql = NUMBER_RE.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    return SPACE_RE.sub(' ', sql).strip()
+
+
+def fingerprint(normalized):
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:12]
+
+
+def calling_context():
+    """Return ``(view name, 'path:line in function')`` for the innermost project frame."""
+    base = str(settings.BASE_DIR)
+    here = os.path.abspath(__file__)
+    frame = sys._getframe(2)
+    caller = view = None
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if caller is None and filename.startswith(base) and os.path.abspath(filename) != here and 'site-packages' not in filename:
+            caller = f'{os.path.relpath(filename, base)}:{frame.f_lineno} in {frame.f_code.co_name}'
+        if view is None:
+            request = frame.f_locals.get('request')
+            match = getattr(request, 'resolver_match', None)
+            if match is not None:
+                view = match.view_name
+        if caller is not None and view is not None:
+            break
+        frame = frame.f_back
+    return view, caller
+
+
+def explain(connection, sql, params):
+    prefix = connection.ops.explain_query_prefix()
+    # Inside the caller's transaction a savepoint keeps a failed EXPLAIN from aborting it (Postgres).
+    savepoint = transaction.atomic(using=connection.alias) if connection.in_atomic_block else nullcontext()
+    _local.explaining = True
+    try:
+        with savepoint, connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {sql}', params)
+            rows = cursor.fetchall()
+    except DatabaseError as exc:
+        return [f'EXPLAIN failed: {exc}']
+    finally:
+        _local.explaining = False
+    if connection.vendor == 'sqlite':
+        # (id, parent, notused, detail); indent children under their parent step.
+        depth = {0: -1}
+        lines = []
+        for node_id, parent, _, detail in rows:
+            depth[node_id] = depth.get(parent, -1) + 1
+            lines.append('  ' * depth[node_id] + detail)
+        return lines
+    return [row[0] if len(row) == 1 else ' | '.join(str(value) for value in row) for row in rows]
+
+
+def query_plan(queryset):
+    """EXPLAIN ``queryset`` on its own database, in the same format as logged plans."""
+    connection = connections[queryset.db]
+    sql, params = queryset.query.get_compiler(queryset.db).as_sql()
+    return explain(connection, sql, params)
+
+
+def record(entry, config):
+    logger.warning('slow_query %s', json.dumps(entry))
+    if config['LOG_FILE']:
+        line = json.dumps(entry) + '\n'
+        with _write_lock, open(config['LOG_FILE'], 'a', encoding='utf-8') as handle:
+            handle.write(line)
+
+
+class SlowQueryLogger:
+    """``execute_wrapper`` that records queries slower than ``THRESHOLD_MS``."""
+
+    def __init__(self, connection, config=None):
+        self.connection = connection
+        self.config = config or get_config()
+
+    def __call__(self, execute, sql, params, many, context):
+        if getattr(_local, 'explaining', False):
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        result = execute(sql, params, many, context)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if elapsed_ms >= self.config['THRESHOLD_MS']:
+            try:
+                self.report(sql, params, many, elapsed_ms)
+            except Exception:
+                logger.exception('Could not record slow query')
+        return result
+
+    def report(self, sql, params, many, elapsed_ms):
+        normalized = normalize_sql(sql)
+        view, caller = calling_context()
+        is_select = sql.lstrip().upper().startswith(('SELECT', 'WITH'))
+        plan = explain(self.connection, sql, params) if self.config['EXPLAIN'] and is_select and not many else []
+        record({
+            'at': timezone.now().isoformat(),
+            'fingerprint': fingerprint(normalized),
+            'duration_ms': round(elapsed_ms, 2),
+            'database': self.connection.alias,
+            'vendor': self.connection.vendor,
+            'sql': normalized,
+            'view': view,
+            'caller': caller,
+            'plan': plan,
+        }, self.config)
+
+
+def attach(sender=None, connection=None, **kwargs):
+    if not any(isinstance(wrapper, SlowQueryLogger) for wrapper in connection.execute_wrappers):
+        connection.execute_wrappers.append(SlowQueryLogger(connection))
+
+
+def install():
+    """Attach the slow query logger to every connection when ``PORTAL_SLOW_QUERIES['ENABLED']``."""
+    if get_config()['ENABLED']:
+        connection_created.connect(attach, dispatch_uid='portal-slow-queries')
+
+
+def read_log(path):
+    with open(path, encoding='utf-8') as handle:
+        for line in handle:
+            line = line.strip()
+            if line:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def full_scans(plan):
+    """SQLite plan steps that scan a whole table rather than searching an index."""
+    return [line.strip() for line in plan if line.strip().startswith('SCAN ') and 'COVERING INDEX' not in line]
+
+
+def summarize(entries):
+    """Group log entries by fingerprint, worst total time first."""
+    groups = {}
+    for entry in entries:
+        group = groups.get(entry['fingerprint'])
+        if group is None:
+            group = groups[entry['fingerprint']] = {
+                'fingerprint': entry['fingerprint'],
+                'sql': entry['sql'],
+                'count': 0,
+                'total_ms': 0.0,
+                'max_ms': 0.0,
+                'views': Counter(),
+                'callers': Counter(),
+                'plan': [],
+                'last_seen': None,
+            }
+        group['count'] += 1
+        group['total_ms'] += entry['duration_ms']
+        group['max_ms'] = max(group['max_ms'], entry['duration_ms'])
+        group['views'][entry.get('view') or '-'] += 1
+        group['callers'][entry.get('caller') or '-'] += 1
+        if entry.get('plan'):
+            group['plan'] = entry['plan']
+        group['last_seen'] = max(group['last_seen'] or entry['at'], entry['at'])
+    for group in groups.values():
+        group['mean_ms'] = group['total_ms'] / group['count']
+    return sorted(groups.values(), key=lambda group: group['total_ms'], reverse=True)
@@ -0,0 +1,341 @@
+import io
+import math
+import random
+import re
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from .bulk import chunked, resolve_by_name
+from .models import (
+    Category,
+    CustomRequest,
+    Industry,
+    Machine,
+    MachineDocument,
+    MachineImage,
+    RequestStatusLog,
+)
+from .recommendations import rebuild_recommendations
+from .search import REQUEST_INDEX, get_search_backend
+from .signals import invalidate_catalogue_caches
+
+# Synthetic rows carry these prefixes so a run can top up an earlier one instead of duplicating it.
+MACHINE_SLUG_PREFIX = 'synthetic-'
+MACHINE_CODE_PREFIX = 'TNX-SYN-'
+REQUEST_CODE_PREFIX = 'RQSYN'
+
+CATEGORIES = [
+    'Automation Lines', 'Processing Systems', 'Material Handling', 'Energy & Utilities',
+    'Packaging Machinery', 'CNC & Machining', 'Welding & Cutting', 'Lifting Equipment',
+    'Compressors & Pumps', 'Inspection & Metrology', 'Thermal Processing', 'Water Treatment',
+]
+INDUSTRIES = [
+    'Automotive & EV', 'Food & Beverage', 'Renewable Energy', 'Pharmaceutical',
+    'Construction Materials', 'Logistics & Warehousing', 'Mining & Aggregates', 'Textiles',
+    'Oil & Gas', 'Electronics',
+]
+MANUFACTURERS = [
+    'Atlas Robotics', 'Helios Industries', 'PureFlow Process', 'Siemens Motion', 'Kestrel Heavy',
+    'Orion Fabrication', 'Vanta Systems', 'Northwind Machines', 'Meridian Thermal', 'Cobalt Lift',
+    'Apex Packaging', 'Zenith Controls', 'Ironclad Works', 'Sable Automation', 'Tidewater Pumps',
+]
+SERIES = ['Forge', 'Pulse', 'Vector', 'Titan', 'Nova', 'Quantum', 'Summit', 'Axis', 'Core', 'Prime', 'Flux', 'Ridge']
+KINDS = {
+    'Automation Lines': ['Robotic Cell', 'Assembly Line', 'Vision Station'],
+    'Processing Systems': ['Mixing Skid', 'Reactor', 'Homogenizer'],
+    'Material Handling': ['Conveyor', 'Palletizer', 'AS/RS Module'],
+    'Energy & Utilities': ['Generator Set', 'UPS System', 'Heat Recovery Unit'],
+    'Packaging Machinery': ['Filler', 'Cartoner', 'Shrink Wrapper'],
+    'CNC & Machining': ['Machining Center', 'CNC Lathe', 'Grinder'],
+    'Welding & Cutting': ['Welding Cell', 'Laser Cutter', 'Plasma Table'],
+    'Lifting Equipment': ['Overhead Crane', 'Hoist', 'Scissor Lift'],
+    'Compressors & Pumps': ['Screw Compressor', 'Centrifugal Pump', 'Vacuum Pump'],
+    'Inspection & Metrology': ['CMM', 'X-Ray Inspector', 'Leak Tester'],
+    'Thermal Processing': ['Furnace', 'Kiln', 'Dryer'],
+    'Water Treatment': ['RO Plant', 'Clarifier', 'Filtration Skid'],
+}
+COMPANIES = ['Nova', 'Aurora', 'Summit', 'Delta', 'Pioneer', 'Crescent', 'Evergreen', 'Harbor', 'Granite', 'Falcon']
+COMPANY_SUFFIXES = ['Manufacturing', 'Industries', 'Foods', 'Energy', 'Logistics', 'Pharma', 'Materials', 'Holdings']
+FIRST_NAMES = ['Amelia', 'Omar', 'Sofia', 'Rizwan', 'Hana', 'Lucas', 'Priya', 'Daniel', 'Fatima', 'Kenji', 'Elena', 'Tariq']
+LAST_NAMES = ['Hart', 'Malik', 'El-Amin', 'Novak', 'Okafor', 'Chen', 'Schmidt', 'Haddad', 'Silva', 'Rossi', 'Khan', 'Berg']
+LOCATIONS = ['Karachi', 'Lahore', 'Dubai', 'Riyadh', 'Rotterdam', 'Hamburg', 'Houston', 'Toronto', 'Doha', 'Istanbul']
+TIMELINES = ['Within 3 months', '3-6 months', '6-12 months', 'Next fiscal year', '']
+CONTACT_METHODS = ['Email', 'Phone', 'WhatsApp', '']
+AVAILABILITY_WEIGHTS = [('in_stock', 55), ('back_order', 25), ('custom_build', 20)]
+STATUS_WEIGHTS = [
+    (CustomRequest.STATUS_NEW, 30),
+    (CustomRequest.STATUS_REVIEW, 30),
+    (CustomRequest.STATUS_QUOTED, 25),
+    (CustomRequest.STATUS_FULFILLED, 15),
+]
+STATUS_FLOW = [value for value, _ in CustomRequest.STATUS_CHOICES]
+PLACEHOLDER_IMAGES = 8
+PLACEHOLDER_DOCUMENTS = 4
+
+
+def zipf_weights(count, exponent=1.1):
+    """A long-tailed popularity curve: a few categories and industries hold most machines."""
+    return [1 / (rank ** exponent) for rank in range(1, count + 1)]
+
+
+def weighted(rng, pairs):
+    values, weights = zip(*pairs)
+    return rng.choices(values, weights=weights)[0]
+
+
+def row_rng(seed, kind, index):
+    """An RNG that depends only on the seed and row, so chunk size and top-up runs do not change output."""
+    return random.Random(f'{seed}:{kind}:{index}')
+
+
+def restore_timestamps(objects, fields, saved):
+    """Write generated ``auto_now``/``auto_now_add`` values back over the now() that ``bulk_create`` stamped."""
+    for obj, values in zip(objects, saved):
+        for field, value in zip(fields, values):
+            setattr(obj, field, value)
+    if objects:
+        type(objects[0]).objects.bulk_update(objects, fields, batch_size=1000)
+
+
+def next_index(queryset, field, prefix, width):
+    """One past the highest generated index, so a top-up after deletions never reuses one."""
+    last = (
+        queryset.filter(**{f'{field}__startswith': prefix, f'{field}__regex': rf'^{re.escape(prefix)}[0-9]{{{width}}}$'})
+        .order_by(f'-{field}')
+        .values_list(field, flat=True)
+        .first()
+    )
+    return int(last[len(prefix):]) + 1 if last else 0
+
+
+def ensure_placeholder_files():
+    """Write the small shared images and PDFs synthetic gallery and document rows point at."""
+    from PIL import Image
+
+    images = []
+    for index in range(PLACEHOLDER_IMAGES):
+        name = f'machines/gallery/synthetic/placeholder-{index}.jpg'
+        if not default_storage.exists(name):
+            buffer = io.BytesIO()
+            shade = 60 + index * 20
+            Image.new('RGB', (1200, 800), (shade, shade // 2 + 40, 120)).save(buffer, 'JPEG', quality=70)
+            name = default_storage.save(name, ContentFile(buffer.getvalue()))
+        images.append(name)
+    documents = []
+    for index in range(PLACEHOLDER_DOCUMENTS):
+        name = f'machines/documents/synthetic/datasheet-{index}.pdf'
+        if not default_storage.exists(name):
+            name = default_storage.save(name, ContentFile(b'%PDF-1.4\n% synthetic datasheet\n%%EOF\n'))
+        documents.append(name)
+    return images, documents
+
+
+class SyntheticCatalogue:
+    """Deterministically generates a large catalogue and request history with bulk inserts.
+
+    Every row is derived from ``(seed, index)`` alone, so the same seed always
+    produces the same data and a larger ``--scale`` tops up an earlier run
+    rather than starting over.
+    """
+
+    def __init__(self, seed=0, chunk_size=5000, now=None, progress=None):
+        self.seed = seed
+        self.chunk_size = chunk_size
+        # Anchored to midnight so a rerun on the same day reproduces the same timestamps.
+        self.now = (now or timezone.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+        self.progress = progress
+        self.images = []
+        self.documents = []
+
+    def prepare(self):
+        categories = resolve_by_name(Category, CATEGORIES, {})
+        industries = resolve_by_name(Industry, INDUSTRIES, {})
+        self.categories = [categories[name] for name in CATEGORIES]
+        self.industries = [industries[name] for name in INDUSTRIES]
+        self.category_weights = zipf_weights(len(self.categories))
+        self.industry_weights = zipf_weights(len(self.industries))
+        self.images, self.documents = ensure_placeholder_files()
+
+    def generate(self, machines=0, requests=0):
+        self.prepare()
+        machine_start = next_index(Machine.objects.all(), 'slug', MACHINE_SLUG_PREFIX, 8)
+        request_start = next_index(CustomRequest.objects.all(), 'reference_code', REQUEST_CODE_PREFIX, 9)
+        created_machines = created_requests = 0
+        started = time.monotonic()
+        for indexes in chunked(range(machine_start, machines), self.chunk_size):
+            created_machines += self.create_machines(indexes)
+            self.report('machines', created_machines, machines - machine_start, started)
+        started = time.monotonic()
+        for indexes in chunked(range(request_start, requests), self.chunk_size):
+            created_requests += self.create_requests(indexes)
+            self.report('requests', created_requests, requests - request_start, started)
+        if created_machines:
+            invalidate_catalogue_caches()
+            rebuild_recommendations()
+        return created_machines, created_requests
+
+    def report(self, kind, done, total, started):
+        if self.progress:
+            self.progress(kind, done, total, time.monotonic() - started)
+
+    def build_machine(self, index):
+        rng = row_rng(self.seed, 'machine', index)
+        category = rng.choices(self.categories, weights=self.category_weights)[0]
+        kind = rng.choice(KINDS.get(category.name, ['System']))
+        manufacturer = rng.choice(MANUFACTURERS)
+        series = rng.choice(SERIES)
+        model_number = f'{series[:2].upper()}-{rng.randint(100, 9999)}'
+        # Log-normal power and price: mostly mid-size machines with a tail of large installations.
+        power = min(Decimal(str(round(rng.lognormvariate(math.log(45), 1.1), 2))), Decimal('99999.99'))
+        price = Decimal(str(round(float(power) * rng.uniform(900, 2600) + rng.uniform(8000, 40000), -2)))
+        created_at = self.now - timedelta(days=rng.uniform(0, 3 * 365))
+        machine = Machine(
+            public_id=f'{MACHINE_CODE_PREFIX}{index:08d}',
+            slug=f'{MACHINE_SLUG_PREFIX}{index:08d}',
+            name=f'{manufacturer} {series} {kind} {model_number}',
+            category=category,
+            short_description=f'{series}-series {kind.lower()} from {manufacturer} rated at {power} kW.',
+            description=(
+                f'The {manufacturer} {series} {kind} is built for continuous duty in {category.name.lower()} '
+                f'applications, with remote diagnostics, modular tooling and a {rng.choice([12, 18, 24, 36])}-month service plan.'
+            ),
+            key_features='\n'.join(rng.sample([
+                'Remote condition monitoring', 'Energy recovery mode', 'Quick-change tooling',
+                'CE and UL certified', 'PLC integration kit', 'Operator training included',
+                'Stainless contact parts', 'Predictive maintenance alerts',
+            ], 3)),
+            model_number=model_number,
+            manufacturer=manufacturer,
+            power_rating_kw=power,
+            capacity_output=f'{rng.randint(1, 400) * 25:,} units/hr',
+            price_from=price if rng.random() > 0.1 else None,
+            currency='USD',
+            lead_time_weeks=rng.randint(2, 30),
+            warranty_months=rng.choice([12, 18, 24, 36]),
+            availability_status=weighted(rng, AVAILABILITY_WEIGHTS),
+            is_featured=rng.random() < 0.02,
+            financing_available=rng.random() < 0.4,
+            created_at=created_at,
+            updated_at=created_at + timedelta(days=rng.uniform(0, 60)),
+        )
+        industries = {
+            industry.pk
+            for industry in rng.choices(self.industries, weights=self.industry_weights, k=rng.randint(1, 3))
+        }
+        images = [
+            MachineImage(
+                image=self.images[(index + offset) % len(self.images)],
+                caption=f'{kind} view {offset + 1}',
+                is_primary=offset == 0,
+                display_order=offset,
+            )
+            for offset in range(rng.choice([0, 1, 2, 3, 4]))
+        ]
+        documents = [
+            MachineDocument(label=label, document=self.documents[(index + offset) % len(self.documents)])
+            for offset, label in enumerate(rng.sample(['Datasheet', 'Installation guide', 'Compliance certificate'], rng.randint(0, 2)))
+        ]
+        return machine, industries, images, documents
+
+    def create_machines(self, indexes):
+        built = [self.build_machine(index) for index in indexes]
+        machines = [machine for machine, _, _, _ in built]
+        timestamps = ('created_at', 'updated_at')
+        saved = [[getattr(machine, field) for field in timestamps] for machine in machines]
+        with transaction.atomic():
+            Machine.objects.bulk_create(machines, batch_size=1000)
+            if any(machine.pk is None for machine in machines):
+                ids = dict(Machine.objects.filter(slug__in=[m.slug for m in machines]).values_list('slug', 'id'))
+                for machine in machines:
+                    machine.pk = ids[machine.slug]
+            restore_timestamps(machines, timestamps, saved)
+            through = Machine.industries.through
+            links, images, documents = [], [], []
+            for machine, industries, machine_images, machine_documents in built:
+                links.extend(through(machine_id=machine.pk, industry_id=industry_id) for industry_id in industries)
+                for item in machine_images + machine_documents:
+                    item.machine_id = machine.pk
+                images.extend(machine_images)
+                documents.extend(machine_documents)
+            through.objects.bulk_create(links, batch_size=1000)
+            MachineImage.objects.bulk_create(images, batch_size=1000)
+            MachineDocument.objects.bulk_create(documents, batch_size=1000)
+            get_search_backend().index(machines, replace=False)
+        return len(machines)
+
+    def build_request(self, index):
+        rng = row_rng(self.seed, 'request', index)
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        company = f'{rng.choice(COMPANIES)} {rng.choice(COMPANY_SUFFIXES)}'
+        category = rng.choices(self.categories, weights=self.category_weights)[0]
+        budget_min = Decimal(rng.randint(2, 400) * 5000)
+        status = weighted(rng, STATUS_WEIGHTS)
+        created_at = self.now - timedelta(days=rng.uniform(0, 2 * 365))
+        custom_request = CustomRequest(
+            reference_code=f'{REQUEST_CODE_PREFIX}{index:09d}',
+            contact_name=f'{first} {last}',
+            company_name=company,
+            email=f'{first.lower()}.{last.lower().replace("-", "")}{index}@{company.split()[0].lower()}.example',
+            phone=f'+1 555 {rng.randint(1000000, 9999999)}',
+            industry=rng.choices(self.industries, weights=self.industry_weights)[0] if rng.random() > 0.15 else None,
+            machine_type=rng.choice(KINDS.get(category.name, ['System'])),
+            capacity_requirement=f'{rng.randint(1, 200) * 50:,} units/hr' if rng.random() > 0.3 else '',
+            budget_min=budget_min if rng.random() > 0.2 else None,
+            budget_max=budget_min * Decimal(str(round(rng.uniform(1.2, 3), 2))) if rng.random() > 0.3 else None,
+            currency=rng.choice(['USD', 'USD', 'USD', 'EUR', 'AED', 'PKR']),
+            project_location=rng.choice(LOCATIONS),
+            deployment_timeline=rng.choice(TIMELINES),
+            description=f'Looking for a {category.name.lower()} solution to expand capacity at our {rng.choice(LOCATIONS)} site.',
+            preferred_contact_method=rng.choice(CONTACT_METHODS),
+            status=status,
+            created_at=created_at,
+        )
+        # One log per step the request has moved through, spaced a few days apart.
+        logs = []
+        stamp = created_at
+        for step in STATUS_FLOW[:STATUS_FLOW.index(status) + 1]:
+            logs.append(RequestStatusLog(status=step, comment='Status updated automatically.', created_at=stamp))
+            stamp += timedelta(days=rng.uniform(0.5, 14))
+        custom_request.updated_at = logs[-1].created_at
+        return custom_request, logs
+
+    def create_requests(self, indexes):
+        built = [self.build_request(index) for index in indexes]
+        requests = [custom_request for custom_request, _ in built]
+        timestamps = ('created_at', 'updated_at')
+        saved = [[getattr(custom_request, field) for field in timestamps] for custom_request in requests]
+        with transaction.atomic():
+            CustomRequest.objects.bulk_create(requests, batch_size=1000)
+            if any(custom_request.pk is None for custom_request in requests):
+                ids = dict(
+                    CustomRequest.objects.filter(reference_code__in=[r.reference_code for r in requests])
+                    .values_list('reference_code', 'id')
+                )
+                for custom_request in requests:
+                    custom_request.pk = ids[custom_request.reference_code]
+            restore_timestamps(requests, timestamps, saved)
+            logs = []
+            for custom_request, request_logs in built:
+                for log in request_logs:
+                    log.custom_request_id = custom_request.pk
+                logs.extend(request_logs)
+            saved = [[log.created_at] for log in logs]
+            RequestStatusLog.objects.bulk_create(logs, batch_size=1000)
+            if any(log.pk is None for log in logs):
+                # Each request logs a status once, so (request, status) finds the row.
+                ids = {
+                    (request_id, status): pk
+                    for pk, request_id, status in RequestStatusLog.objects.filter(custom_request__in=requests)
+                    .values_list('pk', 'custom_request_id', 'status')
+                }
+                for log in logs:
+                    log.pk = ids[(log.custom_request_id, log.status)]
+            restore_timestamps(logs, ('created_at',), saved)
+            get_search_backend(spec=REQUEST_INDEX).index(requests, replace=False)
+        return len(requests)
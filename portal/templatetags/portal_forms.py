@@ -0,0 +1,43 @@
+from django import template
+
+from ..form_markup import render_form_markup
+
+register = template.Library()
+
+
+class CachedFormNode(template.Node):
+    def __init__(self, nodelist, form_name, fragment):
+        self.nodelist = nodelist
+        self.form_name = form_name
+        self.fragment = fragment
+
+    def render(self, context):
+        form = template.Variable(self.form_name).resolve(context)
+        fragment = self.fragment.resolve(context)
+
+        def render_block(form):
+            with context.push({self.form_name: form}):
+                return self.nodelist.render(context)
+
+        return render_form_markup(form, fragment, render_block)
+
+
+@register.tag
+def cached_form(parser, token):
+    """Cache the enclosed markup of an unbound form, once per fragment name.
+
+    Usage::
+
+        {% cached_form custom_request_form "landing" %}
+            {{ custom_request_form|crispy }}
+        {% endcached_form %}
+
+    The block may only depend on the form, which must be a plain context
+    variable; bound forms are always rendered.
+    """
+    bits = token.split_contents()
+    if len(bits) != 3 or '.' in bits[1]:
+        raise template.TemplateSyntaxError(f'{bits[0]} takes a form variable and a fragment name.')
+    nodelist = parser.parse(('endcached_form',))
+    parser.delete_first_token()
+    return CachedFormNode(nodelist, bits[1], parser.compile_filter(bits[2]))
@@ -0,0 +1,44 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from ..images import derivatives, srcset_for
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(field_file, alt='', sizes='100vw', css_class='', loading='lazy'):
+    """Render ``field_file`` as a ``<picture>`` with WebP and fallback ``srcset`` candidates.
+
+    Until the derivatives exist (they are queued on first use) the original is served.
+    """
+    if not field_file:
+        return ''
+    entries = srcset_for(field_file)
+    if not entries:
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" loading="{}" decoding="async">',
+            field_file.url, alt, css_class, loading,
+        )
+    *sources, (_, _, fallback_srcset, _) = entries
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" alt="{}" class="{}" loading="{}" decoding="async"></picture>',
+        format_html_join('', '<source type="{}" srcset="{}" sizes="{}">', ((content_type, srcset, sizes) for _, content_type, srcset, _ in sources)),
+        field_file.url, fallback_srcset, sizes, alt, css_class, loading,
+    )
+
+
+@register.simple_tag
+def image_variant_url(field_file, width):
+    """URL of the smallest fallback-format variant at least ``width`` pixels wide (or the original)."""
+    if not field_file:
+        return ''
+    entries = srcset_for(field_file)
+    if not entries:
+        return field_file.url
+    _, _, _, variants = entries[-1]
+    width = int(width)
+    for variant_width, stored in variants:
+        if variant_width >= width:
+            return field_file.storage.url(stored)
+    return field_file.storage.url(variants[-1][1])
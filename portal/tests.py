@@ -1,3 +1,1250 @@
-from django.test import TestCase
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import unittest.mock
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core import mail
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .facets import compute_facet_counts, get_facet_counts
+from .benchmarks import run_benchmarks
+from .caching import entry_timeout
+from .catalogue_import import CatalogueImporter, read_rows
+from .concurrency import run_concurrently
+from .forms import CustomRequestForm, MachineFilterForm
+from .images import derivatives
+from .instrumentation import wrap_request_queries
+from .landing import landing_cache
+from .metrics import Registry
+from .pagination import EstimatedCountPaginator, KeysetPaginator, encode_cursor
+from .models import FAQ, Category, CustomRequest, Industry, Machine, MachineRecommendation, OutboxMessage, RequestStatusLog, SiteSettings, Testimonial
+from .notifications import deliver_batch
+from .page_cache import CSRF_INPUT, page_cache
+from . import recommendations
+from .recommendations import rebuild_recommendations, refresh_recommendations
+from .replication import PrimaryPinningMiddleware, PrimaryReplicaRouter, copy_database, is_pinned, pin_to_primary, read_from_replica
+from .search import MACHINE_INDEX, REQUEST_INDEX, PostgresSearchBackend, get_search_backend
+from .site_settings import SiteSettingsProvider
+from .slow_queries import SlowQueryLogger, explain, normalize_sql, query_plan
+from .synthetic import SyntheticCatalogue
+
+STATIC_STORAGE = override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+
+
+def make_machine(category, **kwargs):
+    defaults = {
+        'short_description': 'Industrial asset',
+        'description': 'General purpose production equipment.',
+    }
+    defaults.update(kwargs)
+    return Machine.objects.create(category=category, **defaults)
+
+
+class MachineSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.automation = Category.objects.create(name='Automation Lines')
+        cls.processing = Category.objects.create(name='Processing Systems')
+        cls.automotive = Industry.objects.create(name='Automotive & EV')
+        cls.welder = make_machine(cls.automation, name='HyperForge Welding Cell', model_number='HF-4200X', power_rating_kw=Decimal('65'))
+        cls.welder.industries.add(cls.automotive)
+        cls.skid = make_machine(
+            cls.processing,
+            name='AquaPure CIP Skid',
+            description='Pairs with any welding line for post-weld cleaning.',
+            power_rating_kw=Decimal('32'),
+        )
+
+    def search(self, query, queryset=None):
+        queryset = Machine.objects.all() if queryset is None else queryset
+        return list(get_search_backend().search(queryset, query).order_by('-search_rank'))
+
+    def test_name_matches_rank_above_description_matches(self):
+        self.assertEqual(self.search('welding'), [self.welder, self.skid])
+
+    def test_model_number_and_prefix_match(self):
+        self.assertEqual(self.search('HF-42'), [self.welder])
+
+    def test_composes_with_filters(self):
+        queryset = Machine.objects.filter(power_rating_kw__lte=40)
+        self.assertEqual(self.search('welding', queryset), [self.skid])
+        queryset = Machine.objects.filter(industries=self.automotive)
+        self.assertEqual(self.search('welding', queryset), [self.welder])
+
+    def test_index_follows_save_and_delete(self):
+        self.skid.name = 'AquaPure Laminator'
+        self.skid.description = 'Cleaning skid.'
+        self.skid.save()
+        self.assertEqual(self.search('laminator'), [self.skid])
+        self.assertEqual(self.search('welding'), [self.welder])
+        self.welder.delete()
+        self.assertEqual(self.search('welding'), [])
+
+    @STATIC_STORAGE
+    def test_catalogue_search_view(self):
+        response = self.client.get(reverse('portal:machine_list'), {'search': 'welding', 'category': self.processing.pk})
+        self.assertEqual(list(response.context['machines']), [self.skid])
+
+    def test_postgres_search_indexes_cover_the_ranked_document(self):
+        import importlib
+
+        migration = importlib.import_module('portal.migrations.0007_postgres_search_indexes')
+        specs = {'machine': MACHINE_INDEX, 'customrequest': REQUEST_INDEX}
+        for name, model_name, columns in migration.SEARCH_INDEXES:
+            index = migration.search_index(name, columns)
+            self.assertEqual(index.expressions[0], PostgresSearchBackend(spec=specs[model_name]).document())
+
+
+class LandingCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.industry = Industry.objects.create(name='Food & Beverage')
+        Testimonial.objects.create(client_name='Amelia', company='NovaVolt', quote='Great.', industry=cls.industry)
+        FAQ.objects.create(question='Lead time?', answer='Twelve weeks.')
+
+    def setUp(self):
+        cache.clear()
+        landing_cache.stats.reset()
+
+    def test_warm_hit_does_no_queries(self):
+        landing_cache.get_many()
+        with self.assertNumQueries(0):
+            context = landing_cache.get_many()
+        self.assertEqual(context['testimonials'][0].industry.name, 'Food & Beverage')
+        self.assertEqual(landing_cache.stats.hits, len(landing_cache.sections))
+        self.assertEqual(landing_cache.stats.misses, len(landing_cache.sections))
+
+    def test_model_change_invalidates_only_dependent_sections(self):
+        landing_cache.get_many()
+        FAQ.objects.create(question='Financing?', answer='Yes.')
+        with self.assertNumQueries(1):
+            context = landing_cache.get_many()
+        self.assertEqual(len(context['faqs']), 2)
+
+    @STATIC_STORAGE
+    def test_landing_page_renders_from_cache(self):
+        self.client.get(reverse('portal:landing'))
+        response = self.client.get(reverse('portal:landing'))
+        self.assertContains(response, 'Lead time?')
+
+
+class ProcessLocalCacheTests(SimpleTestCase):
+    @override_settings(PORTAL_LOCAL_CACHE_TIMEOUT=30)
+    def test_local_cache_entries_are_short_lived(self):
+        self.assertEqual(entry_timeout(60 * 60 * 6), 30)
+        self.assertEqual(entry_timeout(None), 30)
+        self.assertEqual(entry_timeout(10), 10)
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': tempfile.gettempdir()}}
+        with override_settings(CACHES=shared):
+            self.assertEqual(entry_timeout(60 * 60 * 6), 60 * 60 * 6)
+
+
+class SiteSettingsProviderTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        SiteSettings.objects.create(business_name='Titan Nexus')
+
+    def test_serves_from_memory_within_check_interval(self):
+        provider = SiteSettingsProvider(check_interval=60, source='database')
+        provider.get()
+        with self.assertNumQueries(0):
+            self.assertEqual(provider.get().business_name, 'Titan Nexus')
+
+    def test_database_probe_picks_up_changes_from_other_workers(self):
+        provider = SiteSettingsProvider(check_interval=0, source='database')
+        provider.get()
+        with self.assertNumQueries(1):
+            provider.get()
+        SiteSettings.objects.filter(pk=1).update(business_name='Renamed', updated_at=timezone.now() + timedelta(seconds=1))
+        self.assertEqual(provider.get().business_name, 'Renamed')
+
+    def test_cache_stamp_picks_up_saves(self):
+        worker_a = SiteSettingsProvider(check_interval=0, source='cache')
+        worker_b = SiteSettingsProvider(check_interval=0, source='cache')
+        worker_a.get()
+        worker_b.get()
+        with self.assertNumQueries(0):
+            worker_b.get()
+        settings_obj = SiteSettings.load()
+        settings_obj.business_name = 'Renamed'
+        settings_obj.save()
+        worker_a.invalidate()
+        self.assertEqual(worker_b.get().business_name, 'Renamed')
+
+
+class FacetCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.automation = Category.objects.create(name='Automation Lines')
+        cls.processing = Category.objects.create(name='Processing Systems')
+        cls.automotive = Industry.objects.create(name='Automotive & EV')
+        cls.food = Industry.objects.create(name='Food & Beverage')
+        welder = make_machine(cls.automation, name='Welding Cell', financing_available=True)
+        welder.industries.add(cls.automotive, cls.food)
+        skid = make_machine(cls.processing, name='CIP Skid', availability_status='back_order')
+        skid.industries.add(cls.food)
+        make_machine(cls.processing, name='Mixer', financing_available=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def counts(self, **params):
+        form = MachineFilterForm(params or None)
+        form.is_valid()
+        with self.assertNumQueries(4):
+            return compute_facet_counts(form)
+
+    def test_unfiltered_counts(self):
+        counts = self.counts()
+        self.assertEqual(counts['total'], 3)
+        self.assertEqual(counts['category'], {self.automation.pk: 1, self.processing.pk: 2})
+        self.assertEqual(counts['industry'], {self.automotive.pk: 1, self.food.pk: 2})
+        self.assertEqual(counts['availability'], {'in_stock': 2, 'back_order': 1})
+        self.assertEqual(counts['financing'], 2)
+
+    def test_facets_ignore_their_own_filter(self):
+        counts = self.counts(industry=self.food.pk, category=self.processing.pk)
+        self.assertEqual(counts['total'], 1)
+        self.assertEqual(counts['category'], {self.automation.pk: 1, self.processing.pk: 1})
+        self.assertEqual(counts['industry'], {self.food.pk: 1})
+        self.assertEqual(counts['financing'], 0)
+
+    def test_cached_by_normalized_filter_key(self):
+        get_facet_counts(MachineFilterForm({'power_min': '10.0', 'search': ' Welding  '}))
+        with self.assertNumQueries(0):
+            get_facet_counts(MachineFilterForm({'search': 'welding', 'power_min': '10'}))
+        make_machine(self.automation, name='Press')
+        self.assertEqual(get_facet_counts(MachineFilterForm({}))['total'], 4)
+
+
+class KeysetPaginationTests(TestCase):
+    ordering = (('is_featured', True), ('name', False), ('id', False))
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Automation Lines')
+        for index in range(11):
+            make_machine(category, name=f'Machine {index % 3}', is_featured=index in (2, 5))
+        cls.expected = list(Machine.objects.order_by('-is_featured', 'name', 'id'))
+
+    def test_walks_forward_and_back(self):
+        paginator = KeysetPaginator(Machine.objects.all(), 4, self.ordering)
+        first = paginator.page()
+        second = paginator.page(first.next_cursor)
+        third = paginator.page(second.next_cursor)
+        self.assertFalse(first.has_previous())
+        self.assertFalse(third.has_next())
+        self.assertEqual(first.object_list + second.object_list + third.object_list, self.expected)
+        self.assertEqual(paginator.page(third.previous_cursor).object_list, second.object_list)
+        self.assertEqual(paginator.page(second.previous_cursor).object_list, first.object_list)
+
+    @STATIC_STORAGE
+    def test_catalogue_cursor_mode(self):
+        cache.clear()
+        url = reverse('portal:machine_list')
+        response = self.client.get(url, {'cursor': ''})
+        self.assertTrue(response.context['cursor_pagination'])
+        self.assertEqual(response.context['page_obj'].total, 11)
+        response = self.client.get(url, {'cursor': response.context['page_obj'].next_cursor})
+        self.assertEqual(list(response.context['machines']), self.expected[9:])
+        self.assertFalse(response.context['page_obj'].has_next())
+        self.assertEqual(self.client.get(url, {'cursor': 'garbage'}).status_code, 404)
+        for values in (['next', 'x', 1, 'abc'], ['next', True, ['x'], 1], ['prev', None, 'a', 1]):
+            crafted = encode_cursor(values[1:], values[0])
+            self.assertEqual(self.client.get(url, {'cursor': crafted}).status_code, 404)
+            self.assertEqual(self.client.get(reverse('portal:api_machine_list'), {'cursor': crafted}).status_code, 400)
+
+
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        from PIL import Image
+
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.override = override_settings(MEDIA_ROOT=self.media_root, PORTAL_IMAGE_DERIVATIVES={'LAZY': False})
+        self.override.enable()
+        self.addCleanup(self.override.disable)
+        buffer = io.BytesIO()
+        Image.new('RGB', (1000, 500), 'orange').save(buffer, 'JPEG')
+        category = Category.objects.create(name='Automation Lines')
+        self.machine = make_machine(
+            category,
+            name='Welding Cell',
+            hero_image=SimpleUploadedFile('cell.jpg', buffer.getvalue(), content_type='image/jpeg'),
+        )
+
+    def test_generates_variants_once_per_source_hash(self):
+        image = self.machine.hero_image
+        manifest = derivatives.generate(image.storage, image.name)
+        self.assertEqual([width for width, _ in manifest['variants']['webp']], [320, 640, 960, 1000])
+        self.assertTrue(all(image.storage.exists(name) for _, name in manifest['variants']['jpeg']))
+        self.assertIsNone(derivatives.generate(image.storage, image.name))
+
+    def test_template_tag_emits_srcset(self):
+        template = Template('{% load portal_images %}{% responsive_image image alt="Cell" sizes="50vw" %}')
+        self.assertIn('loading="lazy"', template.render(Context({'image': self.machine.hero_image})))
+        derivatives.generate(self.machine.hero_image.storage, self.machine.hero_image.name)
+        html = template.render(Context({'image': self.machine.hero_image}))
+        self.assertIn('<source type="image/webp" srcset="', html)
+        self.assertIn('.640w.jpg 640w', html)
+        self.assertIn('sizes="50vw"', html)
+
+
+class FailingBackend:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def send_messages(self, messages):
+        raise ConnectionError('relay timeout')
+
+
+@override_settings(
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    CONTACT_EMAIL='sales@example.com',
+    PORTAL_OUTBOX={'MAX_ATTEMPTS': 2, 'BACKOFF_SECONDS': 0},
+)
+class OutboxTests(TestCase):
+    form_data = {
+        'contact_name': 'Amelia Hart',
+        'company_name': 'NovaVolt',
+        'email': 'amelia@example.com',
+        'machine_type': 'Welding cell',
+        'currency': 'USD',
+        'description': 'Two stations.',
+    }
+
+    def test_submission_queues_instead_of_sending(self):
+        response = self.client.post(reverse('portal:custom_request'), self.form_data)
+        self.assertRedirects(response, reverse('portal:request_thanks'), fetch_redirect_response=False)
+        self.assertEqual(len(mail.outbox), 0)
+        message = OutboxMessage.objects.get()
+        self.assertEqual(message.custom_request, CustomRequest.objects.get())
+        call_command('send_outbox', stdout=io.StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn(message.custom_request.reference_code, mail.outbox[0].subject)
+        message.refresh_from_db()
+        self.assertEqual(message.status, OutboxMessage.STATUS_SENT)
+
+    def test_failures_retry_then_dead_letter(self):
+        OutboxMessage.objects.create(subject='Hi', body='Body', from_email='a@example.com', recipients=['b@example.com'])
+        self.assertEqual(deliver_batch(connection=FailingBackend()), (0, 1, 0))
+        message = OutboxMessage.objects.get()
+        self.assertEqual((message.status, message.attempts), (OutboxMessage.STATUS_PENDING, 1))
+        self.assertEqual(deliver_batch(connection=FailingBackend()), (0, 0, 1))
+        message.refresh_from_db()
+        self.assertEqual(message.status, OutboxMessage.STATUS_DEAD)
+        self.assertIn('relay timeout', message.last_error)
+
+
+class CatalogueImportTests(TestCase):
+    csv_text = (
+        'name,category,industries,model_number,power_rating_kw,availability_status,is_featured\n'
+        'HyperForge Cell,Automation Lines,Automotive & EV|Food & Beverage,HF-1,65,In Stock,yes\n'
+        'AquaPure Skid,Processing Systems,Food & Beverage,CIP-4,32,back_order,no\n'
+        'Broken,,,,,,\n'
+    )
+
+    def run_import(self, text, fmt='csv'):
+        importer = CatalogueImporter(chunk_size=2)
+        importer.run(read_rows(io.StringIO(text), fmt))
+        return importer
+
+    def test_imports_and_upserts_by_slug(self):
+        importer = self.run_import(self.csv_text)
+        self.assertEqual(importer.imported, 2)
+        self.assertEqual(importer.errors, [(4, 'category is required')])
+        cell = Machine.objects.get(slug='hyperforge-cell')
+        self.assertTrue(cell.is_featured)
+        self.assertEqual(sorted(cell.industries.values_list('name', flat=True)), ['Automotive & EV', 'Food & Beverage'])
+        public_id = cell.public_id
+
+        self.run_import('{"slug": "hyperforge-cell", "power_rating_kw": 70, "industries": ["Automotive & EV"]}\n', 'jsonl')
+        cell.refresh_from_db()
+        self.assertEqual((cell.power_rating_kw, cell.public_id), (Decimal('70'), public_id))
+        # Columns the row leaves out keep their values.
+        self.assertEqual((cell.name, cell.model_number, cell.is_featured), ('HyperForge Cell', 'HF-1', True))
+        self.assertEqual(list(cell.industries.values_list('name', flat=True)), ['Automotive & EV'])
+        self.assertEqual(Machine.objects.count(), 2)
+        self.assertEqual(Category.objects.count(), 2)
+        self.assertEqual(list(get_search_backend().search(Machine.objects.all(), 'CIP-4')), [Machine.objects.get(slug='aquapure-skid')])
+
+    def test_reports_collisions_and_duplicates_instead_of_merging(self):
+        presses = Category.objects.create(name='Presses')
+        admin_press = make_machine(presses, name='Titan Press', model_number='ADMIN-1')
+        importer = self.run_import(
+            'name,slug,category,model_number\n'
+            'Titan Press,,Presses,T-2\n'
+            'Titan Press!,,Presses,T-3\n'
+            'Titan Press!,,Presses,T-4\n'
+            'Forge,forge-1,Presses,F-1\n'
+            'Forge Mk II,forge-1,Presses,F-2\n'
+        )
+        self.assertEqual(importer.imported, 2)
+        self.assertEqual(importer.errors, [
+            (2, "a machine named 'Titan Press' already exists; give its slug to update it"),
+            (4, "duplicate of line 3 (name 'Titan Press!')"),
+            (6, "duplicate of line 5 (slug 'forge-1')"),
+        ])
+        admin_press.refresh_from_db()
+        self.assertEqual(admin_press.model_number, 'ADMIN-1')
+        # A different name with the same slug gets the next free one, as Machine.save would give it.
+        self.assertEqual(Machine.objects.get(model_number='T-3').slug, 'titan-press-1')
+        self.assertEqual(Machine.objects.get(slug='forge-1').model_number, 'F-1')
+
+
+class SyntheticCatalogueTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.override = override_settings(MEDIA_ROOT=self.media_root)
+        self.override.enable()
+        self.addCleanup(self.override.disable)
+
+    def snapshot(self):
+        return list(Machine.objects.filter(slug__startswith='synthetic-').order_by('slug').values_list(
+            'slug', 'name', 'category__name', 'power_rating_kw', 'price_from', 'created_at',
+        ))
+
+    def test_deterministic_and_tops_up(self):
+        now = timezone.now()
+        generator = SyntheticCatalogue(seed=7, chunk_size=3, now=now)
+        self.assertEqual(generator.generate(machines=5, requests=4), (5, 4))
+        first = self.snapshot()
+        self.assertEqual(SyntheticCatalogue(seed=7, now=now).generate(machines=8, requests=4), (3, 0))
+        self.assertEqual(self.snapshot()[:5], first)
+
+        Machine.objects.filter(slug__startswith='synthetic-').delete()
+        SyntheticCatalogue(seed=7, chunk_size=10, now=now).generate(machines=5)
+        self.assertEqual(self.snapshot(), first)
+
+        machine = Machine.objects.get(slug='synthetic-00000000')
+        self.assertTrue(machine.industries.exists())
+        self.assertEqual(list(get_search_backend().search(Machine.objects.all(), machine.model_number))[0], machine)
+        for custom_request in CustomRequest.objects.filter(reference_code__startswith='RQSYN'):
+            self.assertEqual(
+                RequestStatusLog.objects.filter(custom_request=custom_request).order_by('created_at').last().status,
+                custom_request.status,
+            )
+
+    def test_top_up_after_deletions_keeps_generated_timestamps(self):
+        now = timezone.now()
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        SyntheticCatalogue(seed=3, now=now).generate(machines=4, requests=2)
+        Machine.objects.filter(slug='synthetic-00000001').delete()
+        CustomRequest.objects.filter(reference_code='RQSYN000000000').delete()
+        self.assertEqual(SyntheticCatalogue(seed=3, now=now).generate(machines=6, requests=3), (2, 1))
+        self.assertTrue(Machine._meta.get_field('updated_at').auto_now)
+        self.assertLessEqual(Machine.objects.get(slug='synthetic-00000005').created_at, midnight)
+        custom_request = CustomRequest.objects.get(reference_code='RQSYN000000002')
+        self.assertLessEqual(custom_request.created_at, midnight)
+        self.assertLessEqual(custom_request.status_logs.order_by('created_at').first().created_at, midnight)
+
+
+@STATIC_STORAGE
+class BenchmarkBudgetTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.override = override_settings(MEDIA_ROOT=self.media_root)
+        self.override.enable()
+        self.addCleanup(self.override.disable)
+        call_command('seed_data', stdout=io.StringIO())
+        SyntheticCatalogue(seed=1).generate(machines=40, requests=20)
+
+    def test_views_stay_within_query_budgets(self):
+        report = run_benchmarks(iterations=1, check_timing=False)
+        self.assertEqual(report['violations'], [])
+        names = {result['name'] for result in report['results']}
+        self.assertTrue({'landing', 'machine_detail', 'custom_request:post', 'admin:machine'} <= names)
+        self.assertIn('catalogue[search+category+industry+availability+financing+power]', names)
+
+
+@STATIC_STORAGE
+class RequestTimingTests(TestCase):
+    @override_settings(PORTAL_REQUEST_TIMING={'ENABLED': True})
+    def test_server_timing_header_and_log(self):
+        make_machine(Category.objects.create(name='Automation Lines'), name='Welding Cell')
+        with self.assertLogs('portal.timing', 'INFO') as logs:
+            response = self.client.get(reverse('portal:machine_list'))
+        header = response['Server-Timing']
+        for metric in ('db;dur=', 'view;dur=', 'render;dur=', 'total;dur='):
+            self.assertIn(metric, header)
+        self.assertRegex(header, r'desc="[1-9]\d* queries"')
+        self.assertIn('"view": "portal:machine_list"', logs.output[0])
+
+    @override_settings(PORTAL_REQUEST_TIMING={'ENABLED': True, 'SAMPLE_RATE': 0})
+    def test_unsampled_requests_are_untouched(self):
+        response = self.client.get(reverse('portal:custom_request'))
+        self.assertNotIn('Server-Timing', response)
+
+    def test_disabled_by_default(self):
+        self.assertNotIn('Server-Timing', self.client.get(reverse('portal:custom_request')))
+
+
+@STATIC_STORAGE
+class SlowQueryLogTests(TestCase):
+    def test_normalize_sql(self):
+        self.assertEqual(
+            normalize_sql("SELECT * FROM t WHERE a = 'x''y' AND b IN (%s, %s, %s) AND c > 10"),
+            normalize_sql('SELECT *  FROM t WHERE a = %s AND b IN (%s) AND c > 3'),
+        )
+
+    def test_logs_slow_queries_with_plan_and_reports_them(self):
+        category = Category.objects.create(name='Automation Lines')
+        make_machine(category, name='Welding Cell', power_rating_kw=Decimal('40'))
+        log_file = tempfile.NamedTemporaryFile(suffix='.jsonl', delete=False).name
+        self.addCleanup(os.remove, log_file)
+        config = {'ENABLED': True, 'THRESHOLD_MS': 0, 'EXPLAIN': True, 'LOG_FILE': log_file}
+        with self.assertLogs('portal.slow_queries', 'WARNING'):
+            with connection.execute_wrapper(SlowQueryLogger(connection, config)):
+                self.client.get(reverse('portal:machine_list'), {'power_min': '10', 'category': category.pk})
+                self.client.get(reverse('portal:machine_list'), {'power_min': '20', 'category': category.pk})
+
+        out = io.StringIO()
+        call_command('slow_query_report', log=log_file, limit=50, stdout=out)
+        report = out.getvalue()
+        self.assertIn('"portal_machine"."power_rating_kw" >= ?', report)
+        self.assertIn('views:   portal:machine_list', report)
+        self.assertIn('caller:  portal/facets.py', report)
+        self.assertIn('plan:', report)
+        self.assertRegex(report, r'2x  total')
+
+    def test_failed_explain_leaves_the_transaction_usable(self):
+        with transaction.atomic(), CaptureQueriesContext(connection) as queries:
+            plan = explain(connection, 'SELECT * FROM portal_missing_table', ())
+            self.assertEqual(Category.objects.count(), 0)
+        self.assertTrue(plan[0].startswith('EXPLAIN failed:'))
+        self.assertIn('ROLLBACK TO SAVEPOINT', ' '.join(query['sql'] for query in queries.captured_queries))
+
+
+@STATIC_STORAGE
+class MetricsTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.override = override_settings(PORTAL_METRICS={
+            'ENABLED': True, 'DIRECTORY': self.directory, 'FLUSH_INTERVAL': 0, 'TOKEN': 'scrape-me',
+        })
+        self.override.enable()
+        self.addCleanup(self.override.disable)
+
+    def scrape(self):
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-me')
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_requires_token_or_staff(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        with override_settings(PORTAL_METRICS={'ENABLED': False}):
+            self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-me').status_code, 404)
+
+    def test_aggregates_worker_snapshots(self):
+        # Another worker's snapshot in the shared directory.
+        other = Registry()
+        other.inc('portal_http_requests_total', {'view': 'portal:custom_request', 'method': 'GET', 'status': 200}, 4)
+        other.observe('portal_http_request_duration_seconds', 0.02, (0.01, 0.05), {'view': 'portal:custom_request'})
+        other.flush(force=True)
+
+        self.client.get(reverse('portal:custom_request'))
+        self.client.post(reverse('portal:custom_request'), {
+            'contact_name': 'Ada', 'company_name': 'Forge Ltd', 'email': 'ada@example.com',
+            'machine_type': 'Press', 'currency': 'USD', 'description': 'Need a press.',
+        })
+        body = self.scrape()
+        self.assertIn('portal_http_requests_total{method="GET",status="200",view="portal:custom_request"} 5', body)
+        self.assertIn('portal_http_request_duration_seconds_bucket{view="portal:custom_request",le="+Inf"}', body)
+        self.assertIn('portal_db_queries_per_request_count{view="portal:custom_request"}', body)
+        self.assertRegex(body, r'portal_custom_requests_total [1-9]')
+        self.assertIn('portal_outbox_backlog 1', body)
+        self.assertIn('# TYPE portal_http_request_duration_seconds histogram', body)
+        self.assertNotIn('view="portal:metrics"', body)
+
+
+class StatusTransitionTests(TestCase):
+    def make_request(self, **kwargs):
+        return CustomRequest.objects.create(
+            contact_name='Ada', company_name='Forge Ltd', email='ada@example.com',
+            machine_type='Press', description='Need a press.', **kwargs,
+        )
+
+    def test_save_logs_transitions_without_reading_the_row(self):
+        custom_request = CustomRequest.objects.get(pk=self.make_request().pk)
+        custom_request.status = CustomRequest.STATUS_REVIEW
+        with self.assertNumQueries(2):
+            custom_request.save()
+        with self.assertNumQueries(1):
+            custom_request.save()
+        custom_request.status = CustomRequest.STATUS_QUOTED
+        custom_request.save(update_fields=['internal_notes'])
+        self.assertEqual(
+            list(custom_request.status_logs.order_by('id').values_list('status', flat=True)),
+            [CustomRequest.STATUS_NEW, CustomRequest.STATUS_REVIEW],
+        )
+
+    def test_admin_bulk_transition(self):
+        from django.contrib.auth import get_user_model
+
+        requests = [self.make_request() for _ in range(5)]
+        already = self.make_request(status=CustomRequest.STATUS_QUOTED)
+        user = get_user_model().objects.create_superuser('ops', 'ops@example.com', 'pw')
+        self.client.force_login(user)
+        with STATIC_STORAGE:
+            response = self.client.post(reverse('admin:portal_customrequest_changelist'), {
+                'action': 'mark_quoted',
+                '_selected_action': [r.pk for r in requests] + [already.pk],
+            })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(CustomRequest.objects.filter(status=CustomRequest.STATUS_QUOTED).count(), 6)
+        logs = RequestStatusLog.objects.filter(status=CustomRequest.STATUS_QUOTED)
+        self.assertEqual(logs.count(), 6)
+        self.assertEqual(logs.filter(comment__startswith='Moved to Quoted in bulk by ops').count(), 5)
+        # SELECT, UPDATE and INSERT, plus the savepoint pair.
+        with self.assertNumQueries(5):
+            CustomRequest.bulk_transition(CustomRequest.objects.all(), CustomRequest.STATUS_FULFILLED)
+
+
+@STATIC_STORAGE
+class AdminChangelistTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        from django.contrib.auth import get_user_model
+
+        cls.user = get_user_model().objects.create_superuser('ops', 'ops@example.com', 'pw')
+        category = Category.objects.create(name='Presses')
+        cls.mining = Industry.objects.create(name='Mining')
+        cls.energy = Industry.objects.create(name='Energy')
+        cls.press = make_machine(category, name='Titan Press')
+        cls.press.industries.add(cls.mining, cls.energy)
+        make_machine(category, name='Idle Lathe')
+        cls.request = CustomRequest.objects.create(
+            contact_name='Ada', company_name='Forge Ltd', email='ada@example.com',
+            machine_type='Press', description='Need a hydraulic press for stamping.',
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_industry_filter_and_search_avoid_distinct(self):
+        url = reverse('admin:portal_machine_changelist')
+        response = self.client.get(url, {'industry': self.mining.pk})
+        self.assertEqual([m.pk for m in response.context['cl'].result_list], [self.press.pk])
+        self.assertNotIn('DISTINCT', str(response.context['cl'].queryset.query))
+        response = self.client.get(url, {'q': 'titan'})
+        self.assertEqual([m.pk for m in response.context['cl'].result_list], [self.press.pk])
+
+    def test_request_search_uses_index(self):
+        response = self.client.get(reverse('admin:portal_customrequest_changelist'), {'q': 'hydraul'})
+        self.assertEqual(list(response.context['cl'].result_list), [self.request])
+        self.assertNotIn('LIKE', str(response.context['cl'].queryset.query))
+        self.request.description = 'Need a conveyor.'
+        self.request.save()
+        response = self.client.get(reverse('admin:portal_customrequest_changelist'), {'q': 'hydraul'})
+        self.assertEqual(list(response.context['cl'].result_list), [])
+
+    def test_estimated_count(self):
+        paginator = EstimatedCountPaginator(Machine.objects.all(), 10)
+        paginator.estimate_threshold = 1
+        self.assertEqual(paginator.count, Machine.objects.order_by('-pk').first().pk)
+        paginator = EstimatedCountPaginator(Machine.objects.filter(name__startswith='T'), 10)
+        self.assertEqual(paginator.count, 1)
+
+    def test_overestimated_count_settles_on_the_last_page(self):
+        category = Category.objects.first()
+        spares = [make_machine(category, name=f'Spare {number}') for number in range(3)]
+        Machine.objects.exclude(name__startswith='Spare').delete()
+        paginator = EstimatedCountPaginator(Machine.objects.order_by('pk'), 1)
+        paginator.estimate_threshold = 1
+        self.assertEqual(paginator.num_pages, spares[-1].pk)
+        page = paginator.page(paginator.num_pages)
+        self.assertEqual((page.number, paginator.count, paginator.num_pages), (3, 3, 3))
+        self.assertEqual(list(page.object_list), [spares[-1]])
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'Plans are checked against SQLite EXPLAIN QUERY PLAN output.')
+class QueryPlanTests(TestCase):
+    """Hot catalogue and pipeline queries must stay on an index as the models change."""
+
+    CATALOGUE_ORDER = ('-is_featured', 'name', 'id')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Presses')
+        cls.request = CustomRequest.objects.create(
+            contact_name='Ada', company_name='Forge Ltd', email='ada@example.com',
+            machine_type='Press', description='Need a press.',
+        )
+
+    def assertUsesIndex(self, queryset, index, allow_sort=False):
+        plan = query_plan(queryset)
+        steps = [line.strip() for line in plan if line.strip().startswith(('SCAN ', 'SEARCH '))]
+        self.assertTrue(steps, plan)
+        for step in steps:
+            self.assertIn(' USING ', step, f'table scan in {plan}')
+        self.assertTrue(any(index in step for step in steps), f'{index} not used: {plan}')
+        if not allow_sort:
+            self.assertFalse([line for line in plan if 'TEMP B-TREE' in line], f'sort step in {plan}')
+
+    def test_catalogue_queries(self):
+        order = self.CATALOGUE_ORDER
+        self.assertUsesIndex(Machine.objects.order_by(*order)[:9], 'portal_machine_catalogue_idx')
+        self.assertUsesIndex(Machine.objects.filter(category=self.category).order_by(*order)[:9], 'portal_machine_category_idx')
+        self.assertUsesIndex(Machine.objects.filter(availability_status='in_stock').order_by(*order)[:9], 'portal_machine_avail_idx')
+        self.assertUsesIndex(Machine.objects.filter(financing_available=True).order_by(*order)[:9], 'portal_machine_financing_idx')
+        self.assertUsesIndex(Machine.objects.filter(is_featured=True).order_by('name')[:6], 'portal_machine_featured_idx')
+        # A range cannot also deliver the catalogue order; the matching rows are sorted.
+        self.assertUsesIndex(
+            Machine.objects.filter(power_rating_kw__gte=Decimal('10'), power_rating_kw__lte=Decimal('50')).order_by(*order)[:9],
+            'portal_machine_power_idx',
+            allow_sort=True,
+        )
+        paginator = KeysetPaginator(Machine.objects.all(), 9, (('is_featured', True), ('name', False), ('id', False)))
+        seek = Machine.objects.filter(paginator.seek_filter([True, 'Press', 10])).order_by(*paginator.order_by())[:10]
+        self.assertUsesIndex(seek, 'portal_machine_catalogue_idx')
+
+    def test_request_pipeline_queries(self):
+        self.assertUsesIndex(CustomRequest.objects.all()[:100], 'portal_request_created_idx')
+        self.assertUsesIndex(CustomRequest.objects.filter(status=CustomRequest.STATUS_NEW)[:100], 'portal_request_status_idx')
+        self.assertUsesIndex(self.request.status_logs.all(), 'portal_statuslog_request_idx')
+        self.assertUsesIndex(RequestStatusLog.objects.filter(status=CustomRequest.STATUS_QUOTED)[:100], 'portal_statuslog_status_idx')
+
+
+@STATIC_STORAGE
+class RecommendationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.presses = Category.objects.create(name='Presses')
+        cls.lathes = Category.objects.create(name='Lathes')
+        cls.mining = Industry.objects.create(name='Mining')
+        # Signals refresh on commit, which TestCase never reaches.
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.press = make_machine(cls.presses, name='Titan Press', power_rating_kw=Decimal('50'), price_from=Decimal('200000'))
+            cls.twin = make_machine(cls.presses, name='Twin Press', power_rating_kw=Decimal('55'), price_from=Decimal('210000'))
+            cls.small = make_machine(cls.presses, name='Bench Press', power_rating_kw=Decimal('2'), price_from=Decimal('9000'))
+            cls.lathe = make_machine(cls.lathes, name='Mining Lathe', power_rating_kw=Decimal('50'), price_from=Decimal('200000'))
+            for machine in (cls.press, cls.twin, cls.lathe):
+                machine.industries.add(cls.mining)
+
+    def recommended(self, machine):
+        return list(MachineRecommendation.objects.filter(machine=machine).values_list('recommended__name', flat=True))
+
+    def test_ranked_on_similarity(self):
+        self.assertEqual(rebuild_recommendations(), 4)
+        self.assertEqual(self.recommended(self.press), ['Twin Press', 'Mining Lathe', 'Bench Press'])
+        # Same category first, then the closest power rating.
+        self.assertEqual(self.recommended(self.small), ['Titan Press', 'Twin Press', 'Mining Lathe'])
+
+    def test_kept_current_by_signals(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            newcomer = make_machine(self.presses, name='Press Mk II', power_rating_kw=Decimal('50'), price_from=Decimal('200000'))
+            newcomer.industries.add(self.mining)
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(self.recommended(self.press)[0], 'Press Mk II')
+        with self.captureOnCommitCallbacks(execute=True):
+            newcomer.delete()
+        self.assertEqual(self.recommended(self.press), ['Twin Press', 'Mining Lathe', 'Bench Press'])
+
+    def test_rolled_back_refresh_is_not_joined(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            with self.assertRaises(RuntimeError):
+                with transaction.atomic():
+                    self.press.save()
+                    raise RuntimeError
+            self.twin.save()
+            self.small.save()
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(callbacks[0].pks, {self.twin.pk, self.small.pk})
+
+    @override_settings(PORTAL_RECOMMENDATIONS={'WINDOW': 2})
+    def test_refresh_reads_only_the_windows_around_the_machine(self):
+        Machine.objects.bulk_create(
+            Machine(
+                category=self.lathes, name=f'Lathe {index}', slug=f'lathe-{index}', public_id=f'LATHE-{index}',
+                short_description='Lathe', description='Lathe.', power_rating_kw=Decimal(index * 5),
+            )
+            for index in range(1, 61)
+        )
+        rebuild_recommendations()
+        Machine.objects.filter(pk=self.press.pk).update(power_rating_kw=Decimal('150'))
+        loaded = []
+
+        class Recording(recommendations.Recommender):
+            def __init__(self, features, config=None):
+                loaded.append(len(features))
+                super().__init__(features, config)
+
+        with unittest.mock.patch.object(recommendations, 'Recommender', Recording):
+            with CaptureQueriesContext(connection) as queries:
+                refresh_recommendations([self.press.pk])
+        # Only the machines within two places of the press and of those it affects, out of 64.
+        self.assertLessEqual(max(loaded), 24)
+        self.assertLessEqual(len(queries), 40)
+        refreshed = set(MachineRecommendation.objects.values_list('machine', 'recommended', 'rank'))
+        rebuild_recommendations()
+        self.assertEqual(refreshed, set(MachineRecommendation.objects.values_list('machine', 'recommended', 'rank')))
+
+    def test_detail_reads_recommendations_in_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.press.get_absolute_url())
+        self.assertEqual([m.name for m in response.context['related_machines']], ['Twin Press', 'Mining Lathe', 'Bench Press'])
+        self.assertEqual(sum('portal_machinerecommendation' in q['sql'] for q in queries.captured_queries), 1)
+
+
+class CatalogueAPITests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.presses = Category.objects.create(name='Presses')
+        cls.mining = Industry.objects.create(name='Mining')
+        cls.press = make_machine(cls.presses, name='Titan Press', is_featured=True, power_rating_kw=Decimal('50'))
+        cls.press.industries.add(cls.mining)
+        for index in range(4):
+            make_machine(cls.presses, name=f'Lathe {index}')
+
+    def test_list_filters_fields_and_cursor_pages(self):
+        url = reverse('portal:api_machine_list')
+        payload = self.client.get(url, {'fields': 'name,industries,url', 'limit': 2}).json()
+        self.assertEqual(payload['count'], 5)
+        self.assertEqual(payload['results'][0], {'name': 'Titan Press', 'industries': ['mining'], 'url': self.press.get_absolute_url()})
+        names = [item['name'] for item in payload['results']]
+        while payload['next']:
+            payload = self.client.get(payload['next']).json()
+            names += [item['name'] for item in payload['results']]
+        self.assertEqual(names, ['Titan Press', 'Lathe 0', 'Lathe 1', 'Lathe 2', 'Lathe 3'])
+        payload = self.client.get(url, {'industry': self.mining.pk, 'fields': 'slug'}).json()
+        self.assertEqual(payload['results'], [{'slug': self.press.slug}])
+        self.assertEqual(self.client.get(url, {'fields': 'secret'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'power_min': 'lots'}).status_code, 400)
+
+    def test_invalid_cursor_is_a_json_error(self):
+        response = self.client.get(reverse('portal:api_machine_list'), {'cursor': 'zzz'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(response.json(), {'error': 'Invalid cursor.'})
+
+    def test_etag_revalidation(self):
+        url = reverse('portal:api_machine_detail', args=[self.press.slug])
+        response = self.client.get(url)
+        self.assertEqual(response.json()['category'], 'presses')
+        etag = response['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.press.industries.clear()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['industries'], [])
+        list_etag = self.client.get(reverse('portal:api_category_list'))['ETag']
+        self.assertEqual(self.client.get(reverse('portal:api_category_list'), HTTP_IF_NONE_MATCH=list_etag).status_code, 304)
+        self.presses.name = 'Press Lines'
+        self.presses.save()
+        self.assertEqual(self.client.get(reverse('portal:api_category_list'), HTTP_IF_NONE_MATCH=list_etag).status_code, 200)
+
+    def test_ndjson_export(self):
+        response = self.client.get(reverse('portal:api_machine_export'), {'fields': 'id,name'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 5)
+        self.assertEqual(json.loads(lines[0]), {'id': self.press.public_id, 'name': 'Titan Press'})
+
+
+@STATIC_STORAGE
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.presses = Category.objects.create(name='Presses')
+        cls.press = make_machine(cls.presses, name='Titan Press')
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.override = override_settings(MEDIA_ROOT=self.media_root)
+        self.override.enable()
+        self.addCleanup(self.override.disable)
+
+    def revalidate(self, url, response):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_unchanged_pages_revalidate_without_rendering(self):
+        for url in (reverse('portal:landing'), reverse('portal:machine_list'), self.press.get_absolute_url()):
+            self.client.get(url)
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('no-cache', response['Cache-Control'])
+            cached = self.revalidate(url, response)
+            self.assertEqual(cached.status_code, 304, url)
+            self.assertEqual(cached.templates, [])
+            self.assertEqual(cached['ETag'], response['ETag'])
+
+    def test_detail_changes_with_gallery_and_csrf_secret(self):
+        url = self.press.get_absolute_url()
+        first = self.client.get(url)
+        self.assertIn('Last-Modified', first)
+        # The first render issued the CSRF cookie, which is part of the tag from now on.
+        response = self.client.get(url)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+        self.assertEqual(self.revalidate(url, response).status_code, 304)
+        self.press.documents.create(label='Spec sheet', document=SimpleUploadedFile('spec.pdf', b'%PDF-1.4'))
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+        response = self.client.get(url)
+        self.client.cookies.pop('csrftoken')
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+    def test_pending_messages_are_rendered(self):
+        self.client.post(reverse('portal:landing_request'), {})
+        response = self.client.get(reverse('portal:landing'), HTTP_IF_NONE_MATCH='"anything"')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+
+
+@STATIC_STORAGE
+class PageCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.presses = Category.objects.create(name='Presses')
+        cls.press = make_machine(cls.presses, name='Titan Press')
+        SiteSettings.load()
+
+    def setUp(self):
+        cache.clear()
+
+    def query_count(self, url, data=None):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url, data)
+        return len(queries)
+
+    def test_anonymous_pages_are_served_with_the_visitors_token(self):
+        url = self.press.get_absolute_url()
+        self.client.get(url)
+        visitor = Client(enforce_csrf_checks=True)
+        with self.assertNumQueries(0):
+            response = visitor.get(url)
+        self.assertIn('csrftoken', response.cookies)
+        token = response.content.decode().split('name="csrfmiddlewaretoken" value="')[1].split('"')[0]
+        posted = visitor.post(reverse('portal:landing_request'), {'csrfmiddlewaretoken': token})
+        self.assertEqual(posted.status_code, 302)
+
+    def test_key_ignores_unknown_parameters_and_order(self):
+        url = reverse('portal:machine_list')
+        self.client.get(f'{url}?category={self.presses.pk}&utm_source=mail&page=1')
+        with self.assertNumQueries(0):
+            response = self.client.get(f'{url}?page=1&utm_source=ads&category={self.presses.pk}')
+        self.assertNotContains(response, 'utm_source')
+        self.assertGreater(self.query_count(url, {'category': self.presses.pk, 'search': 'press'}), 0)
+
+    def test_changes_are_served_stale_while_one_request_renders(self):
+        url = self.press.get_absolute_url()
+        self.client.get(url)
+        self.press.name = 'Titan Press II'
+        self.press.save()
+        parts = ('portal:machine_detail', (('slug', self.press.slug),), ())
+        self.assertTrue(page_cache.claim_refresh(parts, 30))
+        self.assertNotContains(self.client.get(url), 'Titan Press II')
+        page_cache.release_refresh(parts)
+        self.assertContains(self.client.get(url), 'Titan Press II')
+        self.assertEqual(self.query_count(url), 0)
+
+    def test_signed_in_users_bypass_the_cache(self):
+        self.client.get(reverse('portal:landing'))
+        self.client.force_login(get_user_model().objects.create_user('buyer', password='secret'))
+        self.assertGreater(self.query_count(reverse('portal:landing')), 0)
+
+
+class FormMarkupTests(TestCase):
+    plain = Template('{% load crispy_forms_tags %}{{ form|crispy }}')
+    cached = Template('{% load crispy_forms_tags portal_forms %}{% cached_form form "sidebar" %}{{ form|crispy }}{% endcached_form %}')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.mining = Industry.objects.create(name='Mining')
+
+    def setUp(self):
+        cache.clear()
+
+    def render(self, template, form):
+        return template.render(Context({'form': form}))
+
+    def test_unbound_markup_is_cached_across_initial_values(self):
+        self.render(self.cached, CustomRequestForm(initial={'machine_type': 'Warm-up'}))
+        form = CustomRequestForm(initial={'machine_type': 'Press <A> & "B"'})
+        with self.assertNumQueries(0):
+            markup = self.render(self.cached, form)
+        self.assertEqual(markup, self.render(self.plain, CustomRequestForm(initial={'machine_type': 'Press <A> & "B"'})))
+
+    def test_industry_changes_rebuild_the_choices(self):
+        self.render(self.cached, CustomRequestForm())
+        Industry.objects.create(name='Shipbuilding')
+        self.assertIn('Shipbuilding', self.render(self.cached, CustomRequestForm()))
+
+    def test_bound_forms_render_their_errors(self):
+        self.render(self.cached, CustomRequestForm())
+        markup = self.render(self.cached, CustomRequestForm(data={'email': 'not-an-email'}))
+        self.assertIn('not-an-email', markup)
+        self.assertIn('is-invalid', markup)
+
+
+class CachedChoiceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.presses = Category.objects.create(name='Presses')
+        cls.mining = Industry.objects.create(name='Mining')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_choices_come_from_the_snapshot(self):
+        str(MachineFilterForm())
+        form = MachineFilterForm({'category': self.presses.pk, 'industry': self.mining.pk})
+        with self.assertNumQueries(0):
+            str(form['category'])
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.cleaned_data['industry'], self.mining)
+        form = MachineFilterForm({'industry': self.mining.pk + 100})
+        self.assertFalse(form.is_valid())
+        self.assertIn('industry', form.errors)
+
+    def test_stale_snapshot_falls_back_and_custom_requests_recheck(self):
+        str(CustomRequestForm())
+        str(MachineFilterForm())
+        # Raw writes skip the signals, like a change made by another worker.
+        energy = Industry.objects.bulk_create([Industry(name='Energy', slug='energy')])[0]
+        Industry.objects.filter(pk=self.mining.pk)._raw_delete('default')
+        self.assertIn('Mining', str(CustomRequestForm()['industry']))
+        # A filter value in the snapshot validates without a query; one added since is looked up once.
+        form = MachineFilterForm({'category': self.presses.pk, 'industry': self.mining.pk})
+        with self.assertNumQueries(0):
+            self.assertTrue(form.is_valid())
+        form = MachineFilterForm({'industry': energy.pk})
+        with self.assertNumQueries(1):
+            self.assertTrue(form.is_valid())
+        # A request naming the deleted industry is rejected before it reaches the database.
+        self.assertIn('industry', CustomRequestForm({'industry': self.mining.pk}).errors)
+        self.assertNotIn('industry', CustomRequestForm({'industry': energy.pk}).errors)
+
+    def test_snapshot_follows_model_changes(self):
+        self.assertEqual(len(MachineFilterForm().fields['category'].choices), 2)
+        Category.objects.create(name='Lathes')
+        self.assertIn('Lathes', str(MachineFilterForm()['category']))
+        self.mining.delete()
+        self.assertFalse(CustomRequestForm({'industry': self.mining.pk}).is_valid())
+
+
+class SectionPoolTests(SimpleTestCase):
+    def test_loaders_run_on_the_pool_outside_transactions(self):
+        loaded = run_concurrently({'a': lambda: threading.current_thread().name, 'b': lambda: run_concurrently({'c': lambda: 1, 'd': lambda: 2})})
+        self.assertTrue(loaded['a'].startswith('portal-sections'))
+        # Nested loaders run inline rather than waiting on the pool they occupy.
+        self.assertEqual(loaded['b'], {'c': 1, 'd': 2})
+
+    def test_loaders_inherit_request_query_wrappers(self):
+        def counter(execute, sql, params, many, context):
+            return execute(sql, params, many, context)
+
+        def wrapped():
+            return counter in connection.execute_wrappers
+
+        with wrap_request_queries(counter):
+            loaded = run_concurrently({'a': wrapped, 'b': wrapped})
+        self.assertEqual(loaded, {'a': True, 'b': True})
+
+    def test_loaders_keep_the_request_routing(self):
+        with read_from_replica():
+            loaded = run_concurrently({'a': is_pinned, 'b': is_pinned})
+        self.assertEqual(loaded, {'a': False, 'b': False})
+
+
+@STATIC_STORAGE
+class AsyncPageViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.presses = Category.objects.create(name='Presses')
+        cls.press = make_machine(cls.presses, name='Titan Press')
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.override = override_settings(MEDIA_ROOT=self.media_root)
+        self.override.enable()
+        self.addCleanup(self.override.disable)
+        self.press.documents.create(label='Spec sheet', document=SimpleUploadedFile('spec.pdf', b'%PDF-1.4'))
+
+    def test_async_variants_render_the_same_pages(self):
+        from asgiref.sync import async_to_sync
+        from django.contrib.auth.models import AnonymousUser
+        from django.contrib.messages.storage.cookie import CookieStorage
+
+        from . import views
+
+        cases = [
+            (views.LandingPageView, views.AsyncLandingPageView, reverse('portal:landing'), {}),
+            (views.MachineListView, views.AsyncMachineListView, reverse('portal:machine_list'), {}),
+            (views.MachineDetailView, views.AsyncMachineDetailView, self.press.get_absolute_url(), {'slug': self.press.slug}),
+        ]
+        for sync_view, async_view, path, kwargs in cases:
+            responses = []
+            for view in (sync_view.as_view(), async_to_sync(async_view.as_view())):
+                cache.clear()
+                request = RequestFactory().get(path)
+                request.user = AnonymousUser()
+                request._messages = CookieStorage(request)
+                responses.append(view(request, **kwargs).render())
+            self.assertEqual(responses[0].status_code, 200)
+            pages = [CSRF_INPUT.sub('', response.content.decode()) for response in responses]
+            self.assertEqual(pages[0], pages[1], path)
+        self.assertContains(responses[1], 'Spec sheet')
+
+
+class SQLiteBackendTests(SimpleTestCase):
+    alias = 'portal_contention'
+
+    def setUp(self):
+        from django.db import connections
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        connections.settings[self.alias] = {
+            **connections.settings['default'],
+            'ENGINE': 'portal.backends.sqlite3',
+            'NAME': os.path.join(directory, 'contention.sqlite3'),
+            'CONN_MAX_AGE': 0,
+            'TEST': {**connections.settings['default']['TEST'], 'NAME': None},
+        }
+        self.addCleanup(connections.settings.pop, self.alias)
+        self.addCleanup(connections.__delitem__, self.alias)
+        self.addCleanup(lambda: connections[self.alias].close())
+        with connections[self.alias].cursor() as cursor:
+            cursor.execute('CREATE TABLE counter (id INTEGER PRIMARY KEY, value INTEGER NOT NULL)')
+            cursor.execute('INSERT INTO counter (id, value) VALUES (1, 0)')
+
+    def test_connections_use_wal(self):
+        from django.db import connections
+
+        with connections[self.alias].cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+    def test_concurrent_read_then_write_transactions_lose_no_updates(self):
+        from django.db import connections, transaction
+
+        errors = []
+
+        def increment():
+            try:
+                for _ in range(20):
+                    with transaction.atomic(using=self.alias), connections[self.alias].cursor() as cursor:
+                        cursor.execute('SELECT value FROM counter WHERE id = 1')
+                        value = cursor.fetchone()[0]
+                        cursor.execute('UPDATE counter SET value = %s WHERE id = 1', [value + 1])
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connections[self.alias].close()
+
+        threads = [threading.Thread(target=increment) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        with connections[self.alias].cursor() as cursor:
+            cursor.execute('SELECT value FROM counter WHERE id = 1')
+            self.assertEqual(cursor.fetchone()[0], 80)
+
+
+SHARED_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': os.path.join(tempfile.gettempdir(), 'portal-test-cache')}}
+
+
+@override_settings(PORTAL_DB_REPLICA={'ALIAS': 'replica', 'STICKY_SECONDS': 10}, CACHES=SHARED_CACHE)
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        from django.db import connections
+
+        # Registered but never connected to: routing only needs the alias to exist.
+        connections.settings['replica'] = {**connections.settings['default'], 'NAME': 'replica.sqlite3'}
+        self.addCleanup(connections.settings.pop, 'replica')
+        self.router = PrimaryReplicaRouter()
+
+    def test_catalogue_reads_use_the_replica_only_inside_admitted_requests(self):
+        self.assertEqual(self.router.db_for_read(Machine), 'default')
+        with read_from_replica():
+            self.assertEqual(self.router.db_for_read(Machine), 'replica')
+            self.assertIsNone(self.router.db_for_read(OutboxMessage))
+            self.assertIsNone(self.router.db_for_read(CustomRequest))
+            self.assertIsNone(self.router.db_for_read(get_user_model()))
+            with pin_to_primary():
+                self.assertEqual(self.router.db_for_read(Machine), 'default')
+        self.assertEqual(self.router.db_for_write(Machine), 'default')
+        self.assertFalse(self.router.allow_migrate('replica', 'portal'))
+
+    def test_replica_requires_a_shared_cache(self):
+        from django.core.exceptions import ImproperlyConfigured
+
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            with self.assertRaises(ImproperlyConfigured):
+                PrimaryPinningMiddleware(HttpResponse)
+
+    def test_writes_and_admin_pages_pin_the_visitor_to_the_primary(self):
+        routed = []
+
+        def get_response(request):
+            routed.append(self.router.db_for_read(Machine))
+            return HttpResponse(status=302 if request.method == 'POST' else 200)
+
+        middleware = PrimaryPinningMiddleware(get_response)
+        factory = RequestFactory()
+        self.assertNotIn('portal_primary', middleware(factory.get('/catalogue/')).cookies)
+        response = middleware(factory.post(reverse('portal:custom_request')))
+        self.assertEqual(response.cookies['portal_primary']['max-age'], 10)
+        sticky = factory.get(reverse('portal:request_thanks'))
+        sticky.COOKIES['portal_primary'] = '1'
+        middleware(sticky)
+        middleware(factory.get('/admin/portal/machine/'))
+        self.assertEqual(routed, ['replica', 'default', 'default', 'default'])
+
+
+class ReplicaCopyTests(SimpleTestCase):
+    def test_copy_replaces_the_replica_under_an_open_reader(self):
+        import sqlite3
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        primary_path, replica_path = os.path.join(directory, 'primary.sqlite3'), os.path.join(directory, 'replica.sqlite3')
+        primary = sqlite3.connect(primary_path)
+        self.addCleanup(primary.close)
+        primary.execute('PRAGMA journal_mode = WAL')
+        primary.execute('CREATE TABLE machine (name TEXT)')
+        primary.execute("INSERT INTO machine VALUES ('Titan Press')")
+        primary.commit()
+
+        copy_database(primary, replica_path)
+        reader = sqlite3.connect(replica_path)
+        self.addCleanup(reader.close)
+        self.assertEqual(reader.execute('SELECT COUNT(*) FROM machine').fetchone(), (1,))
+
+        primary.execute("INSERT INTO machine VALUES ('Atlas Lathe')")
+        primary.commit()
+        copy_database(primary, replica_path)
+        self.assertEqual(reader.execute('SELECT COUNT(*) FROM machine').fetchone(), (2,))
@@ -1,14 +1,27 @@
 from django.urls import path
 
-from . import views
+from . import api, views
+from .concurrency import get_config as get_async_config
 
 app_name = 'portal'
 
+# ASGI deployments (PORTAL_ASYNC_VIEWS) serve the catalogue pages from their async variants.
+if get_async_config()['ENABLED']:
+    landing_view, list_view, detail_view = views.AsyncLandingPageView, views.AsyncMachineListView, views.AsyncMachineDetailView
+else:
+    landing_view, list_view, detail_view = views.LandingPageView, views.MachineListView, views.MachineDetailView
+
 urlpatterns = [
-    path('', views.LandingPageView.as_view(), name='landing'),
-    path('catalogue/', views.MachineListView.as_view(), name='machine_list'),
-    path('catalogue/<slug:slug>/', views.MachineDetailView.as_view(), name='machine_detail'),
+    path('', landing_view.as_view(), name='landing'),
+    path('catalogue/', list_view.as_view(), name='machine_list'),
+    path('catalogue/<slug:slug>/', detail_view.as_view(), name='machine_detail'),
     path('custom-request/', views.CustomRequestCreateView.as_view(), name='custom_request'),
     path('request/thanks/', views.RequestThankYouView.as_view(), name='request_thanks'),
     path('landing/request/', views.LandingRequestView.as_view(), name='landing_request'),
+    path('metrics', views.MetricsView.as_view(), name='metrics'),
+    path('api/v1/machines/', api.MachineListAPIView.as_view(), name='api_machine_list'),
+    path('api/v1/machines/export.ndjson', api.MachineExportAPIView.as_view(), name='api_machine_export'),
+    path('api/v1/machines/<slug:slug>/', api.MachineDetailAPIView.as_view(), name='api_machine_detail'),
+    path('api/v1/categories/', api.CategoryListAPIView.as_view(), name='api_category_list'),
+    path('api/v1/industries/', api.IndustryListAPIView.as_view(), name='api_industry_list'),
 ]
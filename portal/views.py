@@ -1,55 +1,61 @@
+import hmac
+from functools import cached_property
+
 from django.conf import settings
 from django.contrib import messages
-from django.core.mail import send_mail
-from django.db.models import Q
+from django.db import transaction
+from django.http import Http404, HttpResponse, QueryDict
 from django.shortcuts import redirect
 from django.urls import reverse_lazy
-from django.views.generic import DetailView, ListView, TemplateView
+from django.views.generic import DetailView, ListView, TemplateView, View
 from django.views.generic.edit import FormView
 
+from .concurrency import AsyncPageMixin, SectionLoaderMixin
+from .conditional import ConditionalPageMixin, catalogue_state, fingerprint, labels_state
+from .facets import apply_facet_counts, get_facet_counts
 from .forms import CustomRequestForm, MachineFilterForm
-from .models import (
-    Category,
-    CustomRequest,
-    FAQ,
-    Industry,
-    Machine,
-    Partner,
-    ServiceOffering,
-    SiteSettings,
-    Testimonial,
-)
-
-
-class LandingPageView(TemplateView):
+from .landing import landing_cache
+from .metrics import exposition, get_config as get_metrics_config
+from .models import CustomRequest, Machine
+from .notifications import enqueue_request_notification
+from .page_cache import CachedPageMixin
+from .pagination import CachedCountPaginator, KeysetPaginator, count_cache
+from .site_settings import get_site_settings
+
+
+class LandingPageView(CachedPageMixin, ConditionalPageMixin, SectionLoaderMixin, TemplateView):
     template_name = 'portal/landing.html'
 
+    @cached_property
+    def sections(self):
+        return landing_cache.get_many(run=self.gather)
+
+    def get_validators(self):
+        # Most landing content has no timestamps, so the page is tagged by the cached sections
+        # themselves; they include every industry offered by the request form.
+        return (fingerprint(self.sections), get_site_settings().updated_at), None
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        settings_obj = SiteSettings.load()
-        context['settings'] = settings_obj
-        context['metrics'] = settings_obj.metrics.all()
-        context['value_props'] = settings_obj.value_props.all()
-        context['industries'] = Industry.objects.all()
-        context['services'] = ServiceOffering.objects.all()
-        context['featured_machines'] = (
-            Machine.objects.filter(is_featured=True)
-            .select_related('category')
-            .prefetch_related('industries', 'images')[:6]
-        )
-        context['testimonials'] = Testimonial.objects.all()[:6]
-        context['partners'] = Partner.objects.all()
-        context['faqs'] = FAQ.objects.all()
+        context.update(self.sections)
         context['custom_request_form'] = CustomRequestForm()
         context['catalogue_url'] = reverse_lazy('portal:machine_list')
         return context
 
 
-class MachineListView(ListView):
+class MachineListView(CachedPageMixin, ConditionalPageMixin, SectionLoaderMixin, ListView):
     model = Machine
     template_name = 'portal/machine_list.html'
     context_object_name = 'machines'
     paginate_by = 9
+    keyset_ordering = (('is_featured', True), ('name', False), ('id', False))
+    # Everything the page reads from the querystring; other parameters share the cached page.
+    page_cache_params = tuple(MachineFilterForm.base_fields) + ('page', 'cursor')
+
+    def get_validators(self):
+        state = catalogue_state()
+        updated_at = get_site_settings().updated_at
+        return (state['etag'], updated_at), max(filter(None, (state['last_modified'], updated_at)))
 
     def get_queryset(self):
         queryset = (
@@ -57,33 +63,41 @@ class MachineListView(ListView):
             .select_related('category')
             .prefetch_related('industries')
         )
+        ordering = ['-is_featured', 'name', 'id']
         form = self.filter_form
-        if form.is_valid():
-            data = form.cleaned_data
-            if data.get('search'):
-                query = data['search']
-                queryset = queryset.filter(
-                    Q(name__icontains=query)
-                    | Q(short_description__icontains=query)
-                    | Q(model_number__icontains=query)
-                    | Q(manufacturer__icontains=query)
-                    | Q(description__icontains=query)
-                )
-            if data.get('category'):
-                queryset = queryset.filter(category=data['category'])
-            if data.get('industry'):
-                queryset = queryset.filter(industries=data['industry'])
-            if data.get('availability'):
-                queryset = queryset.filter(availability_status=data['availability'])
-            if data.get('financing'):
-                queryset = queryset.filter(financing_available=True)
-            p_min = data.get('power_min')
-            p_max = data.get('power_max')
-            if p_min is not None:
-                queryset = queryset.filter(power_rating_kw__gte=p_min)
-            if p_max is not None:
-                queryset = queryset.filter(power_rating_kw__lte=p_max)
-        return queryset.order_by('-is_featured', 'name')
+        queryset = form.filter_queryset(queryset)
+        if self.is_searching:
+            ordering.insert(0, '-search_rank')
+        return queryset.order_by(*ordering)
+
+    @property
+    def is_searching(self):
+        return self.filter_form.is_valid() and bool(self.filter_form.cleaned_data.get('search'))
+
+    def use_cursor_pagination(self):
+        # Relevance ranking is not a stable keyset, so searches keep offset pages.
+        if self.is_searching:
+            return False
+        mode = getattr(settings, 'PORTAL_CATALOGUE_PAGINATION', 'offset')
+        return mode == 'cursor' or 'cursor' in self.request.GET
+
+    def get_paginator(self, queryset, per_page, orphans=0, allow_empty_first_page=True, **kwargs):
+        return CachedCountPaginator(
+            queryset,
+            per_page,
+            count_key=self.filter_form.filter_key(),
+            orphans=orphans,
+            allow_empty_first_page=allow_empty_first_page,
+            **kwargs,
+        )
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.use_cursor_pagination():
+            return super().paginate_queryset(queryset, page_size)
+        total = count_cache.get_or_build(self.filter_form.filter_key(), queryset.count)
+        paginator = KeysetPaginator(queryset, page_size, self.keyset_ordering, total=total)
+        page = paginator.page(self.request.GET.get('cursor'))
+        return paginator, page, page.object_list, page.has_other_pages()
 
     @property
     def filter_form(self):
@@ -91,80 +105,112 @@ class MachineListView(ListView):
             self._filter_form = MachineFilterForm(self.request.GET or None)
         return self._filter_form
 
-    def get_context_data(self, **kwargs):
+    def page_context(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        # Evaluate the page here, so that it loads alongside the facet counts.
+        len(context['object_list'])
+        return context
+
+    def get_context_data(self, **kwargs):
+        self.filter_form.is_valid()
+        loaded = self.gather({
+            'context': lambda: self.page_context(**kwargs),
+            'facet_counts': lambda: get_facet_counts(self.filter_form),
+        })
+        context = loaded['context']
         context['filter_form'] = self.filter_form
-        context['settings'] = SiteSettings.load()
+        context['facet_counts'] = loaded['facet_counts']
+        apply_facet_counts(self.filter_form, context['facet_counts'])
         context['custom_request_form'] = CustomRequestForm()
-        querydict = self.request.GET.copy()
-        querydict.pop('page', None)
+        querydict = QueryDict(mutable=True)
+        for name in MachineFilterForm.base_fields:
+            querydict.setlist(name, self.request.GET.getlist(name))
+        context['cursor_pagination'] = isinstance(context['paginator'], KeysetPaginator)
         context['querystring'] = querydict.urlencode()
         return context
 
 
-class MachineDetailView(DetailView):
+class MachineDetailView(CachedPageMixin, ConditionalPageMixin, SectionLoaderMixin, DetailView):
     model = Machine
     template_name = 'portal/machine_detail.html'
     context_object_name = 'machine'
     slug_field = 'slug'
     slug_url_kwarg = 'slug'
 
+    def get_queryset(self):
+        return super().get_queryset().select_related('category')
+
+    def get_object(self, queryset=None):
+        # Looked up once for both the validators and the page.
+        if queryset is None:
+            if not hasattr(self, '_object'):
+                self._object = super().get_object()
+            return self._object
+        return super().get_object(queryset)
+
+    @cached_property
+    def related_machines(self):
+        return list(
+            Machine.objects.filter(recommended_by__machine=self.get_object())
+            .select_related('category')
+            .order_by('recommended_by__rank')
+        )
+
+    def get_validators(self):
+        # Image and document edits bump the machine's updated_at.
+        machine = self.get_object()
+        loaded = self.gather({
+            'related': lambda: self.related_machines,
+            'labels': labels_state,
+            'site_settings': get_site_settings,
+        })
+        stamps = [machine.updated_at, loaded['site_settings'].updated_at] + [item.updated_at for item in loaded['related']]
+        parts = (machine.pk, [item.pk for item in loaded['related']], stamps, loaded['labels'])
+        return parts, max(stamps)
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['related_machines'] = (
-            Machine.objects.exclude(pk=self.object.pk)
-            .filter(category=self.object.category)
-            .prefetch_related('industries')[:4]
-        )
-        context['settings'] = SiteSettings.load()
+        context.update(self.gather({
+            'related_machines': lambda: self.related_machines,
+            'gallery': lambda: list(self.object.images.all()),
+            'documents': lambda: list(self.object.documents.all()),
+        }))
         context['custom_request_form'] = CustomRequestForm(initial={'machine_type': self.object.name})
         return context
 
 
+class AsyncLandingPageView(AsyncPageMixin, LandingPageView):
+    pass
+
+
+class AsyncMachineListView(AsyncPageMixin, MachineListView):
+    pass
+
+
+class AsyncMachineDetailView(AsyncPageMixin, MachineDetailView):
+    pass
+
+
 class CustomRequestCreateView(FormView):
     template_name = 'portal/custom_request_form.html'
     form_class = CustomRequestForm
     success_url = reverse_lazy('portal:request_thanks')
 
     def form_valid(self, form):
-        custom_request = form.save()
-        self.send_notification(custom_request)
+        with transaction.atomic():
+            custom_request = form.save()
+            self.send_notification(custom_request)
         messages.success(self.request, 'Thank you! Our procurement strategists will respond within 24 hours.')
         return super().form_valid(form)
 
     def send_notification(self, custom_request: CustomRequest):
-        subject = f"New custom machinery request: {custom_request.reference_code}"
-        lines = [
-            f"Request Reference: {custom_request.reference_code}",
-            f"Company: {custom_request.company_name}",
-            f"Contact: {custom_request.contact_name} ({custom_request.email})",
-            f"Machine Type: {custom_request.machine_type}",
-            f"Budget: {custom_request.currency} {custom_request.budget_min or '—'} - {custom_request.budget_max or '—'}",
-            '',
-            f"Project Location: {custom_request.project_location or 'Provided on follow-up'}",
-            f"Timeline: {custom_request.deployment_timeline or 'Provided on follow-up'}",
-            '',
-            'Description:',
-            custom_request.description,
-        ]
-        message = "\n".join(lines)
-        recipient = settings.CONTACT_EMAIL
-        if recipient:
-            try:
-                send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [recipient], fail_silently=True)
-            except Exception:
-                pass
-
+        # Delivered by `manage.py send_outbox`; queued in the request's transaction so it cannot be lost.
+        enqueue_request_notification(custom_request)
 
 
 class RequestThankYouView(TemplateView):
     template_name = 'portal/request_thanks.html'
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['settings'] = SiteSettings.load()
-        return context
-
 
 class LandingRequestView(CustomRequestCreateView):
     http_method_names = ['post']
@@ -177,3 +223,21 @@ class LandingRequestView(CustomRequestCreateView):
     def form_invalid(self, form):
         messages.error(self.request, 'Please check the form and provide the required information to proceed.')
         return redirect('portal:landing')
+
+
+class MetricsView(View):
+    """Prometheus text exposition for staff sessions or scrapers holding the bearer token."""
+
+    def get(self, request):
+        config = get_metrics_config()
+        if not config['ENABLED']:
+            raise Http404
+        if not self.is_authorized(request, config['TOKEN']):
+            return HttpResponse('Forbidden', status=403, content_type='text/plain')
+        return HttpResponse(exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+    def is_authorized(self, request, token):
+        if request.user.is_authenticated and request.user.is_staff:
+            return True
+        header = request.headers.get('Authorization', '')
+        return bool(token) and hmac.compare_digest(header, f'Bearer {token}')
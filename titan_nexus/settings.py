@@ -23,6 +23,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'portal.metrics.MetricsMiddleware',
+    'portal.instrumentation.RequestTimingMiddleware',
+    'portal.replication.PrimaryPinningMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -46,6 +49,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'portal.context_processors.site_settings',
             ],
         },
     },
@@ -53,13 +57,47 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'titan_nexus.wsgi.application'
 
+# Several gunicorn workers share the SQLite file. The portal backend switches it to WAL with
+# tuned pragmas and starts write transactions with BEGIN IMMEDIATE, retrying on lock contention
+# (see portal/backends/sqlite3/base.py); connections are kept open between requests.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'ENGINE': os.environ.get('DJANGO_DB_ENGINE', 'portal.backends.sqlite3'),
+        'NAME': os.environ.get('DJANGO_DB_NAME', BASE_DIR / 'db.sqlite3'),
+        'CONN_MAX_AGE': int(os.environ.get('DJANGO_CONN_MAX_AGE', '600')),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Catalogue reads go to a read replica when DJANGO_DB_REPLICA_NAME names one; locally a SQLite
+# copy kept current by `manage.py sync_replica`. Writes, admin pages and a visitor's requests for
+# STICKY_SECONDS after a write stay on the primary.
+if os.environ.get('DJANGO_DB_REPLICA_NAME'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.environ['DJANGO_DB_REPLICA_NAME'],
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['portal.replication.PrimaryReplicaRouter']
+
+PORTAL_DB_REPLICA = {
+    'ALIAS': 'replica' if 'replica' in DATABASES else None,
+    'STICKY_SECONDS': int(os.environ.get('PORTAL_REPLICA_STICKY_SECONDS', '10')),
+}
+
+# Portal caches are invalidated by model signals, which only reach a cache every worker shares.
+# The gunicorn profiles in deploy/ default to a file cache; with the per-process LocMem default,
+# portal cache entries live at most PORTAL_LOCAL_CACHE_TIMEOUT seconds.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('DJANGO_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('DJANGO_CACHE_LOCATION', 'titan-nexus'),
+    }
+}
+
+PORTAL_LOCAL_CACHE_TIMEOUT = int(os.environ.get('PORTAL_LOCAL_CACHE_TIMEOUT', '30'))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -95,4 +133,94 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 DEFAULT_FROM_EMAIL = os.environ.get('DJANGO_DEFAULT_FROM_EMAIL', 'noreply@titannexus.com')
 CONTACT_EMAIL = os.environ.get('DJANGO_CONTACT_EMAIL', 'hello@titannexus.com')
 
+# Custom request notifications are queued in the outbox and sent by `manage.py send_outbox`.
+PORTAL_OUTBOX = {
+    'BATCH_SIZE': 50,
+    'MAX_ATTEMPTS': 8,
+    'BACKOFF_SECONDS': 60,
+}
+
+# Landing sections are invalidated by model signals. With the per-process LocMem default the
+# other workers only pick up admin edits once this expires; use a shared cache in production.
+PORTAL_LANDING_CACHE_TIMEOUT = 60 * 60 * 6
+
+# Seconds a worker serves SiteSettings from memory before re-checking the shared version
+# stamp. The stamp lives in the cache, or is the row's updated_at when the cache is per-process.
+PORTAL_SETTINGS_CHECK_INTERVAL = 5
+
+# 'offset' keeps numbered catalogue pages; 'cursor' switches to keyset pagination. Requests
+# carrying a ?cursor= parameter always use keyset pages.
+PORTAL_CATALOGUE_PAGINATION = os.environ.get('PORTAL_CATALOGUE_PAGINATION', 'offset')
+
+# Sized WebP/JPEG variants of uploaded images, built lazily on first render or with
+# `manage.py generate_image_derivatives`.
+PORTAL_IMAGE_DERIVATIVES = {
+    'WIDTHS': (320, 640, 960, 1440),
+    'QUALITY': 80,
+    'WORKERS': 2,
+    'LAZY': True,
+}
+
+# Per-request query count, SQL, view and render timings as a Server-Timing header and a JSON
+# log line on the 'portal.timing' logger. Off unless enabled; sample a fraction under load.
+PORTAL_REQUEST_TIMING = {
+    'ENABLED': os.environ.get('PORTAL_REQUEST_TIMING', 'False').lower() == 'true',
+    'SAMPLE_RATE': float(os.environ.get('PORTAL_REQUEST_TIMING_SAMPLE_RATE', '1.0')),
+    'HEADER': True,
+    'LOG': True,
+    'LOG_THRESHOLD_MS': 0,
+}
+
+# Queries slower than THRESHOLD_MS are logged with their EXPLAIN plan, calling view and frame,
+# and appended to LOG_FILE for `manage.py slow_query_report`.
+PORTAL_SLOW_QUERIES = {
+    'ENABLED': os.environ.get('PORTAL_SLOW_QUERIES', 'False').lower() == 'true',
+    'THRESHOLD_MS': float(os.environ.get('PORTAL_SLOW_QUERY_MS', '100')),
+    'EXPLAIN': True,
+    'LOG_FILE': os.environ.get('PORTAL_SLOW_QUERY_LOG', str(BASE_DIR / 'slow_queries.jsonl')),
+}
+
+# Request, query, cache and outbox metrics at /metrics (Prometheus text format). Each gunicorn
+# worker writes a snapshot into DIRECTORY and the endpoint sums them; clear it on deploy.
+PORTAL_METRICS = {
+    'ENABLED': os.environ.get('PORTAL_METRICS', 'False').lower() == 'true',
+    'DIRECTORY': os.environ.get('PORTAL_METRICS_DIR', str(BASE_DIR / 'var' / 'metrics')),
+    'FLUSH_INTERVAL': 5,
+    'TOKEN': os.environ.get('PORTAL_METRICS_TOKEN', ''),
+}
+
+# ETag/Last-Modified revalidation for the landing, catalogue and machine pages. RELEASE is
+# mixed into every page ETag; change it on deploy so new templates are not answered with a 304.
+PORTAL_CONDITIONAL_GET = {
+    'ENABLED': os.environ.get('PORTAL_CONDITIONAL_GET', 'True').lower() == 'true',
+    'RELEASE': os.environ.get('PORTAL_RELEASE', ''),
+}
+
+# Whole-page cache for anonymous landing, catalogue and machine pages. Pages are fresh for
+# TIMEOUT seconds and may be served stale for STALE_TIMEOUT more while one request re-renders.
+PORTAL_PAGE_CACHE = {
+    'ENABLED': os.environ.get('PORTAL_PAGE_CACHE', 'True').lower() == 'true',
+    'TIMEOUT': int(os.environ.get('PORTAL_PAGE_CACHE_TIMEOUT', 60 * 5)),
+    'STALE_TIMEOUT': 60 * 60,
+}
+
+# Async catalogue page views for ASGI deployments (deploy/gunicorn_asgi.py turns them on).
+# Independent page sections load concurrently on a pool of MAX_WORKERS threads per process.
+PORTAL_ASYNC_VIEWS = {
+    'ENABLED': os.environ.get('PORTAL_ASYNC_VIEWS', 'False').lower() == 'true',
+    'MAX_WORKERS': int(os.environ.get('PORTAL_SECTION_WORKERS', '4')),
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'portal.timing': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+        'portal.slow_queries': {'handlers': ['console'], 'level': 'WARNING', 'propagate': False},
+    },
+}
+
 STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"